@@ -1,4 +1,36 @@
+import os
 from pathlib import Path
 
 PORT = 7860
 STATIC_DIR = Path(__file__).resolve().parent.parent / "frontend" / "dist"
+
+
+def _env_int(name: str, default: int) -> int:
+    """Integer setting from the environment; ``default`` when unset or not a number."""
+    try:
+        return int(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+# Worker processes for per-sheet Excel extraction (1 = serial, capped at the core count)
+EXTRACT_WORKERS = max(1, min(_env_int("EXTRACT_WORKERS", 1), os.cpu_count() or 1))
+
+# Opt-in top-left band of each sheet searched for the header anchors (unset or
+# 0 = whole sheet). The station end marker sits below the station list, so rows
+# must cover the longest one.
+HEADER_SEARCH_ROWS = _env_int("HEADER_SEARCH_ROWS", 0) or None
+HEADER_SEARCH_COLS = _env_int("HEADER_SEARCH_COLS", 0) or None
+
+# Memory cap for cached upload parse results (content-addressed, LRU)
+PARSE_CACHE_MAX_BYTES = _env_int("PARSE_CACHE_MAX_MB", 256) * 1024 * 1024
+
+# Extract only the first sheet on upload; other sheets load when first needed
+LAZY_SHEET_LOADING = os.environ.get("LAZY_SHEET_LOADING", "0") == "1"
+
+# Upload size limits: file as sent, and the workbook's total unzipped size (zip bombs)
+MAX_UPLOAD_BYTES = _env_int("MAX_UPLOAD_MB", 50) * 1024 * 1024
+MAX_UNCOMPRESSED_BYTES = _env_int("MAX_UNCOMPRESSED_MB", 500) * 1024 * 1024
+
+# Worker threads for background upload jobs (/api/upload/jobs)
+UPLOAD_JOB_WORKERS = max(1, _env_int("UPLOAD_JOB_WORKERS", 1))
@@ -1,6 +1,40 @@
+from typing import Annotated
+
+from fastapi import Header, HTTPException
+
 from backend.models.session import SessionState
+from backend.services.payload_cache import WIRE_FORMATS
 from backend.services.session_store import get_session
 
 
 def get_state() -> SessionState:
     return get_session()
+
+
+def get_wire_format(
+    format: str | None = None,
+    accept: Annotated[str | None, Header()] = None,
+) -> str:
+    """Trains payload format: ?format=points|columnar|binary, else the
+    preferred media type of the Accept header, else points."""
+    if format is not None:
+        if format not in WIRE_FORMATS:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Nieznany format '{format}'. Dostepne: {', '.join(WIRE_FORMATS)}.",
+            )
+        return format
+    by_media_type = {media_type: name for name, (_p, media_type, _e) in WIRE_FORMATS.items()}
+    best, best_q = "points", 0.0
+    for part in (accept or "").split(","):
+        media_type, *params = (p.strip() for p in part.split(";"))
+        q = 1.0
+        for param in params:
+            if param.startswith("q="):
+                try:
+                    q = float(param[2:])
+                except ValueError:
+                    q = 0.0
+        if media_type in by_media_type and q > best_q:
+            best, best_q = by_media_type[media_type], q
+    return best
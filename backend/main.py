@@ -1,4 +1,5 @@
 import sys
+from contextlib import asynccontextmanager
 from pathlib import Path
 
 from fastapi import FastAPI
@@ -7,10 +8,21 @@ from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse
 
 from backend.config import STATIC_DIR
-from backend.routers import upload, sheets, trains, edit, colors, export
+from backend.routers import upload, sheets, trains, edit, colors, export, diagnostics
+from excel_loader import shutdown_extract_pool
 
-app = FastAPI(title="Train Timetable Plotter")
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    shutdown_extract_pool()
+
+
+app = FastAPI(title="Train Timetable Plotter", lifespan=lifespan)
+
+# Oversized uploads are cut off while they arrive, not after spooling
+# (added first so its 413s still pass through CORS)
+app.add_middleware(upload.UploadSizeLimit)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -25,6 +37,7 @@ app.include_router(trains.router)
 app.include_router(edit.router)
 app.include_router(colors.router)
 app.include_router(export.router)
+app.include_router(diagnostics.router)
 
 # Serve example file
 EXAMPLE_FILE = Path(__file__).resolve().parent.parent / "example_table" / "d1_test.xlsx"
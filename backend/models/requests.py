@@ -1,4 +1,6 @@
-from pydantic import BaseModel
+from typing import Annotated, Literal, Union
+
+from pydantic import BaseModel, Field
 
 
 class SelectSheetRequest(BaseModel):
@@ -26,6 +28,47 @@ class ClearTimeRequest(BaseModel):
     stop_type: str | None = None
 
 
+class SaveTimeOp(SaveTimeRequest):
+    op: Literal["save"]
+
+
+class ClearTimeOp(ClearTimeRequest):
+    op: Literal["clear"]
+
+
+class PropagateOp(BaseModel):
+    """Shift a train's downstream times from ``station`` by ``delta_minutes``."""
+
+    op: Literal["propagate"]
+    sheet: str
+    station: str
+    km: float
+    train_number: str
+    delta_minutes: float
+
+
+EditOp = Annotated[Union[SaveTimeOp, ClearTimeOp, PropagateOp], Field(discriminator="op")]
+
+
+class BatchEditRequest(BaseModel):
+    ops: list[EditOp]
+
+
+class ShiftTimesRequest(BaseModel):
+    """Shift whole trains by ``delta_minutes``; the criteria given are combined (AND).
+
+    ``sheets`` defaults to every sheet; ``departure_from`` / ``departure_to``
+    ("HH:MM") select trains by their first time on the sheet.
+    """
+
+    delta_minutes: float
+    sheets: list[str] | None = None
+    train_numbers: list[str] | None = None
+    colors: list[str] | None = None
+    departure_from: str | None = None
+    departure_to: str | None = None
+
+
 class SetColorRequest(BaseModel):
     train_number: str
     color: str
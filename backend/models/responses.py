@@ -37,11 +37,13 @@ class TrainsResponse(BaseModel):
     x_max_ms: int
     train_colors: dict[str, str]
     selected_sheet: str
+    pending_sheets: list[str] = []
 
 
 class SheetsResponse(BaseModel):
     sheets: list[str]
     selected_sheet: str
+    pending: list[str] = []
 
 
 class UploadResponse(BaseModel):
@@ -49,3 +51,11 @@ class UploadResponse(BaseModel):
     sheets: list[str]
     selected_sheet: str
     message: str = ""
+    pending: list[str] = []
+    reused: list[str] = []  # incremental re-import: kept from the loaded workbook
+    reparsed: list[str] = []
+
+
+class UploadJobResponse(BaseModel):
+    job_id: str
+    status: str
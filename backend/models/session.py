@@ -1,14 +1,31 @@
 from __future__ import annotations
 
+import uuid
 from dataclasses import dataclass, field
 from typing import Any
 
+# Keys that only change what is viewed, not the data: writing them keeps the
+# version (caches key on them separately)
+VIEW_KEYS = frozenset({"selected_sheet"})
+
 
 @dataclass
 class SessionState:
-    """Dict-like session state so table_editor.py and excel_loader.py work unchanged."""
+    """Dict-like session state so table_editor.py and excel_loader.py work unchanged.
+
+    ``version`` goes up on every data write, so anything derived from the data
+    (see services/payload_cache.py) can be cached per version. Code that
+    changes a stored object in place without assigning it back calls
+    ``touch()``. Versions restart with every new session (server restart,
+    reset), so validators handed to clients also carry the session ``id``.
+    """
 
     _data: dict[str, Any] = field(default_factory=dict)
+    _version: int = 0
+    # derived data keyed by version; never part of to_dict()
+    cache: dict[str, Any] = field(default_factory=dict)
+    # unique per session object; never part of to_dict()
+    id: str = field(default_factory=lambda: uuid.uuid4().hex)
 
     # --- dict protocol used by table_editor / excel_loader ---
 
@@ -17,6 +34,8 @@ class SessionState:
 
     def __setitem__(self, key: str, value: Any) -> None:
         self._data[key] = value
+        if key not in VIEW_KEYS:
+            self._version += 1
 
     def __contains__(self, key: str) -> bool:
         return key in self._data
@@ -25,8 +44,20 @@ class SessionState:
         return self._data.get(key, default)
 
     def setdefault(self, key: str, default: Any = None) -> Any:
+        if key not in self._data and key not in VIEW_KEYS:
+            self._version += 1
         return self._data.setdefault(key, default)
 
+    # --- versioning ---
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def touch(self) -> None:
+        """Record an in-place change to stored data."""
+        self._version += 1
+
     # --- convenience ---
 
     def to_dict(self) -> dict[str, Any]:
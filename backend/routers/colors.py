@@ -3,25 +3,33 @@ from fastapi import APIRouter, Depends
 from backend.deps import get_state
 from backend.models.session import SessionState
 from backend.models.requests import SetColorRequest
+from backend.services.payload_cache import data_version
 
 router = APIRouter(prefix="/api", tags=["colors"])
 
+# Color writes change the data version like any other write. Responses carry
+# the version tokens (see data_version) before and after, so a client that
+# held the payload of ``base_version`` can apply the colors and keep deltas
+# going from ``version``.
+
 
 @router.put("/colors")
 async def set_color(
     body: SetColorRequest,
     session: SessionState = Depends(get_state),
 ) -> dict:
+    base_version = data_version(session)
     colors = session.get("train_colors", {})
     if body.color == "#000000":
         colors.pop(body.train_number, None)
     else:
         colors[body.train_number] = body.color
     session["train_colors"] = colors
-    return {"train_colors": colors}
+    return {"train_colors": colors, "base_version": base_version, "version": data_version(session)}
 
 
 @router.delete("/colors/all")
 async def clear_all_colors(session: SessionState = Depends(get_state)) -> dict:
+    base_version = data_version(session)
     session["train_colors"] = {}
-    return {"train_colors": {}}
+    return {"train_colors": {}, "base_version": base_version, "version": data_version(session)}
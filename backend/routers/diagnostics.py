@@ -0,0 +1,20 @@
+from fastapi import APIRouter, Depends
+
+from backend.deps import get_state
+from backend.models.session import SessionState
+from backend.services.parse_cache import parse_cache
+from backend.services.payload_cache import payload_cache_stats
+from utils import LabelTable, normalize_cache_info
+
+router = APIRouter(prefix="/api", tags=["diagnostics"])
+
+
+@router.get("/diagnostics")
+async def get_diagnostics(session: SessionState = Depends(get_state)) -> dict:
+    labels = session.get("_labels")
+    return {
+        "parse_cache": parse_cache.stats(),
+        "payload_cache": {**payload_cache_stats(), "version": session.version},
+        "normalize": normalize_cache_info(),
+        "labels": (labels if labels is not None else LabelTable()).stats(),
+    }
@@ -1,12 +1,21 @@
+import copy
 import datetime as dt
+from typing import Annotated
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import JSONResponse, Response
 
-from backend.deps import get_state
+from backend.deps import get_state, get_wire_format
 from backend.models.session import SessionState
-from backend.models.requests import SaveTimeRequest, ClearTimeRequest
-from backend.services.plot_data import build_trains_payload
-from table_editor import save_cell_time, clear_cell_time, propagate_time_shift
+from backend.models.requests import (
+    BatchEditRequest, ClearTimeRequest, EditOp, PropagateOp, SaveTimeRequest, ShiftTimesRequest,
+)
+from backend.services.excel_service import ensure_sheets_loaded
+from backend.services.payload_cache import VERSION_HEADER, data_version, trains_payload_response
+from backend.services.payload_delta import Base, delta_base, payload_delta
+from table_editor import save_cell_time, clear_cell_time, propagate_time_shift, shift_train_times
+from timetable_store import ensure_timetable
+from utils import parse_time
 
 router = APIRouter(prefix="/api/edit", tags=["edit"])
 
@@ -26,11 +35,7 @@ def _canonical_km(session: SessionState, sheet: str, station: str, fallback_km:
     return fallback_km
 
 
-@router.post("/save")
-async def save_time(
-    body: SaveTimeRequest,
-    session: SessionState = Depends(get_state),
-) -> dict:
+def _apply_save(session: SessionState, body: SaveTimeRequest) -> None:
     time_value = dt.time(body.hour, body.minute, body.second)
 
     # Resolve km from the train's own sheet (plot may send active-sheet km)
@@ -42,13 +47,10 @@ async def save_time(
         active = next((s for s in sheets_data if s.get("sheet") == body.sheet), None)
         old_decimal = None
         if active:
-            for rec in active.get("trains", []):
-                if (str(rec.get("train_number")) == body.train_number
-                        and rec.get("station") == body.station
-                        and abs(float(rec.get("km", 0)) - km) < 0.01
-                        and rec.get("stop_type") == body.stop_type):
-                    old_decimal = rec.get("time_decimal")
-                    break
+            trains = ensure_timetable(active)
+            row = trains.find(body.station, km, body.train_number, body.stop_type, km_tol=0.01)
+            if row is not None:
+                old_decimal = trains.record(row)["time_decimal"]
 
         if old_decimal is not None:
             new_dec = body.hour + body.minute / 60.0 + body.second / 3600.0
@@ -66,17 +68,144 @@ async def save_time(
         time_value, session,
         day_offset=body.day_offset, stop_type=body.stop_type,
     )
-    return build_trains_payload(session)
 
 
-@router.post("/clear")
-async def clear_time(
-    body: ClearTimeRequest,
-    session: SessionState = Depends(get_state),
-) -> dict:
+def _apply_clear(session: SessionState, body: ClearTimeRequest) -> None:
     km = _canonical_km(session, body.sheet, body.station, body.km)
     clear_cell_time(
         body.sheet, body.station, km, body.train_number,
         session, stop_type=body.stop_type,
     )
-    return build_trains_payload(session)
+
+
+def _apply_propagate(session: SessionState, body: PropagateOp) -> None:
+    km = _canonical_km(session, body.sheet, body.station, body.km)
+    propagate_time_shift(body.sheet, body.train_number, km, body.delta_minutes / 60.0, session)
+
+
+_APPLY = {"save": _apply_save, "clear": _apply_clear, "propagate": _apply_propagate}
+
+
+def apply_batch(session: SessionState, ops: list[EditOp]) -> None:
+    """Apply ``ops`` in order, all or nothing.
+
+    The touched sheets are snapshotted first; if any operation fails they
+    are restored and an HTTP 400 names the index of the failing operation.
+    """
+    entries = {e["sheet"]: e for e in session.get("sheets_data", [])}
+    for i, op in enumerate(ops):
+        if op.sheet not in entries:
+            raise HTTPException(status_code=400, detail={
+                "index": i, "message": f"Arkusz '{op.sheet}' nie istnieje.",
+            })
+    touched = list(dict.fromkeys(op.sheet for op in ops))
+    ensure_sheets_loaded(session, touched)
+    snapshot = {name: copy.copy(ensure_timetable(entries[name])) for name in touched}
+
+    for i, op in enumerate(ops):
+        try:
+            _APPLY[op.op](session, op)
+        except Exception as exc:
+            for name, trains in snapshot.items():
+                entries[name]["trains"] = trains
+            session.touch()
+            raise HTTPException(status_code=400, detail={
+                "index": i, "message": f"Nie udalo sie wykonac operacji: {exc}",
+            })
+
+
+def _edit_response(
+    session: SessionState,
+    base_version: str | None,
+    base: Base | None,
+    wire_format: str,
+) -> Response:
+    """A JSON delta against the client's payload (see delta_base), or the
+    full payload (in ``wire_format``) without a current ``base_version``."""
+    if base is None:
+        return trains_payload_response(session, wire_format)
+    return JSONResponse(payload_delta(session, base_version, base),
+                        headers={VERSION_HEADER: data_version(session)})
+
+
+@router.post("/save")
+async def save_time(
+    body: SaveTimeRequest,
+    session: SessionState = Depends(get_state),
+    base_version: str | None = None,
+    wire_format: Annotated[str, Depends(get_wire_format)] = "points",
+) -> Response:
+    base = delta_base(session, base_version)
+    ensure_sheets_loaded(session, [body.sheet])
+    _apply_save(session, body)
+    return _edit_response(session, base_version, base, wire_format)
+
+
+@router.post("/clear")
+async def clear_time(
+    body: ClearTimeRequest,
+    session: SessionState = Depends(get_state),
+    base_version: str | None = None,
+    wire_format: Annotated[str, Depends(get_wire_format)] = "points",
+) -> Response:
+    base = delta_base(session, base_version)
+    ensure_sheets_loaded(session, [body.sheet])
+    _apply_clear(session, body)
+    return _edit_response(session, base_version, base, wire_format)
+
+
+@router.post("/batch")
+async def edit_batch(
+    body: BatchEditRequest,
+    session: SessionState = Depends(get_state),
+    base_version: str | None = None,
+    wire_format: Annotated[str, Depends(get_wire_format)] = "points",
+) -> Response:
+    """Apply save / clear / propagate operations atomically, then rebuild the
+    payload once (e.g. for a block of times pasted into the grid)."""
+    base = delta_base(session, base_version)
+    apply_batch(session, body.ops)
+    return _edit_response(session, base_version, base, wire_format)
+
+
+def _window_bound(value: str | None, name: str) -> float | None:
+    if value is None:
+        return None
+    parsed = parse_time(value)
+    if parsed is None:
+        raise HTTPException(status_code=400, detail=f"Nieprawidlowa godzina w polu {name}: '{value}'.")
+    return parsed
+
+
+@router.post("/shift")
+async def shift_times(
+    body: ShiftTimesRequest,
+    session: SessionState = Depends(get_state),
+    base_version: str | None = None,
+    wire_format: Annotated[str, Depends(get_wire_format)] = "points",
+) -> Response:
+    """Shift every event of the selected trains at once, then rebuild the payload once."""
+    all_sheets = [e["sheet"] for e in session.get("sheets_data", [])]
+    unknown = [name for name in body.sheets or [] if name not in all_sheets]
+    if unknown:
+        raise HTTPException(status_code=404, detail=f"Arkusz '{unknown[0]}' nie istnieje.")
+    if not any((body.sheets, body.train_numbers, body.colors, body.departure_from, body.departure_to)):
+        raise HTTPException(status_code=400, detail="Wybierz pociagi do przesuniecia (arkusz, numery, kolor lub godziny).")
+    departure_from = _window_bound(body.departure_from, "departure_from")
+    departure_to = _window_bound(body.departure_to, "departure_to")
+
+    train_numbers = set(body.train_numbers) if body.train_numbers is not None else None
+    if body.colors is not None:
+        colors = set(body.colors)
+        by_color = {tn for tn, color in session.get("train_colors", {}).items() if color in colors}
+        train_numbers = by_color if train_numbers is None else train_numbers & by_color
+
+    sheets = body.sheets or all_sheets
+    base = delta_base(session, base_version)
+    ensure_sheets_loaded(session, sheets)
+    for sheet in sheets:
+        shift_train_times(
+            sheet, body.delta_minutes / 60.0, session,
+            train_numbers=train_numbers, departure_from=departure_from, departure_to=departure_to,
+        )
+    return _edit_response(session, base_version, base, wire_format)
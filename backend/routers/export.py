@@ -8,6 +8,7 @@ from fastapi.responses import StreamingResponse
 
 from backend.deps import get_state
 from backend.models.session import SessionState
+from backend.services.excel_service import ensure_sheets_loaded
 from backend.services.export_service import (
     build_excel_bytes,
     build_circuits_excel_bytes,
@@ -26,6 +27,7 @@ def _content_disposition(filename: str) -> str:
 
 @router.get("/xlsx")
 async def export_xlsx(session: SessionState = Depends(get_state)) -> StreamingResponse:
+    ensure_sheets_loaded(session)
     data = build_excel_bytes(session)
     name = session.get("uploaded_name") or "rozklad.xlsx"
     return StreamingResponse(
@@ -37,6 +39,7 @@ async def export_xlsx(session: SessionState = Depends(get_state)) -> StreamingRe
 
 @router.get("/circuits")
 async def export_circuits(session: SessionState = Depends(get_state)) -> StreamingResponse:
+    ensure_sheets_loaded(session)
     data = build_circuits_excel_bytes(session)
     base = (session.get("uploaded_name") or "obiegi").rsplit(".", 1)[0]
     ts = dt.datetime.now().strftime("%H_%M_%d_%m_%Y")
@@ -49,6 +52,7 @@ async def export_circuits(session: SessionState = Depends(get_state)) -> Streami
 
 @router.get("/project")
 async def export_project(session: SessionState = Depends(get_state)) -> StreamingResponse:
+    ensure_sheets_loaded(session)
     data = build_project_json(session)
     base = (session.get("uploaded_name") or "projekt").rsplit(".", 1)[0]
     ts = dt.datetime.now().strftime("%H_%M_%d_%m_%Y")
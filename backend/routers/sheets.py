@@ -4,6 +4,7 @@ from backend.deps import get_state
 from backend.models.session import SessionState
 from backend.models.requests import SelectSheetRequest
 from backend.models.responses import SheetsResponse
+from backend.services.excel_service import ensure_sheets_loaded, pending_sheets
 
 router = APIRouter(prefix="/api", tags=["sheets"])
 
@@ -13,7 +14,7 @@ async def list_sheets(session: SessionState = Depends(get_state)) -> SheetsRespo
     sheets_data = session.get("sheets_data", [])
     sheets = [e["sheet"] for e in sheets_data]
     selected = session.get("selected_sheet", sheets[0] if sheets else "")
-    return SheetsResponse(sheets=sheets, selected_sheet=selected)
+    return SheetsResponse(sheets=sheets, selected_sheet=selected, pending=pending_sheets(session))
 
 
 @router.put("/sheets/select", response_model=SheetsResponse)
@@ -25,5 +26,15 @@ async def select_sheet(
     sheets = [e["sheet"] for e in sheets_data]
     if body.sheet not in sheets:
         raise HTTPException(status_code=404, detail=f"Arkusz '{body.sheet}' nie istnieje.")
+    ensure_sheets_loaded(session, [body.sheet])
     session["selected_sheet"] = body.sheet
-    return SheetsResponse(sheets=sheets, selected_sheet=body.sheet)
+    return SheetsResponse(sheets=sheets, selected_sheet=body.sheet, pending=pending_sheets(session))
+
+
+@router.post("/sheets/load", response_model=SheetsResponse)
+async def load_pending_sheets(session: SessionState = Depends(get_state)) -> SheetsResponse:
+    """Extract every sheet still pending after a lazy upload."""
+    ensure_sheets_loaded(session)
+    sheets = [e["sheet"] for e in session.get("sheets_data", [])]
+    selected = session.get("selected_sheet", sheets[0] if sheets else "")
+    return SheetsResponse(sheets=sheets, selected_sheet=selected, pending=pending_sheets(session))
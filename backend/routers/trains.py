@@ -1,12 +1,83 @@
-from fastapi import APIRouter, Depends
+from typing import Annotated
 
-from backend.deps import get_state
+from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi.responses import JSONResponse, Response
+
+from backend.deps import get_state, get_wire_format
 from backend.models.session import SessionState
-from backend.services.plot_data import build_trains_payload
+from backend.services.excel_service import ensure_sheets_loaded
+from backend.services.grid_window import grid_columns, grid_etag, grid_window
+from backend.services.payload_cache import trains_payload_response
+from backend.services.plot_window import plot_window
 
 router = APIRouter(prefix="/api", tags=["trains"])
 
 
 @router.get("/trains")
-async def get_trains(session: SessionState = Depends(get_state)) -> dict:
-    return build_trains_payload(session)
+async def get_trains(
+    session: SessionState = Depends(get_state),
+    wire_format: Annotated[str, Depends(get_wire_format)] = "points",
+) -> Response:
+    ensure_sheets_loaded(session, [session.get("selected_sheet", "")])
+    response = trains_payload_response(session, wire_format)
+    response.headers["Vary"] = "Accept"
+    return response
+
+
+@router.get("/trains/plot")
+async def get_plot_window(
+    session: SessionState = Depends(get_state),
+    from_ms: float | None = None,
+    to_ms: float | None = None,
+    km_min: float | None = None,
+    km_max: float | None = None,
+    format: str = "points",
+    width_px: int | None = None,
+    height_px: int | None = None,
+) -> dict:
+    """Plot series of the visible window only (e.g. a zoomed-in view);
+    with the view's size in pixels, simplified to what can be seen."""
+    if format not in ("points", "columnar"):
+        raise HTTPException(status_code=400, detail=f"Nieznany format '{format}'. Dostepne: points, columnar.")
+    if from_ms is not None and to_ms is not None and from_ms > to_ms:
+        raise HTTPException(status_code=400, detail="from_ms nie moze byc wieksze niz to_ms.")
+    if km_min is not None and km_max is not None and km_min > km_max:
+        raise HTTPException(status_code=400, detail="km_min nie moze byc wieksze niz km_max.")
+    if (width_px is None) != (height_px is None) or (width_px is not None and min(width_px, height_px) < 1):
+        raise HTTPException(status_code=400, detail="Podaj dodatnie width_px i height_px (oba naraz).")
+    ensure_sheets_loaded(session, [session.get("selected_sheet", "")])
+    return plot_window(session, from_ms, to_ms, km_min, km_max, columnar=format == "columnar",
+                       width_px=width_px, height_px=height_px)
+
+
+@router.get("/trains/columns")
+async def get_grid_columns(
+    session: SessionState = Depends(get_state),
+    if_none_match: Annotated[str | None, Header()] = None,
+) -> Response:
+    """Column defs and row labels of the grid; 304 while the version hasn't changed."""
+    ensure_sheets_loaded(session, [session.get("selected_sheet", "")])
+    etag = grid_etag(session)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if if_none_match == etag:
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(grid_columns(session), headers=headers)
+
+
+@router.get("/trains/grid")
+async def get_grid_window(
+    session: SessionState = Depends(get_state),
+    row_start: int = 0,
+    row_end: int | None = None,
+    col_start: int = 0,
+    col_end: int | None = None,
+) -> dict:
+    """Non-empty cells of a rows x train columns window (virtualised grid)."""
+    if (
+        row_start < 0 or col_start < 0
+        or (row_end is not None and row_end < row_start)
+        or (col_end is not None and col_end < col_start)
+    ):
+        raise HTTPException(status_code=400, detail="Nieprawidlowy zakres wierszy lub kolumn.")
+    ensure_sheets_loaded(session, [session.get("selected_sheet", "")])
+    return grid_window(session, row_start, row_end, col_start, col_end)
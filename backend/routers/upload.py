@@ -1,34 +1,246 @@
-from fastapi import APIRouter, Depends, File, UploadFile, HTTPException
+import asyncio
+import json
+import shutil
+import tempfile
+from typing import BinaryIO
 
+from fastapi import APIRouter, Depends, File, Header, UploadFile, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from backend.config import LAZY_SHEET_LOADING, MAX_UPLOAD_BYTES
 from backend.deps import get_state
 from backend.models.session import SessionState
-from backend.models.responses import UploadResponse
-from backend.services.excel_service import load_excel, load_project_json
+from backend.models.responses import UploadJobResponse, UploadResponse
+from backend.services.excel_service import (
+    ParsedWorkbook,
+    load_project_json,
+    parse_excel,
+    pending_sheets,
+    store_excel,
+)
+from backend.services.upload_jobs import TERMINAL_EVENTS, JobFailed, UploadJob, upload_jobs
+from excel_loader import ENGINES, WorkbookTooLarge
 
 router = APIRouter(prefix="/api", tags=["upload"])
 
+# Seconds between SSE keep-alive comments while a job is quiet
+SSE_KEEPALIVE = 15.0
 
-@router.post("/upload", response_model=UploadResponse)
-async def upload_file(
-    file: UploadFile = File(...),
-    session: SessionState = Depends(get_state),
-) -> UploadResponse:
-    file_bytes = await file.read()
+# Room for the multipart framing around the file in an upload request body
+_MULTIPART_OVERHEAD = 64 * 1024
+
+
+def _too_large(size: int) -> str:
+    return f"Plik jest za duzy ({size // (1024 * 1024)} MB, limit {MAX_UPLOAD_BYTES // (1024 * 1024)} MB)."
+
+
+class UploadSizeLimit:
+    """ASGI middleware cutting off upload request bodies over the limit
+    while they arrive, before Starlette spools them to disk: at once by
+    Content-Length, otherwise (chunked bodies) once the bytes received pass it.
+    ``_check_upload`` still checks the exact file size afterwards."""
+
+    def __init__(self, app: ASGIApp, max_bytes: int = MAX_UPLOAD_BYTES + _MULTIPART_OVERHEAD,
+                 path_prefix: str = "/api/upload") -> None:
+        self.app = app
+        self.max_bytes = max_bytes
+        self.path_prefix = path_prefix
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if (scope["type"] != "http" or scope["method"] != "POST"
+                or not scope["path"].startswith(self.path_prefix)):
+            await self.app(scope, receive, send)
+            return
+        length = Headers(scope=scope).get("content-length", "")
+        if length.isdigit() and int(length) > self.max_bytes:
+            response = JSONResponse({"detail": _too_large(int(length))}, status_code=413,
+                                    headers={"Connection": "close"})
+            await response(scope, receive, send)
+            return
+        received = 0
+
+        async def limited_receive() -> Message:
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    # FastAPI passes an HTTPException from body parsing through
+                    raise HTTPException(status_code=413, detail=_too_large(received))
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+
+def _check_upload(file: UploadFile, engine: str) -> str:
+    """Validate engine, size and file type before any parsing. Returns the filename."""
+    if engine not in ENGINES:
+        raise HTTPException(status_code=400, detail=f"Nieznany silnik wczytywania: {engine}.")
+    # Starlette has already spooled the body to a temp file (UploadSizeLimit
+    # stopped bodies far over the limit); read from it in place
+    size = file.file.seek(0, 2)
+    file.file.seek(0)
+    if size > MAX_UPLOAD_BYTES:
+        raise HTTPException(status_code=413, detail=_too_large(size))
     filename = file.filename or ""
+    if not filename.lower().endswith((".json", ".xlsx")):
+        raise HTTPException(status_code=400, detail="Nieobslugiwany format pliku. Uzyj .xlsx lub .json.")
+    return filename
+
 
+def _parse_upload(
+    upload: BinaryIO,
+    filename: str,
+    engine: str,
+    lazy: bool,
+    base: SessionState | None = None,
+    job: UploadJob | None = None,
+) -> bytes | ParsedWorkbook:
+    """Parse the upload without touching the session: the project JSON's
+    bytes or the parsed workbook. ``job`` receives per-sheet progress."""
     if filename.lower().endswith(".json"):
+        return upload.read()
+    try:
+        parsed = parse_excel(
+            upload, engine=engine, lazy=lazy, base=base,
+            on_read=job.progress("read") if job else None,
+            on_extract=job.progress("extract") if job else None,
+        )
+    except WorkbookTooLarge:
+        raise HTTPException(
+            status_code=413,
+            detail="Plik po rozpakowaniu przekracza dopuszczalny rozmiar.",
+        )
+    except Exception as exc:
+        if job and job.cancel_requested:
+            raise
+        raise HTTPException(status_code=400, detail=f"Nie udalo sie wczytac pliku: {exc}")
+    if job:
+        job.check_cancelled()
+    return parsed
+
+
+def _store_upload(parsed: bytes | ParsedWorkbook, filename: str, session: SessionState) -> UploadResponse:
+    """Put the result of ``_parse_upload`` into the session."""
+    if isinstance(parsed, bytes):
         try:
-            result = load_project_json(file_bytes, session)
+            result = load_project_json(parsed, session)
         except (ValueError, Exception) as exc:
             raise HTTPException(status_code=400, detail=str(exc))
-    elif filename.lower().endswith(".xlsx"):
+    else:
         try:
-            result = load_excel(file_bytes, filename, session)
+            result = store_excel(parsed, filename, session)
         except Exception as exc:
             raise HTTPException(status_code=400, detail=f"Nie udalo sie wczytac pliku: {exc}")
-    else:
-        raise HTTPException(status_code=400, detail="Nieobslugiwany format pliku. Uzyj .xlsx lub .json.")
 
     sheets = result.get("sheets", [s["sheet"] for s in session.get("sheets_data", [])])
     selected = session.get("selected_sheet", sheets[0] if sheets else "")
-    return UploadResponse(ok=True, sheets=sheets, selected_sheet=selected, message="OK")
+    return UploadResponse(ok=True, sheets=sheets, selected_sheet=selected, message="OK",
+                          pending=pending_sheets(session),
+                          reused=result.get("reused", []), reparsed=result.get("reparsed", sheets))
+
+
+def _incremental_base(session: SessionState) -> SessionState:
+    """What ``parse_excel`` reads of the session for an incremental upload,
+    copied so a background parse does not read the live session."""
+    base = SessionState()
+    for key in ("sheet_fingerprints", "sheet_status", "sheets_data", "station_map"):
+        if key in session:
+            base[key] = session[key]
+    return base
+
+
+@router.post("/upload", response_model=UploadResponse)
+async def upload_file(
+    file: UploadFile = File(...),
+    engine: str = Query("openpyxl", description="Workbook reader: " + ", ".join(ENGINES)),
+    lazy: bool = Query(LAZY_SHEET_LOADING, description="Extract only the first sheet now, the rest on demand"),
+    incremental: bool = Query(False, description="Re-extract only sheets that changed since the loaded upload"),
+    session: SessionState = Depends(get_state),
+) -> UploadResponse:
+    filename = _check_upload(file, engine)
+    parsed = _parse_upload(file.file, filename, engine, lazy, base=session if incremental else None)
+    return _store_upload(parsed, filename, session)
+
+
+@router.post("/upload/jobs", response_model=UploadJobResponse)
+async def start_upload_job(
+    file: UploadFile = File(...),
+    engine: str = Query("openpyxl", description="Workbook reader: " + ", ".join(ENGINES)),
+    lazy: bool = Query(LAZY_SHEET_LOADING, description="Extract only the first sheet now, the rest on demand"),
+    incremental: bool = Query(False, description="Re-extract only sheets that changed since the loaded upload"),
+    session: SessionState = Depends(get_state),
+) -> UploadJobResponse:
+    """Start parsing in the background; follow it at /upload/jobs/{job_id}/events.
+
+    The worker thread only parses. The result is stored into the session
+    back on the event loop, like every other session write, and only then
+    is the job "done".
+    """
+    filename = _check_upload(file, engine)
+    # The request's spool is closed once this handler returns; the job gets its own file
+    spool = tempfile.TemporaryFile()
+    await run_in_threadpool(shutil.copyfileobj, file.file, spool)
+    base = _incremental_base(session) if incremental else None
+
+    def work(job: UploadJob) -> bytes | ParsedWorkbook:
+        try:
+            return _parse_upload(spool, filename, engine, lazy, base=base, job=job)
+        except HTTPException as exc:
+            raise JobFailed(exc.status_code, str(exc.detail))
+
+    def store(parsed: bytes | ParsedWorkbook) -> dict:
+        if base is not None and session.get("sheet_fingerprints") is not base.get("sheet_fingerprints"):
+            # another upload replaced the workbook the reused sheets came from
+            raise JobFailed(409, "Dane zmienily sie w trakcie wczytywania. Wyslij plik ponownie.")
+        try:
+            return _store_upload(parsed, filename, session).model_dump()
+        except HTTPException as exc:
+            raise JobFailed(exc.status_code, str(exc.detail))
+
+    job = upload_jobs.submit(filename, work, cleanup=spool.close, finish=store)
+    return UploadJobResponse(job_id=job.id, status=job.status)
+
+
+@router.get("/upload/jobs/{job_id}/events")
+async def upload_job_events(
+    job_id: str,
+    last_event_id: str | None = Header(None),
+) -> StreamingResponse:
+    """Server-Sent Events: ``progress`` per sheet, then ``done`` (with the
+    UploadResponse), ``failed`` or ``cancelled``. Honors Last-Event-ID."""
+    job = upload_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Zadanie '{job_id}' nie istnieje.")
+    cursor = int(last_event_id) + 1 if last_event_id and last_event_id.isdigit() else 0
+
+    async def stream():
+        nonlocal cursor
+        while True:
+            events = await asyncio.to_thread(job.wait_events, cursor, SSE_KEEPALIVE)
+            if not events:
+                yield ": keep-alive\n\n"
+                continue
+            for event in events:
+                data = json.dumps({k: v for k, v in event.items() if k != "event"}, ensure_ascii=False)
+                yield f"id: {cursor}\nevent: {event['event']}\ndata: {data}\n\n"
+                cursor += 1
+                if event["event"] in TERMINAL_EVENTS:
+                    return
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.delete("/upload/jobs/{job_id}", response_model=UploadJobResponse)
+async def cancel_upload_job(job_id: str) -> UploadJobResponse:
+    job = upload_jobs.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Zadanie '{job_id}' nie istnieje.")
+    return UploadJobResponse(job_id=job.id, status=job.status)
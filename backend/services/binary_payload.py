@@ -0,0 +1,144 @@
+"""Binary encoding of the trains payload (``application/vnd.timetable.binary``).
+
+Layout (little-endian)::
+
+    b"TTB1" | uint32 header length | header JSON (UTF-8, space-padded to 8 bytes) | buffers
+
+Every buffer starts at an 8-byte aligned offset of the message, so the
+client can view it as a typed array without copying. The frontend decoder
+(binary.ts) still expands the views into the same objects as the JSON
+formats; the gain is the smaller message and no JSON parsing of the bulk. ``header["buffers"]``
+maps names to ``{"dtype", "offset", "length"}`` (length in items).
+
+The header carries the payload's small parts as JSON. The bulk travels in
+buffers:
+
+- plot: ``ms`` (int64), ``km`` (float64), ``station`` and ``stop`` (indexes
+  into ``plot_dicts`` as in the columnar format) for all series back to back;
+  series ``i`` is ``series_offsets[i]:series_offsets[i + 1]`` and its name,
+  train and sheet index are ``header["plot_series"][i]``;
+- grid: ``grid_cells`` is the rows x trains matrix (trains in column_defs
+  order) of codes into the ``grid_times`` dictionary (0 = empty cell),
+  ``grid_decimals`` the matching float64 matrix (NaN = no decimal);
+  ``header["grid_rows"]`` keeps each row's km / stacja / _station_raw /
+  _stop_type.
+
+Plot buffers are the cached per-sheet arrays of the payload builder
+(``plot_format="arrays"``), joined once.
+"""
+from __future__ import annotations
+
+import json
+import struct
+from typing import Any
+
+import numpy as np
+
+MAGIC = b"TTB1"
+
+_ROW_META = ("km", "stacja", "_station_raw", "_stop_type")
+
+
+def encode_trains_binary(payload: dict[str, Any]) -> bytes:
+    """Encode a payload built with ``plot_format="arrays"``."""
+    header = {k: v for k, v in payload.items() if k not in ("grid_rows", "plot_series")}
+    header.setdefault("plot_dicts", {"stations": [], "sheets": [], "stop_types": []})
+    header["plot_format"] = "binary"
+    buffers: dict[str, np.ndarray] = {}
+
+    # plot
+    sheet_pos = {name: i for i, name in enumerate(header["plot_dicts"]["sheets"])}
+    sheets = payload["plot_series"]
+    header["plot_series"] = [
+        {"name": f"{tn} ({a.sheet})", "train": tn, "sheet": sheet_pos[a.sheet]}
+        for a in sheets for tn in a.trains
+    ]
+    starts = np.cumsum([0] + [len(a.ms) for a in sheets])
+    buffers["series_offsets"] = np.concatenate(
+        [a.offsets[:-1] + start for a, start in zip(sheets, starts)] + [starts[-1:]]
+    ).astype(np.int32)
+    for field, dtype in (("ms", np.int64), ("km", np.float64), ("station", np.int32), ("stop", np.int16)):
+        buffers[field] = np.concatenate([getattr(a, field) for a in sheets] or [np.empty(0, dtype)])
+
+    # grid
+    trains = [c["field"] for c in payload["column_defs"][2:]]
+    rows = payload["grid_rows"]
+    header["grid_rows"] = [{k: row[k] for k in _ROW_META} for row in rows]
+    times: dict[str, int] = {"": 0}
+    cells = [times.setdefault(row[tn], len(times)) for row in rows for tn in trains]
+    decimals = [row["_decimals"].get(tn, np.nan) for row in rows for tn in trains]
+    header["grid_times"] = list(times)
+    buffers["grid_cells"] = np.array(cells, dtype=np.uint16 if len(times) < 1 << 16 else np.int32)
+    buffers["grid_decimals"] = np.array(decimals, dtype=np.float64)
+
+    return _pack(header, buffers)
+
+
+def _pack(header: dict[str, Any], buffers: dict[str, np.ndarray]) -> bytes:
+    layout = {name: {"dtype": a.dtype.name, "offset": 0, "length": len(a)} for name, a in buffers.items()}
+    header["buffers"] = layout
+    # room for the offsets' digits, filled in below
+    size = len(json.dumps(header, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+    pos = data_start = _align(8 + size + 16 * len(buffers))
+    for name, array in buffers.items():
+        layout[name]["offset"] = pos
+        pos = _align(pos + array.nbytes)
+    head = json.dumps(header, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    head = head.ljust(data_start - 8)
+
+    out = bytearray(pos)
+    out[:8] = MAGIC + struct.pack("<I", len(head))
+    out[8:data_start] = head
+    for name, array in buffers.items():
+        offset = layout[name]["offset"]
+        out[offset:offset + array.nbytes] = array.astype(array.dtype.newbyteorder("<"), copy=False).tobytes()
+    return bytes(out)
+
+
+def _align(n: int) -> int:
+    return (n + 7) & ~7
+
+
+def decode_trains_binary(data: bytes) -> dict[str, Any]:
+    """The points-shaped payload back from encode_trains_binary (reference
+    decoder; the frontend does the same in binary.ts)."""
+    if data[:4] != MAGIC:
+        raise ValueError("Nieprawidlowy format danych binarnych.")
+    (size,) = struct.unpack_from("<I", data, 4)
+    header = json.loads(data[8:8 + size])
+    buf = {
+        name: np.frombuffer(data, dtype=np.dtype(entry["dtype"]).newbyteorder("<"),
+                            count=entry["length"], offset=entry["offset"])
+        for name, entry in header.pop("buffers").items()
+    }
+
+    dicts = header.pop("plot_dicts")
+    header.pop("plot_format")
+    offsets = buf["series_offsets"].tolist()
+    ms, km = buf["ms"].tolist(), buf["km"].tolist()
+    station, stop = buf["station"].tolist(), buf["stop"].tolist()
+    plot_series = []
+    for i, s in enumerate(header.pop("plot_series")):
+        sheet = dicts["sheets"][s["sheet"]]
+        plot_series.append({"name": s["name"], "points": [
+            {"value": [ms[j], km[j]], "station": dicts["stations"][station[j]],
+             "train": s["train"], "sheet": sheet, "stopType": dicts["stop_types"][stop[j]]}
+            for j in range(offsets[i], offsets[i + 1])
+        ]})
+
+    trains = [c["field"] for c in header["column_defs"][2:]]
+    times = header.pop("grid_times")
+    cells = buf["grid_cells"].tolist()
+    decimals = buf["grid_decimals"].tolist()
+    grid_rows = []
+    for r, meta in enumerate(header.pop("grid_rows")):
+        row = dict(meta)
+        row["_decimals"] = {}
+        for c, tn in enumerate(trains):
+            row[tn] = times[cells[r * len(trains) + c]]
+            dec = decimals[r * len(trains) + c]
+            if dec == dec:
+                row["_decimals"][tn] = dec
+        grid_rows.append(row)
+
+    return {**header, "grid_rows": grid_rows, "plot_series": plot_series}
@@ -1,28 +1,286 @@
 from __future__ import annotations
 
 import json
+from dataclasses import dataclass, field
 from typing import Any
 
+import pandas as pd
+
+from backend.config import EXTRACT_WORKERS, HEADER_SEARCH_COLS, HEADER_SEARCH_ROWS, MAX_UNCOMPRESSED_BYTES
 from backend.models.session import SessionState
-from excel_loader import read_workbook, extract_excel_data
+from backend.services.parse_cache import file_digest, parse_cache
+from excel_loader import (
+    SheetCallback,
+    WorkbookSource,
+    check_workbook_size,
+    extract_excel_data,
+    extract_sheets,
+    read_workbook,
+    workbook_fingerprints,
+)
+from timetable_store import SheetTimetable, ensure_timetable
+from utils import LabelTable
+
+_HEADER_BAND = (HEADER_SEARCH_ROWS, HEADER_SEARCH_COLS)
+
+
+@dataclass
+class ParsedWorkbook:
+    """A parsed upload, ready for ``store_excel``."""
+
+    data: dict[str, Any]  # extraction result; lacks entries for ``reused`` sheets
+    sheet_names: list[str]
+    fingerprints: dict[str, str]  # sheet -> content fingerprint
+    pending: dict[str, tuple[pd.DataFrame, set[int]]] = field(default_factory=dict)  # lazy mode
+    reused: list[str] = field(default_factory=list)  # sheets kept from the session (incremental)
+
+
+def load_excel(
+    source: WorkbookSource,
+    filename: str,
+    session: SessionState,
+    engine: str = "openpyxl",
+    lazy: bool = False,
+    incremental: bool = False,
+) -> dict[str, Any]:
+    """Parse an Excel file and populate session state. Returns metadata.
+
+    ``source`` is the workbook as bytes or a seekable binary file (the
+    spooled upload is read in place). See ``parse_excel`` for the options.
+    """
+    parsed = parse_excel(source, engine=engine, lazy=lazy, base=session if incremental else None)
+    return store_excel(parsed, filename, session)
+
+
+def parse_excel(
+    source: WorkbookSource,
+    engine: str = "openpyxl",
+    lazy: bool = False,
+    on_read: SheetCallback | None = None,
+    on_extract: SheetCallback | None = None,
+    base: SessionState | None = None,
+) -> ParsedWorkbook:
+    """Read and extract a workbook without touching the session.
+
+    Workbooks that unzip to more than ``MAX_UNCOMPRESSED_BYTES`` raise
+    ``WorkbookTooLarge`` before any parsing.
+    ``engine`` picks the workbook reader (see ``excel_loader.ENGINES``).
+    Results are cached by file content, so re-uploading the same workbook
+    returns a fresh copy of the earlier extraction without parsing again.
+    ``on_read`` / ``on_extract`` receive per-sheet progress (not called on
+    a cache hit).
+
+    With ``lazy`` only the first (reference) sheet is extracted up front; the
+    other sheets stay pending until ``ensure_sheets_loaded`` is called for them.
+    Lazy extractions are not added to the parse cache, since pending sheets
+    are extracted later, after the user may already have edited loaded ones.
+
+    With ``base`` (the current session) the upload is treated as a revision
+    of the loaded workbook: sheets whose fingerprint matches are reused from
+    the session as they are (edits included) and only the others are read
+    and extracted. Reuse requires an unchanged reference (first) sheet,
+    since every sheet is checked against its station list; ``lazy`` does not
+    apply to the changed sheets.
+    """
+    check_workbook_size(source, MAX_UNCOMPRESSED_BYTES)
+    fingerprints = workbook_fingerprints(source)
+    reused = _reusable_sheets(base, fingerprints) if base is not None else []
+    cache_key = (file_digest(source), engine)
+    data = parse_cache.get(cache_key)
+    pending: dict[str, tuple[pd.DataFrame, set[int]]] = {}
+    if data is None and reused:
+        changed = [name for name in fingerprints if name not in reused]
+        data = _extract_changed_sheets(source, engine, changed, base["station_map"], on_read, on_extract)
+    elif data is None:
+        sheet_names, sheets, hidden_cols = read_workbook(source, engine=engine, on_sheet=on_read)
+        if lazy and len(sheet_names) > 1:
+            data = _extract_first_sheet(sheet_names, sheets, hidden_cols, on_extract)
+            pending = {name: (sheets[name], hidden_cols.get(name, set())) for name in sheet_names[1:]}
+        else:
+            data = extract_excel_data(
+                sheet_names, sheets, hidden_cols=hidden_cols, workers=EXTRACT_WORKERS, on_sheet=on_extract,
+                header_band=_HEADER_BAND,
+            )
+            parse_cache.put(cache_key, data)
+    sheet_names = [e["sheet"] for e in data["sheets_data"]] if not reused else list(fingerprints)
+    return ParsedWorkbook(data, sheet_names, fingerprints, pending, reused)
+
+
+def _reusable_sheets(base: SessionState, fingerprints: dict[str, str]) -> list[str]:
+    """Loaded sheets of ``base`` whose content is unchanged in the new upload."""
+    previous = base.get("sheet_fingerprints") or {}
+    status = base.get("sheet_status") or {}
+    loaded_names = [e["sheet"] for e in base.get("sheets_data", [])]
+    names = list(fingerprints)
+    if not names or not loaded_names or loaded_names[0] != names[0]:
+        return []
+    if previous.get(names[0]) != fingerprints[names[0]]:
+        return []
+    return [name for name in names if previous.get(name) == fingerprints[name] and status.get(name) == "loaded"]
+
 
+def _extract_changed_sheets(
+    source: WorkbookSource,
+    engine: str,
+    changed: list[str],
+    reference_stations: dict[str, float],
+    on_read: SheetCallback | None,
+    on_extract: SheetCallback | None,
+) -> dict[str, Any]:
+    """Read and extract only ``changed``, checked against the loaded reference stations."""
+    if not changed:
+        return {"station_maps": {}, "sheet_mismatches": {}, "sheets_data": []}
+    _, sheets, hidden_cols = read_workbook(source, engine=engine, on_sheet=on_read, only_sheets=set(changed))
+    return extract_excel_data(
+        changed, sheets, hidden_cols=hidden_cols, workers=EXTRACT_WORKERS, on_sheet=on_extract,
+        reference_stations=reference_stations, header_band=_HEADER_BAND,
+    )
 
-def load_excel(file_bytes: bytes, filename: str, session: SessionState) -> dict[str, Any]:
-    """Parse an Excel file and populate session state. Returns metadata."""
-    sheet_names, sheets, hidden_cols = read_workbook(file_bytes)
-    data = extract_excel_data(sheet_names, sheets, hidden_cols=hidden_cols)
 
-    session["station_map"] = data["station_map"]
-    session["station_maps"] = data.get("station_maps", {})
-    session["station_check"] = data["station_check"]
-    session["sheets_data"] = data["sheets_data"]
+def store_excel(parsed: ParsedWorkbook, filename: str, session: SessionState) -> dict[str, Any]:
+    """Put a parsed workbook into the session. Returns metadata.
+
+    The session contents are replaced, except for sheets listed in
+    ``parsed.reused``: those keep their current entries, and the train
+    colors and selected sheet carry over too.
+    """
+    data, names, reused = parsed.data, parsed.sheet_names, set(parsed.reused)
+    if reused:
+        current = {e["sheet"]: e for e in session.get("sheets_data", [])}
+        new = {e["sheet"]: e for e in data["sheets_data"]}
+        old_maps, old_mismatches = session.get("station_maps", {}), session.get("sheet_mismatches", {})
+        session["sheets_data"] = [current[n] if n in reused else new[n] for n in names]
+        session["station_maps"] = {
+            n: (old_maps if n in reused else data["station_maps"]).get(n, {}) for n in names
+        }
+        sheet_mismatches = {
+            n: (old_mismatches if n in reused else data["sheet_mismatches"]).get(n, []) for n in names
+        }
+        mismatches = [m for n in names for m in sheet_mismatches[n]]
+        session["station_check"] = {"ok": len(mismatches) == 0, "mismatches": mismatches}
+        session["sheet_mismatches"] = sheet_mismatches
+        session["train_colors"] = session.get("train_colors", {})
+        selected = session.get("selected_sheet", "")
+    else:
+        session["station_map"] = data["station_map"]
+        session["station_maps"] = data.get("station_maps", {})
+        session["station_check"] = data["station_check"]
+        session["sheet_mismatches"] = dict(data.get("sheet_mismatches", {}))
+        session["sheets_data"] = data["sheets_data"]
+        session["train_colors"] = {}
+        selected = ""
     session["uploaded_name"] = filename
-    session["train_colors"] = {}
+    session["sheet_fingerprints"] = parsed.fingerprints
+    _set_pending_sheets(session, parsed.pending)
+    _intern_labels(session, LabelTable())
+
+    session["selected_sheet"] = selected if selected in names else (names[0] if names else "")
+
+    return {
+        "changed": True,
+        "sheets": names,
+        "reused": [n for n in names if n in reused],
+        "reparsed": [n for n in names if n not in reused and n not in parsed.pending],
+    }
+
+
+def _extract_first_sheet(
+    sheet_names: list[str],
+    sheets: dict[str, pd.DataFrame],
+    hidden_cols: dict[str, set[int]],
+    on_sheet: SheetCallback | None = None,
+) -> dict[str, Any]:
+    """Like ``extract_excel_data`` but only the first sheet gets its trains;
+    the others are listed with no trains yet."""
+    first = sheet_names[0]
+    data = extract_excel_data(
+        [first], {first: sheets[first]}, hidden_cols=hidden_cols, on_sheet=on_sheet, header_band=_HEADER_BAND,
+    )
+    data["sheets_data"] += [{"sheet": name, "trains": SheetTimetable()} for name in sheet_names[1:]]
+    return data
+
+
+def _set_pending_sheets(
+    session: SessionState,
+    pending: dict[str, tuple[pd.DataFrame, set[int]]],
+) -> None:
+    """Record which sheets still need extraction (empty = everything loaded)."""
+    sheet_names = [e["sheet"] for e in session.get("sheets_data", [])]
+    session["sheet_status"] = {name: ("pending" if name in pending else "loaded") for name in sheet_names}
+    if pending:
+        session["_lazy"] = {
+            "pending": pending,
+            "reference": set(session.get("station_map", {}).keys()),
+        }
+    else:
+        session["_lazy"] = None
+
+
+def _intern_labels(session: SessionState, labels: LabelTable) -> None:
+    """Share one string object per station / train label across all sheets.
+
+    The table is kept in the session so later edits intern into it as well.
+    """
+    for entry in session.get("sheets_data", []):
+        ensure_timetable(entry).intern_labels(labels)
+    session["station_map"] = labels.intern_keys(session.get("station_map", {}))
+    session["station_maps"] = {
+        sheet: labels.intern_keys(m) for sheet, m in session.get("station_maps", {}).items()
+    }
+    session["_labels"] = labels
+
+
+def pending_sheets(session: SessionState) -> list[str]:
+    """Sheets of a lazily loaded workbook that have not been extracted yet."""
+    status = session.get("sheet_status") or {}
+    return [name for name, state in status.items() if state == "pending"]
+
+
+def ensure_sheets_loaded(session: SessionState, sheets: list[str] | None = None) -> list[str]:
+    """Extract pending sheets (all of them when ``sheets`` is None).
+
+    Returns the names that were extracted by this call.
+    """
+    lazy = session.get("_lazy")
+    if not lazy:
+        return []
+    wanted = set(sheets) if sheets is not None else set(lazy["pending"])
+    names = [name for name in pending_sheets(session) if name in wanted]
+    if not names:
+        return []
+
+    frames = {name: lazy["pending"][name][0] for name in names}
+    hidden = {name: lazy["pending"][name][1] for name in names}
+    sheets_data = session.get("sheets_data", [])
+    station_maps = session.get("station_maps", {})
+    status = session["sheet_status"]
+    by_sheet = session.get("sheet_mismatches", {})
+    entries = {e["sheet"]: e for e in sheets_data}
 
-    sheet_names_out = [e["sheet"] for e in data["sheets_data"]]
-    session["selected_sheet"] = sheet_names_out[0] if sheet_names_out else ""
+    for sheet, (sheet_map, sheet_mismatches, trains) in extract_sheets(
+        names, frames, hidden, lazy["reference"], workers=EXTRACT_WORKERS, header_band=_HEADER_BAND,
+    ):
+        entries[sheet]["trains"] = trains
+        station_maps[sheet] = sheet_map
+        by_sheet[sheet] = sheet_mismatches
+        status[sheet] = "loaded"
+        del lazy["pending"][sheet]
 
-    return {"changed": True, "sheets": sheet_names_out}
+    mismatches = [m for e in sheets_data for m in by_sheet.get(e["sheet"], [])]
+    session["station_check"] = {"ok": len(mismatches) == 0, "mismatches": mismatches}
+    session["sheet_mismatches"] = by_sheet
+    session["station_maps"] = station_maps
+    session["sheets_data"] = sheets_data
+    session["sheet_status"] = status
+    labels = session.get("_labels")
+    if labels is None:
+        labels = session["_labels"] = LabelTable()
+    for sheet in names:
+        entries[sheet]["trains"].intern_labels(labels)
+        station_maps[sheet] = labels.intern_keys(station_maps[sheet])
+    if not lazy["pending"]:
+        session["_lazy"] = None
+    return names
 
 
 def load_project_json(file_bytes: bytes, session: SessionState) -> dict[str, Any]:
@@ -34,11 +292,17 @@ def load_project_json(file_bytes: bytes, session: SessionState) -> dict[str, Any
     if "sheets_data" not in project:
         raise ValueError("Plik projektu nie zawiera danych arkuszy (sheets_data).")
 
+    for entry in project["sheets_data"]:
+        ensure_timetable(entry)
     session["sheets_data"] = project["sheets_data"]
     session["station_map"] = project.get("station_map", {})
     session["station_maps"] = project.get("station_maps", {})
     session["train_colors"] = project.get("train_colors", {})
     session["uploaded_name"] = project.get("uploaded_name", "")
     session["selected_sheet"] = project.get("selected_sheet", "")
+    session["sheet_fingerprints"] = {}
+    session["sheet_mismatches"] = {}
+    _set_pending_sheets(session, {})
+    _intern_labels(session, LabelTable())
     sheet_names = [e["sheet"] for e in project["sheets_data"]]
     return {"changed": True, "sheets": sheet_names}
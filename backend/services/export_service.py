@@ -9,6 +9,7 @@ from typing import Any
 from openpyxl import Workbook
 from openpyxl.styles import PatternFill, Font, Border, Side, Alignment
 
+from timetable_store import as_records
 from utils import parse_time, format_time_hhmm, normalize
 
 
@@ -142,7 +143,9 @@ def build_project_json(session: Any) -> bytes:
         "selected_sheet": session.get("selected_sheet", ""),
         "station_map": session.get("station_map", {}),
         "station_maps": session.get("station_maps", {}),
-        "sheets_data": session.get("sheets_data", []),
+        "sheets_data": [
+            {**entry, "trains": as_records(entry.get("trains"))} for entry in session.get("sheets_data", [])
+        ],
         "train_colors": session.get("train_colors", {}),
     }
     return json.dumps(project, ensure_ascii=False, indent=2).encode("utf-8")
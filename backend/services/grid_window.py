@@ -0,0 +1,82 @@
+"""Windowed grid for the virtualised table (GET /api/trains/grid).
+
+The active sheet's grid is kept sparse (build_sparse_grid) per
+``(version, selected_sheet)``; a window of rows x train columns returns only
+its non-empty cells. Column defs and row labels come from a separate call
+the client revalidates with the version ETag, so they are only sent again
+after the data changed.
+"""
+from __future__ import annotations
+
+import threading
+import zlib
+from typing import Any
+
+import numpy as np
+
+from backend.models.session import SessionState
+from backend.services.plot_data import build_sparse_grid
+
+_CACHE_KEY = "sparse_grid"
+
+_lock = threading.Lock()
+
+
+def sparse_grid(session: SessionState) -> dict[str, Any]:
+    """build_sparse_grid(session), memoized per version. Treat as read-only."""
+    key = (session.version, session.get("selected_sheet", ""))
+    with _lock:
+        cached = session.cache.get(_CACHE_KEY)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+    grid = build_sparse_grid(session)
+    with _lock:
+        session.cache[_CACHE_KEY] = (key, grid)
+    return grid
+
+
+def grid_etag(session: SessionState) -> str:
+    """Validator of grid_columns: the session id keeps an ETag from before a
+    restart or reset (versions start over) from matching the new data."""
+    sheet = session.get("selected_sheet", "")
+    return f'"{session.id}-{session.version}-{zlib.crc32(sheet.encode("utf-8")):08x}"'
+
+
+def grid_columns(session: SessionState) -> dict[str, Any]:
+    """Column defs and row labels of the active sheet's grid."""
+    grid = sparse_grid(session)
+    return {
+        "version": session.version,
+        "selected_sheet": session.get("selected_sheet", ""),
+        "column_defs": grid["column_defs"],
+        "rows": grid["rows"],
+    }
+
+
+def grid_window(
+    session: SessionState,
+    row_start: int = 0,
+    row_end: int | None = None,
+    col_start: int = 0,
+    col_end: int | None = None,
+) -> dict[str, Any]:
+    """Non-empty cells in rows [row_start, row_end) and train columns
+    [col_start, col_end) (0 = first train), as parallel arrays."""
+    grid = sparse_grid(session)
+    row_end = len(grid["rows"]) if row_end is None else min(row_end, len(grid["rows"]))
+    col_end = len(grid["column_defs"]) - 2 if col_end is None else col_end
+
+    rows, cols = grid["row"], grid["col"]
+    lo, hi = np.searchsorted(rows, [row_start, row_end])
+    idx = lo + np.flatnonzero((cols[lo:hi] >= col_start) & (cols[lo:hi] < col_end))
+    decimals = grid["decimal"][idx]
+    text = grid["text"]
+    return {
+        "version": session.version,
+        "row_start": row_start, "row_end": row_end,
+        "col_start": col_start, "col_end": col_end,
+        "row": rows[idx].tolist(),
+        "col": cols[idx].tolist(),
+        "text": [text[i] for i in idx.tolist()],
+        "decimal": [None if d != d else d for d in decimals.tolist()],
+    }
@@ -0,0 +1,86 @@
+"""Content-addressed cache of extracted workbooks.
+
+Re-uploading the same file (page reload, resetting edits) skips
+read_workbook + extract_excel_data. Entries are keyed by a hash of the file
+bytes and kept pickled: the byte size is known for the memory cap, and every
+hit unpickles into a fresh deep copy that the session can mutate freely.
+"""
+from __future__ import annotations
+
+import hashlib
+import pickle
+import threading
+from collections import OrderedDict
+from typing import Any, BinaryIO, Hashable
+
+from backend.config import PARSE_CACHE_MAX_BYTES
+
+_DIGEST_CHUNK = 1024 * 1024
+
+
+def file_digest(source: bytes | BinaryIO) -> str:
+    """SHA-256 of the upload; file objects are hashed in chunks and rewound."""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return hashlib.sha256(source).hexdigest()
+    digest = hashlib.sha256()
+    source.seek(0)
+    for chunk in iter(lambda: source.read(_DIGEST_CHUNK), b""):
+        digest.update(chunk)
+    source.seek(0)
+    return digest.hexdigest()
+
+
+class ParseCache:
+    """LRU cache of extraction results bounded by total pickled size."""
+
+    def __init__(self, max_bytes: int) -> None:
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[Hashable, bytes] = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> dict[str, Any] | None:
+        with self._lock:
+            blob = self._entries.get(key)
+            if blob is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return pickle.loads(blob)
+
+    def put(self, key: Hashable, data: dict[str, Any]) -> None:
+        blob = pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(blob) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= len(old)
+            self._entries[key] = blob
+            self._size += len(blob)
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._entries),
+                "bytes": self._size,
+                "max_bytes": self.max_bytes,
+            }
+
+
+parse_cache = ParseCache(PARSE_CACHE_MAX_BYTES)
@@ -0,0 +1,121 @@
+"""Memoized trains payload.
+
+SessionState.version goes up on every data write to the session (upload,
+project load, edits, colors). Selecting a sheet is a view change
+(``VIEW_KEYS``) and keeps the version, which is why the selected sheet is
+part of the key: a payload built for ``(version, selected_sheet,
+plot_format)`` stays valid until the next data write. Reads in between -
+GET /api/trains after an edit, switching back and forth between sheets -
+reuse the payload and its serialized body instead of rebuilding.
+
+Wire formats: ``points`` (plain JSON), ``columnar`` (JSON with parallel
+arrays per series) and ``binary`` (see binary_payload).
+"""
+from __future__ import annotations
+
+import json
+import threading
+from typing import Any
+
+from fastapi.responses import Response
+
+from backend.models.session import SessionState
+from backend.services.binary_payload import encode_trains_binary
+from backend.services.plot_data import build_trains_payload
+
+_CACHE_KEY = "trains_payload"
+VERSION_HEADER = "X-Data-Version"
+
+COLUMNAR_MEDIA_TYPE = "application/vnd.timetable.columnar+json"
+BINARY_MEDIA_TYPE = "application/vnd.timetable.binary"
+
+
+def _json_body(payload: dict[str, Any]) -> bytes:
+    # same encoding as FastAPI's JSONResponse
+    return json.dumps(
+        payload, ensure_ascii=False, allow_nan=False, separators=(",", ":"),
+    ).encode("utf-8")
+
+
+# wire format -> (plot_format of the payload builder, media type, encoder)
+WIRE_FORMATS = {
+    "points": ("points", "application/json", _json_body),
+    "columnar": ("columnar", COLUMNAR_MEDIA_TYPE, _json_body),
+    "binary": ("arrays", BINARY_MEDIA_TYPE, encode_trains_binary),
+}
+
+_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "serialized": 0}
+
+
+class _Entry:
+    __slots__ = ("payload", "body")
+
+    def __init__(self, payload: dict[str, Any]) -> None:
+        self.payload = payload
+        self.body: bytes | None = None
+
+
+def _entry(session: SessionState, plot_format: str) -> _Entry:
+    version = session.version
+    key = (version, session.get("selected_sheet", ""), plot_format)
+    with _lock:
+        entries: dict[tuple, _Entry] = session.cache.setdefault(_CACHE_KEY, {})
+        entry = entries.get(key)
+        if entry is not None:
+            _stats["hits"] += 1
+            return entry
+        _stats["misses"] += 1
+    entry = _Entry(build_trains_payload(session, plot_format))
+    with _lock:
+        # older versions can never be asked for again
+        entries = {k: e for k, e in session.cache.get(_CACHE_KEY, {}).items() if k[0] == version}
+        entries[key] = entry
+        session.cache[_CACHE_KEY] = entries
+    return entry
+
+
+def trains_payload(session: SessionState, plot_format: str = "points") -> dict[str, Any]:
+    """build_trains_payload(session, plot_format), memoized. Treat the result as read-only."""
+    return _entry(session, plot_format).payload
+
+
+def cached_payload(session: SessionState, plot_formats: tuple[str, ...]) -> tuple[str, dict[str, Any]] | None:
+    """(plot_format, payload) of the first of ``plot_formats`` already built
+    for the session's current version and sheet, without building anything."""
+    prefix = (session.version, session.get("selected_sheet", ""))
+    with _lock:
+        entries: dict[tuple, _Entry] = session.cache.get(_CACHE_KEY, {})
+        for plot_format in plot_formats:
+            entry = entries.get((*prefix, plot_format))
+            if entry is not None:
+                return plot_format, entry.payload
+    return None
+
+
+def data_version(session: SessionState) -> str:
+    """``X-Data-Version`` token, ``"{session id}:{version}"``: versions start
+    over with every new session (restart, reset), so the id keeps a token
+    from an earlier session from matching."""
+    return f"{session.id}:{session.version}"
+
+
+def trains_payload_response(session: SessionState, wire_format: str = "points") -> Response:
+    """The payload as a response in ``wire_format``, serialized once per version.
+
+    ``X-Data-Version`` tells the client which version it holds (the base
+    for edit deltas, see payload_delta).
+    """
+    plot_format, media_type, encode = WIRE_FORMATS[wire_format]
+    version = data_version(session)
+    entry = _entry(session, plot_format)
+    if entry.body is None:
+        entry.body = encode(entry.payload)
+        _stats["serialized"] += 1
+    return Response(content=entry.body, media_type=media_type,
+                    headers={VERSION_HEADER: version})
+
+
+def payload_cache_stats() -> dict[str, int]:
+    with _lock:
+        return dict(_stats)
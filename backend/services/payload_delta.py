@@ -0,0 +1,158 @@
+"""Edit responses as deltas against the payload the client already has.
+
+The client sends the data version token of its current payload
+(``X-Data-Version`` of GET /api/trains, see ``data_version``) as
+``base_version``. If that is still the session's, the edit response only
+carries what changed:
+
+- ``row_cells``: changed grid cells, ``{"row": i, "cells": {train: text},
+  "decimals": {train: hours or None}}``;
+- ``series``: replaced plot series by name (``"{train} ({sheet})"``),
+  ``None`` for removed ones;
+- ``grid_rows`` / ``column_defs`` in full only when the grid's shape
+  changed (a train or a p/o row appeared or disappeared);
+- axes and pending sheets.
+
+``base_version`` and ``version`` in the response let the client check that
+the delta applies to what it holds. A token of another version or another
+session (server restart, reset) gets the full payload instead.
+
+The diff runs in whichever plot format is already cached for the base
+version (the frontend fetches ``binary``, built as ``arrays``), and the
+payload after the edit is built in that same format, so an edit costs one
+payload build. Changed series are sent in the points shape either way.
+"""
+from __future__ import annotations
+
+from typing import Any
+
+import numpy as np
+
+from backend.models.session import SessionState
+from backend.services.payload_cache import cached_payload, data_version, trains_payload
+
+# Plot formats to diff in, in order of preference: with arrays, sheets the
+# edit did not touch are skipped by identity (series cache)
+_BASE_FORMATS = ("arrays", "points", "columnar")
+
+# (plot_format, payload)
+Base = tuple[str, dict[str, Any]]
+
+
+def delta_base(session: SessionState, base_version: str | None) -> Base | None:
+    """The payload the client holds, taken before an edit; None if it's out of date."""
+    if base_version is None or base_version != data_version(session):
+        return None
+    cached = cached_payload(session, _BASE_FORMATS)
+    if cached is not None:
+        return cached
+    return _BASE_FORMATS[0], trains_payload(session, _BASE_FORMATS[0])
+
+
+def payload_delta(
+    session: SessionState,
+    base_version: str,
+    base: Base,
+) -> dict[str, Any]:
+    """Delta from ``base`` (see delta_base) to the session's current payload."""
+    delta: dict[str, Any] = {"base_version": base_version, "version": data_version(session)}
+    plot_format, old = base
+    new = trains_payload(session, plot_format)
+    if (
+        new["station_items"] != old["station_items"]
+        or new["selected_sheet"] != old["selected_sheet"]
+        or new["column_defs"] != old["column_defs"]
+        or len(new["grid_rows"]) != len(old["grid_rows"])
+        or any(a["stacja"] != b["stacja"] for a, b in zip(new["grid_rows"], old["grid_rows"]))
+    ):
+        delta["grid_rows"] = new["grid_rows"]
+        delta["column_defs"] = new["column_defs"]
+        delta["station_items"] = new["station_items"]
+    else:
+        delta["row_cells"] = _row_cells(old["grid_rows"], new["grid_rows"], new["column_defs"])
+
+    if plot_format == "points":
+        delta["series"] = _series_changes(old["plot_series"], new["plot_series"])
+    else:
+        delta["series"] = _column_series_changes(old, new, plot_format)
+    for key in ("x_min_ms", "x_max_ms", "train_colors", "pending_sheets"):
+        delta[key] = new[key]
+    return delta
+
+
+def _row_cells(old_rows: list[dict], new_rows: list[dict], column_defs: list[dict]) -> list[dict]:
+    trains = [c["field"] for c in column_defs[2:]]
+    changes: list[dict] = []
+    for i, (old, new) in enumerate(zip(old_rows, new_rows)):
+        if old == new:
+            continue
+        old_dec, new_dec = old["_decimals"], new["_decimals"]
+        changed = [tn for tn in trains if old[tn] != new[tn] or old_dec.get(tn) != new_dec.get(tn)]
+        changes.append({
+            "row": i,
+            "cells": {tn: new[tn] for tn in changed},
+            "decimals": {tn: new_dec.get(tn) for tn in changed},
+        })
+    return changes
+
+
+def _series_changes(old_series: list[dict], new_series: list[dict]) -> dict[str, dict | None]:
+    old_by_name = {s["name"]: s for s in old_series}
+    changes: dict[str, dict | None] = {}
+    for s in new_series:
+        old = old_by_name.pop(s["name"], None)
+        # series of unchanged sheets are the very same objects (series cache)
+        if old is not s and old != s:
+            changes[s["name"]] = s
+    for name in old_by_name:
+        changes[name] = None
+    return changes
+
+
+def _column_series_changes(old: dict[str, Any], new: dict[str, Any], plot_format: str) -> dict[str, dict | None]:
+    """_series_changes for the columnar / arrays formats; changed series in the points shape."""
+    same_dicts = old["plot_dicts"] == new["plot_dicts"]
+    # per-sheet SeriesArrays of unchanged sheets are the very same objects
+    shared = {id(s) for s in old["plot_series"]} & {id(s) for s in new["plot_series"]}
+    old_by_name = dict(_series_columns(old, plot_format, shared))
+    changes: dict[str, dict | None] = {}
+    for name, columns in _series_columns(new, plot_format, shared):
+        previous = old_by_name.pop(name, None)
+        if previous is not None and (
+            _same_columns(previous, columns) if same_dicts
+            else _points(name, previous, old["plot_dicts"]) == _points(name, columns, new["plot_dicts"])
+        ):
+            continue
+        changes[name] = _points(name, columns, new["plot_dicts"])
+    for name in old_by_name:
+        changes[name] = None
+    return changes
+
+
+def _series_columns(payload: dict[str, Any], plot_format: str, skip: set[int]):
+    """(name, (train, sheet, ms, km, station, stop)) per series, leaving out
+    the SeriesArrays whose id is in ``skip``."""
+    if plot_format == "columnar":
+        sheets = payload["plot_dicts"]["sheets"]
+        for s in payload["plot_series"]:
+            yield s["name"], (s["train"], sheets[s["sheet"]], s["ms"], s["km"], s["station"], s["stop"])
+        return
+    for a in payload["plot_series"]:
+        if id(a) in skip:
+            continue
+        for i, tn in enumerate(a.trains):
+            lo, hi = a.offsets[i], a.offsets[i + 1]
+            yield f"{tn} ({a.sheet})", (tn, a.sheet, a.ms[lo:hi], a.km[lo:hi], a.station[lo:hi], a.stop[lo:hi])
+
+
+def _same_columns(a: tuple, b: tuple) -> bool:
+    return a[:2] == b[:2] and all(np.array_equal(x, y) for x, y in zip(a[2:], b[2:]))
+
+
+def _points(name: str, columns: tuple, dicts: dict[str, list]) -> dict[str, Any]:
+    tn, sheet, ms, km, station, stop = columns
+    stations, stop_types = dicts["stations"], dicts["stop_types"]
+    return {"name": name, "points": [
+        {"value": [m, k], "station": stations[st], "train": tn, "sheet": sheet, "stopType": stop_types[sp]}
+        for m, k, st, sp in zip(*(np.asarray(c).tolist() for c in (ms, km, station, stop)))
+    ]}
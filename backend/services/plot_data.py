@@ -4,100 +4,93 @@ Extracted from the rendering logic in app.py.
 """
 from __future__ import annotations
 
-from typing import Any
+import weakref
+from typing import Any, Iterable
 
+import numpy as np
+
+from timetable_store import NO_STOP, SheetTimetable, as_timetable
 from utils import parse_time, format_time_hhmm
 
 
-def _hours_to_ms(hours_float: float) -> int:
-    return int(float(hours_float) * 3_600_000.0)
+# plot_series shapes: one object per point, parallel lists per series, or
+# numpy arrays per sheet (SeriesArrays, for binary encoding)
+PLOT_FORMATS = ("points", "columnar", "arrays")
+
+# Stop-type codes of the columnar formats start with these; unusual labels
+# (from project files) follow, per payload (see _stop_types)
+_BASE_STOP_TYPES: tuple[str | None, ...] = (None, "p", "o")
+
+
+class SeriesArrays:
+    """One sheet's series as flat arrays, series i being
+    ``offsets[i]:offsets[i + 1]``; station and stop as in the columnar format."""
+
+    __slots__ = ("sheet", "trains", "offsets", "ms", "km", "station", "stop")
 
+    def __init__(self, sheet, trains, offsets, ms, km, station, stop) -> None:
+        self.sheet: str = sheet
+        self.trains: list[str] = trains
+        self.offsets: np.ndarray = offsets  # int32, len(trains) + 1
+        self.ms: np.ndarray = ms            # int64
+        self.km: np.ndarray = km            # float64
+        self.station: np.ndarray = station  # int32
+        self.stop: np.ndarray = stop        # int16
 
-def build_trains_payload(session: Any) -> dict[str, Any]:
-    """Return everything the frontend needs: grid rows, column defs, plot series, axes."""
+
+def build_trains_payload(session: Any, plot_format: str = "points") -> dict[str, Any]:
+    """Return everything the frontend needs: grid rows, column defs, plot series, axes.
+
+    With ``plot_format="columnar"`` each series is ``{"name", "train",
+    "sheet", "ms": [...], "km": [...], "station": [...], "stop": [...]}``
+    where sheet, station and stop are indexes into ``plot_dicts``;
+    ``plot_format="arrays"`` gives the same data as one SeriesArrays per sheet.
+    """
     sheets_data: list[dict] = session.get("sheets_data", [])
     station_map: dict = session.get("station_map", {})
-    station_maps: dict = session.get("station_maps", {})
     selected_sheet: str = session.get("selected_sheet", "")
     train_colors: dict = session.get("train_colors", {})
 
     if not station_map or not sheets_data:
         return _empty_payload(selected_sheet, train_colors)
 
-    # Active sheet data
-    active = next((e for e in sheets_data if e.get("sheet") == selected_sheet), {"trains": []})
-    trains_active: list[dict] = active.get("trains", [])
-
-    active_station_map = station_maps.get(selected_sheet, station_map)
-    station_items = sorted(active_station_map.items(), key=lambda kv: kv[1])
+    # Sheets of a lazily loaded workbook not extracted yet (plotted once loaded)
+    sheet_status: dict = session.get("sheet_status") or {}
+    pending = [name for name, state in sheet_status.items() if state == "pending"]
 
-    # Unique train numbers from active sheet
-    unique_trains: list[str] = list(dict.fromkeys(str(t["train_number"]) for t in trains_active))
+    # Active sheet data, its station axis and unique train numbers
+    trains_active, station_items, unique_trains = _active_sheet(session)
 
     # Build cell_map: {(station, km): {train_number: {"p": (display, decimal), ...}}}
-    cell_map: dict[tuple, dict] = {}
-    for rec in trains_active:
-        key = (rec["station"], float(rec["km"]))
-        bucket = cell_map.setdefault(key, {})
-        tdec = _safe_decimal(rec)
-        if tdec is not None:
-            display_val = format_time_hhmm(tdec)
-        else:
-            display_val = str(rec.get("time") or "")
-        stop_type = rec.get("stop_type", "p")
-        bucket.setdefault(str(rec["train_number"]), {})[stop_type] = (display_val, tdec)
-
-    dual_stations: set[tuple] = set()
-    for key, times_dict in cell_map.items():
-        if any("o" in v for v in times_dict.values()):
-            dual_stations.add(key)
+    cell_map = _build_cell_map(trains_active)
 
     # Grid rows
     grid_rows: list[dict] = []
-    for station, km in station_items:
-        times = cell_map.get((station, float(km)), {})
-        if (station, float(km)) in dual_stations:
-            row_p: dict[str, Any] = {"km": f"{km:.3f}", "stacja": f"{station} (p)",
-                                     "_station_raw": station, "_stop_type": "p", "_decimals": {}}
-            for tn in unique_trains:
-                cell = times.get(tn, {}).get("p")
-                row_p[tn] = cell[0] if cell else ""
-                if cell and cell[1] is not None:
-                    row_p["_decimals"][tn] = cell[1]
-            grid_rows.append(row_p)
-            row_o: dict[str, Any] = {"km": f"{km:.3f}", "stacja": f"{station} (o)",
-                                     "_station_raw": station, "_stop_type": "o", "_decimals": {}}
-            for tn in unique_trains:
-                cell = times.get(tn, {}).get("o")
-                row_o[tn] = cell[0] if cell else ""
-                if cell and cell[1] is not None:
-                    row_o["_decimals"][tn] = cell[1]
-            grid_rows.append(row_o)
-        else:
-            row: dict[str, Any] = {"km": f"{km:.3f}", "stacja": station,
-                                   "_station_raw": station, "_stop_type": None, "_decimals": {}}
-            for tn in unique_trains:
-                cell = times.get(tn, {}).get("p")
-                row[tn] = cell[0] if cell else ""
-                if cell and cell[1] is not None:
-                    row["_decimals"][tn] = cell[1]
-            grid_rows.append(row)
+    for meta, times, stop_type in _grid_layout(cell_map, station_items):
+        row: dict[str, Any] = {**meta, "_decimals": {}}
+        for tn in unique_trains:
+            cell = times.get(tn, {}).get(stop_type)
+            row[tn] = cell[0] if cell else ""
+            if cell and cell[1] is not None:
+                row["_decimals"][tn] = cell[1]
+        grid_rows.append(row)
 
     # Column defs
-    column_defs = [
-        {"field": "km", "headerName": "km", "editable": False, "width": 70},
-        {"field": "stacja", "headerName": "stacja", "editable": False, "width": 240},
-    ] + [{"field": c, "headerName": c, "editable": True, "width": 80} for c in unique_trains]
+    column_defs = _column_defs(unique_trains)
 
-    # Plot series (all sheets)
-    series, global_min_ms, global_max_ms = _build_plot_series(sheets_data, station_items)
+    # Plot series (all sheets); unchanged sheets come from the session's cache
+    cache = getattr(session, "cache", None)
+    series_cache = cache.setdefault("plot_series", {}) if cache is not None else None
+    series, global_min_ms, global_max_ms, stop_types = _build_plot_series(
+        sheets_data, station_items, series_cache, plot_format,
+    )
 
     pad_left = 2 * 60 * 60 * 1000
     pad_right = 30 * 60 * 1000
     x_min = max(0, (global_min_ms or 0) - pad_left)
     x_max = (global_max_ms or 24 * 3_600_000) + pad_right
 
-    return {
+    payload = {
         "grid_rows": grid_rows,
         "column_defs": column_defs,
         "plot_series": series,
@@ -106,7 +99,20 @@ def build_trains_payload(session: Any) -> dict[str, Any]:
         "x_max_ms": x_max,
         "train_colors": train_colors,
         "selected_sheet": selected_sheet,
+        "pending_sheets": pending,
     }
+    if plot_format != "points":
+        sheet_names = [e.get("sheet") for e in sheets_data]
+        if plot_format == "columnar":
+            sheet_pos = {name: i for i, name in enumerate(sheet_names)}
+            payload["plot_series"] = [{**s, "sheet": sheet_pos[s["sheet"]]} for s in series]
+        payload["plot_format"] = plot_format
+        payload["plot_dicts"] = {
+            "stations": [n for n, _k in station_items],
+            "sheets": sheet_names,
+            "stop_types": stop_types,
+        }
+    return payload
 
 
 def _safe_decimal(rec: dict) -> float | None:
@@ -120,86 +126,310 @@ def _safe_decimal(rec: dict) -> float | None:
     return float(parsed) if parsed is not None else None
 
 
+def _active_sheet(session: Any) -> tuple[SheetTimetable, list[tuple[str, float]], list[str]]:
+    """(timetable, station_items sorted by km, unique train numbers) of the selected sheet."""
+    sheets_data: list[dict] = session.get("sheets_data", [])
+    selected_sheet: str = session.get("selected_sheet", "")
+    active = next((e for e in sheets_data if e.get("sheet") == selected_sheet), {"trains": []})
+    trains_active = as_timetable(active.get("trains"))
+
+    active_station_map = session.get("station_maps", {}).get(selected_sheet, session.get("station_map", {}))
+    station_items = sorted(active_station_map.items(), key=lambda kv: kv[1])
+
+    train_labels = [str(v) for v in trains_active.labels("train_number")]
+    unique_trains: list[str] = list(dict.fromkeys(
+        train_labels[c] for c in trains_active.column("train_number").tolist()
+    ))
+    return trains_active, station_items, unique_trains
+
+
+def _column_defs(unique_trains: list[str]) -> list[dict]:
+    return [
+        {"field": "km", "headerName": "km", "editable": False, "width": 70},
+        {"field": "stacja", "headerName": "stacja", "editable": False, "width": 240},
+    ] + [{"field": c, "headerName": c, "editable": True, "width": 80} for c in unique_trains]
+
+
+def _grid_layout(
+    cell_map: dict[tuple, dict],
+    station_items: list[tuple[str, float]],
+) -> list[tuple[dict, dict, str]]:
+    """(row meta, {train: {stop_type: cell}}, stop_type of the row's cells) per
+    grid row: one row per station, two (p, o) for stations with departures."""
+    layout: list[tuple[dict, dict, str]] = []
+    for station, km in station_items:
+        times = cell_map.get((station, float(km)), {})
+        if any("o" in v for v in times.values()):
+            for stop_type in ("p", "o"):
+                layout.append(({"km": f"{km:.3f}", "stacja": f"{station} ({stop_type})",
+                                "_station_raw": station, "_stop_type": stop_type}, times, stop_type))
+        else:
+            layout.append(({"km": f"{km:.3f}", "stacja": station,
+                            "_station_raw": station, "_stop_type": None}, times, "p"))
+    return layout
+
+
+def build_sparse_grid(session: Any) -> dict[str, Any]:
+    """The active sheet's grid without empty cells.
+
+    ``rows`` holds each row's meta (km, stacja, _station_raw, _stop_type),
+    ``column_defs`` is as in build_trains_payload. The cells are parallel
+    arrays ``row``, ``col`` (index of the train among the train columns),
+    ``text`` and ``decimal`` (NaN = none), sorted by row, then column.
+    """
+    if not session.get("station_map", {}) or not session.get("sheets_data", []):
+        return {"rows": [], "column_defs": [], "row": np.empty(0, np.int32),
+                "col": np.empty(0, np.int32), "text": [], "decimal": np.empty(0, np.float64)}
+
+    trains_active, station_items, unique_trains = _active_sheet(session)
+    train_pos = {tn: i for i, tn in enumerate(unique_trains)}
+
+    rows: list[dict] = []
+    cells: list[tuple[int, int, str, float]] = []
+    for r, (meta, times, stop_type) in enumerate(_grid_layout(_build_cell_map(trains_active), station_items)):
+        rows.append(meta)
+        row_cells = []
+        for tn, stops in times.items():
+            cell = stops.get(stop_type)
+            if cell and cell[0]:
+                row_cells.append((r, train_pos[tn], cell[0], np.nan if cell[1] is None else cell[1]))
+        row_cells.sort(key=lambda c: c[1])
+        cells.extend(row_cells)
+
+    return {
+        "rows": rows,
+        "column_defs": _column_defs(unique_trains),
+        "row": np.array([c[0] for c in cells], dtype=np.int32),
+        "col": np.array([c[1] for c in cells], dtype=np.int32),
+        "text": [c[2] for c in cells],
+        "decimal": np.array([c[3] for c in cells], dtype=np.float64),
+    }
+
+
+def _build_cell_map(trains: SheetTimetable) -> dict[tuple, dict]:
+    """{(station, km): {train_number: {stop_type: (display, decimal)}}} for one sheet."""
+    stations = trains.labels("station")
+    train_labels = [str(v) for v in trains.labels("train_number")]
+    times = trains.labels("time")
+    stops = trains.labels("stop_type")
+    displays: dict[float, str] = {}
+    cell_map: dict[tuple, dict] = {}
+    for row, sc, tc, km, timec, tdec, stc in zip(
+        trains.rows().tolist(),
+        trains.column("station").tolist(), trains.column("train_number").tolist(),
+        trains.column("km").tolist(), trains.column("time").tolist(),
+        trains.column("time_decimal").tolist(), trains.column("stop_type").tolist(),
+    ):
+        if tdec != tdec:
+            # no usable decimal in the column: fall back to the record itself
+            tdec = _safe_decimal(trains.record(row))
+        if tdec is not None:
+            display_val = displays.get(tdec)
+            if display_val is None:
+                display_val = displays[tdec] = format_time_hhmm(tdec)
+        else:
+            display_val = str(times[timec] or "")
+        stop_type = stops[stc] if stc != NO_STOP else "p"
+        bucket = cell_map.setdefault((stations[sc], km), {})
+        bucket.setdefault(train_labels[tc], {})[stop_type] = (display_val, tdec)
+    return cell_map
+
+
+# Projections (station_items) kept per sheet in the series cache
+SERIES_CACHE_PROJECTIONS = 8
+
+
 def _build_plot_series(
     sheets_data: list[dict],
     station_items: list[tuple[str, float]],
-) -> tuple[list[dict], int | None, int | None]:
-    """Build plot series from all sheets. Returns (series, global_min_ms, global_max_ms)."""
-    sheet_to_station_train: dict[str, dict] = {}
-    sheet_to_trains: dict[str, list[str]] = {}
+    cache: dict | None = None,
+    plot_format: str = "points",
+) -> tuple[list, int | None, int | None, list]:
+    """Build plot series from all sheets.
+
+    Returns (series, global_min_ms, global_max_ms, stop_types), where
+    stop_types is the payload's stop-type dictionary: each sheet codes its
+    stops against its own (_stop_types of its labels), and the few sheets
+    whose dictionary is not a prefix of the payload's are recoded.
+
+    With ``cache`` (a dict owned by the caller), each sheet's series are kept
+    per projected ``station_items`` and reused while the sheet's timetable
+    is the same object at the same revision, so after an edit only the
+    edited sheet is recomputed.
+    """
+    per_sheet: list[tuple[list, list]] = []
+    global_min_ms: int | None = None
+    global_max_ms: int | None = None
+    projection = tuple(station_items)
+    if cache is not None:
+        # forget sheets that are gone (new upload / project)
+        for name in set(cache) - {e.get("sheet") for e in sheets_data}:
+            del cache[name]
 
     for entry in sheets_data:
         sheet = entry.get("sheet")
-        station_to_train: dict[str, dict[str, list]] = {}
-        trains = entry.get("trains", [])
-        for rec in trains:
-            sn = rec["station"]
-            tn = str(rec["train_number"])
-            station_to_train.setdefault(sn, {}).setdefault(tn, []).append({
-                "time_decimal": rec.get("time_decimal"),
-                "stop_type": rec.get("stop_type"),
-            })
-        sheet_to_station_train[sheet] = station_to_train
-        sheet_to_trains[sheet] = sorted({str(t["train_number"]) for t in trains})
+        trains = as_timetable(entry.get("trains"))
+        if cache is None or trains is not entry.get("trains"):
+            sheet_series, sheet_min, sheet_max = _sheet_series(sheet, trains, station_items, plot_format)
+        else:
+            sheet_series, sheet_min, sheet_max = _cached_sheet_series(
+                cache.setdefault(sheet, {}), sheet, trains, projection, plot_format,
+            )
+        per_sheet.append((sheet_series, _stop_types(trains.labels("stop_type"))))
+        if sheet_min is not None:
+            global_min_ms = sheet_min if global_min_ms is None else min(global_min_ms, sheet_min)
+            global_max_ms = sheet_max if global_max_ms is None else max(global_max_ms, sheet_max)
+
+    stop_types = _stop_types(label for _series, types in per_sheet for label in types)
+    series: list = []
+    for sheet_series, types in per_sheet:
+        if plot_format != "points" and types != stop_types[:len(types)]:
+            sheet_series = _recode_stops(sheet_series, [stop_types.index(t) for t in types], plot_format)
+        series.extend(sheet_series)
+    return series, global_min_ms, global_max_ms, stop_types
+
+
+def _stop_types(labels: Iterable[Any]) -> list:
+    """Stop-type dictionary: the base codes, then any other labels in a fixed order."""
+    others = {label for label in labels if label not in _BASE_STOP_TYPES}
+    return [*_BASE_STOP_TYPES, *sorted(others, key=lambda v: (str(v), type(v).__name__))]
+
+
+def _recode_stops(sheet_series: list, codes: list[int], plot_format: str) -> list:
+    """Copies of one sheet's series with stop codes mapped through ``codes``."""
+    if plot_format == "arrays":
+        lookup = np.array(codes, dtype=np.int16)
+        return [SeriesArrays(a.sheet, a.trains, a.offsets, a.ms, a.km, a.station, lookup[a.stop])
+                for a in sheet_series]
+    return [{**s, "stop": [codes[c] for c in s["stop"]]} for s in sheet_series]
+
+
+def _cached_sheet_series(
+    entries: dict[tuple, tuple],
+    sheet: str,
+    trains: SheetTimetable,
+    projection: tuple,
+    plot_format: str = "points",
+) -> tuple[list, int | None, int | None]:
+    """_sheet_series through one sheet's cache:
+    (projection, plot_format) -> (timetable ref, revision, result)."""
+    key = (projection, plot_format)
+    cached = entries.get(key)
+    if cached is not None and cached[0]() is trains and cached[1] == trains.revision:
+        return cached[2]
+    result = _sheet_series(sheet, trains, list(projection), plot_format)
+    entries.pop(key, None)
+    entries[key] = (weakref.ref(trains), trains.revision, result)
+    while len(entries) > SERIES_CACHE_PROJECTIONS:
+        del entries[next(iter(entries))]
+    return result
+
+
+def _sheet_series(
+    sheet: str,
+    trains: SheetTimetable,
+    station_items: list[tuple[str, float]],
+    plot_format: str = "points",
+) -> tuple[list, int | None, int | None]:
+    """One sheet's series: each train's timed events at the stations in
+    ``station_items``, plotted at that km. Works on whole columns at once.
+    ``plot_format`` as in build_trains_payload (``sheet`` is still the name
+    here).
+
+    Points are sorted by km in the train's travel direction (majority vote of
+    consecutive km steps); at the same km (dual station) arrival always comes
+    before departure so the line shows p→o regardless of the actual times.
+    """
+    item_pos = {name: i for i, (name, _km) in enumerate(station_items)}
+    item_km = np.array([float(km) for _name, km in station_items] or [0.0])
+    station_pos = np.array([item_pos.get(s, -1) for s in trains.labels("station")] or [-1])
+
+    # trains are grouped and ordered by their str() label
+    names, train_rank = trains.train_groups()
+
+    pos = station_pos[trains.column("station")]
+    decimals = trains.column("time_decimal")
+    idx = np.flatnonzero((pos >= 0) & ~np.isnan(decimals))
+    if not len(idx):
+        return [], None, None
+
+    pos = pos[idx]
+    km = item_km[pos]
+    ms = (decimals[idx] * 3_600_000.0).astype(np.int64)
+    rank = train_rank[idx]
+    stop_codes = trains.column("stop_type")[idx]
+    stop_labels = trains.labels("stop_type")
+    departure = stop_labels.index("o") if "o" in stop_labels else -2
+    stop_order = (stop_codes == departure).astype(np.int8)
+
+    # Direction votes per train over its points sorted by km (ties keep
+    # station_items order, then record order)
+    by_km = np.lexsort((idx, pos, km, rank))
+    r, k, m = rank[by_km], km[by_km], ms[by_km]
+    step = (r[1:] == r[:-1]) & (k[1:] != k[:-1])
+    asc_votes = np.bincount(r[1:][step & (m[1:] > m[:-1])], minlength=len(names))
+    desc_votes = np.bincount(r[1:][step & (m[1:] < m[:-1])], minlength=len(names))
+    sign = np.where(desc_votes > asc_votes, -1.0, 1.0)[rank]
+
+    order = np.lexsort((idx, pos, stop_order, sign * km, rank))
+    bounds = np.flatnonzero(np.diff(rank[order])) + 1
+    if plot_format == "arrays":
+        starts = np.concatenate(([0], bounds))
+        stop_map = np.array(_stop_codes(stop_labels), dtype=np.int16)
+        return [SeriesArrays(
+            sheet,
+            [names[r] for r in rank[order[starts]].tolist()],
+            np.append(starts, len(order)).astype(np.int32),
+            ms[order],
+            km[order],
+            pos[order].astype(np.int32),
+            stop_map[stop_codes[order]],  # NO_STOP (-1) -> 0
+        )], int(ms.min()), int(ms.max())
+
+    ms_list = ms[order].tolist()
+    km_list = km[order].tolist()
 
     series: list[dict] = []
-    global_min_ms: int | None = None
-    global_max_ms: int | None = None
+    if plot_format == "columnar":
+        stop_map = _stop_codes(stop_labels)
+        stop_list = [stop_map[c] for c in stop_codes[order].tolist()]
+        pos_list = pos[order].tolist()
+        for start, end in zip([0, *bounds.tolist()], [*bounds.tolist(), len(order)]):
+            tn = names[int(rank[order[start]])]
+            series.append({
+                "name": f"{tn} ({sheet})",
+                "train": tn,
+                "sheet": sheet,
+                "ms": ms_list[start:end],
+                "km": km_list[start:end],
+                "station": pos_list[start:end],
+                "stop": stop_list[start:end],
+            })
+        return series, int(ms.min()), int(ms.max())
 
-    for sheet, station_to_train in sheet_to_station_train.items():
-        for tn in sheet_to_trains.get(sheet, []):
-            pts: list[dict] = []
-            for station_name, km_selected in station_items:
-                times_list = station_to_train.get(station_name, {}).get(tn)
-                if not times_list:
-                    continue
-                for info in times_list:
-                    t_dec = info["time_decimal"]
-                    if t_dec is None:
-                        continue
-                    ms = _hours_to_ms(t_dec)
-                    pts.append({
-                        "value": [ms, float(km_selected)],
-                        "station": station_name,
-                        "train": tn,
-                        "sheet": sheet,
-                        "stopType": info["stop_type"],
-                    })
-                    global_min_ms = ms if global_min_ms is None else min(global_min_ms, ms)
-                    global_max_ms = ms if global_max_ms is None else max(global_max_ms, ms)
-            if pts:
-                pts = _sort_points_by_direction(pts)
-                series.append({"name": f"{tn} ({sheet})", "points": pts})
-
-    return series, global_min_ms, global_max_ms
-
-
-def _stop_order(p: dict) -> int:
-    """Arrival ("p") before departure ("o") at the same km."""
-    return 0 if p.get("stopType") != "o" else 1
-
-
-def _sort_points_by_direction(pts: list[dict]) -> list[dict]:
-    """Sort points by km in the detected travel direction.
-
-    At the same km (dual station), arrival always comes before departure
-    so the line visually shows p→o regardless of actual times.
-    """
-    pts.sort(key=lambda p: p["value"][1])
-    asc_votes = 0
-    desc_votes = 0
-    for i in range(1, len(pts)):
-        if pts[i]["value"][1] == pts[i - 1]["value"][1]:
-            continue
-        if pts[i]["value"][0] > pts[i - 1]["value"][0]:
-            asc_votes += 1
-        elif pts[i]["value"][0] < pts[i - 1]["value"][0]:
-            desc_votes += 1
-    if desc_votes > asc_votes:
-        pts.sort(key=lambda p: (-p["value"][1], _stop_order(p)))
-    else:
-        pts.sort(key=lambda p: (p["value"][1], _stop_order(p)))
-    return pts
+    stop_values = [None if c == NO_STOP else stop_labels[c] for c in stop_codes[order].tolist()]
+    station_names = [station_items[p][0] for p in pos[order].tolist()]
+    for start, end in zip([0, *bounds.tolist()], [*bounds.tolist(), len(order)]):
+        tn = names[int(rank[order[start]])]
+        pts = [
+            {
+                "value": [ms_list[i], km_list[i]],
+                "station": station_names[i],
+                "train": tn,
+                "sheet": sheet,
+                "stopType": stop_values[i],
+            }
+            for i in range(start, end)
+        ]
+        series.append({"name": f"{tn} ({sheet})", "points": pts})
+
+    return series, int(ms.min()), int(ms.max())
+
+
+def _stop_codes(stop_labels: list) -> list[int]:
+    """Code in the sheet's _stop_types per stop_type label code, plus NO_STOP (-1) -> None."""
+    position = {label: i for i, label in enumerate(_stop_types(stop_labels))}
+    return [position[label] for label in stop_labels] + [0]
 
 
 def _empty_payload(selected_sheet: str, train_colors: dict) -> dict[str, Any]:
@@ -212,4 +442,5 @@ def _empty_payload(selected_sheet: str, train_colors: dict) -> dict[str, Any]:
         "x_max_ms": 24 * 3_600_000,
         "train_colors": train_colors,
         "selected_sheet": selected_sheet,
+        "pending_sheets": [],
     }
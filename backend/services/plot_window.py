@@ -0,0 +1,268 @@
+"""Plot series for a time / km window (GET /api/trains/plot).
+
+A PlotIndex keeps each series' time and km extents, with the series sorted
+by start time and the running maximum of their end times in that order.
+A window query binary-searches both: series that start after the window's
+end are cut off the back, and the leading series that all end before the
+window's start are cut off the front. The rest are checked against the
+window's extents and clipped to the part that touches it: the points
+inside plus one point on either side, so lines still run out of the view.
+
+The index is built from the cached ``plot_format="arrays"`` payload and is
+kept per ``(version, selected_sheet)`` like the payload itself.
+
+Level of detail: given the view's size in pixels, series are simplified
+(Douglas-Peucker on pixel coordinates, point-to-segment distance) so that
+no dropped point is more than one pixel away from the drawn line. First and
+last points and the p/o points of dual stations are always kept. The scale
+is rounded down to a zoom bucket (steps of sqrt(2)) and the simplified
+index is cached per ``(version, selected_sheet, bucket)``, so panning at
+one zoom level reuses it.
+"""
+from __future__ import annotations
+
+import math
+import threading
+from typing import Any
+
+import numpy as np
+
+from backend.models.session import SessionState
+from backend.services.payload_cache import trains_payload
+from backend.services.plot_data import SeriesArrays
+
+_CACHE_KEY = "plot_index"
+_LOD_CACHE_KEY = "plot_lod"
+
+# Zoom buckets per axis: scale rounded down to 2 ** (k / LOD_BUCKETS_PER_OCTAVE)
+LOD_BUCKETS_PER_OCTAVE = 2
+# Simplified indexes kept per data version
+LOD_CACHE_SIZE = 16
+
+_lock = threading.Lock()
+
+
+class PlotIndex:
+    """The plot of one payload as flat arrays plus per-series extents."""
+
+    def __init__(self, trains, sheet, offsets, ms, km, station, stop, dicts) -> None:
+        self.trains: list[str] = trains
+        self.sheet: np.ndarray = sheet      # per series, index into dicts["sheets"]
+        self.offsets: np.ndarray = offsets  # series i is offsets[i]:offsets[i + 1]
+        self.ms: np.ndarray = ms
+        self.km: np.ndarray = km
+        self.station: np.ndarray = station
+        self.stop: np.ndarray = stop
+        self.dicts: dict[str, list] = dicts
+
+        starts = self.offsets[:-1]
+        if len(starts):
+            self.t_min = np.minimum.reduceat(self.ms, starts)
+            self.t_max = np.maximum.reduceat(self.ms, starts)
+            self.k_min = np.minimum.reduceat(self.km, starts)
+            self.k_max = np.maximum.reduceat(self.km, starts)
+        else:
+            self.t_min = self.t_max = np.empty(0, np.int64)
+            self.k_min = self.k_max = np.empty(0, np.float64)
+        self.by_start = np.argsort(self.t_min, kind="stable")
+        self.sorted_start = self.t_min[self.by_start]
+        # latest end among the series up to each position in start order
+        self.reach = np.maximum.accumulate(self.t_max[self.by_start]) if len(starts) else self.t_max
+
+    @classmethod
+    def from_payload(cls, payload: dict[str, Any]) -> PlotIndex:
+        sheets: list[SeriesArrays] = payload["plot_series"]
+        dicts = payload.get("plot_dicts") or {"stations": [], "sheets": [], "stop_types": []}
+        sheet_pos = {name: i for i, name in enumerate(dicts["sheets"])}
+        lengths = np.cumsum([0] + [len(a.ms) for a in sheets])
+        return cls(
+            [tn for a in sheets for tn in a.trains],
+            np.array([sheet_pos[a.sheet] for a in sheets for _tn in a.trains], dtype=np.int32),
+            np.concatenate(
+                [a.offsets[:-1] + start for a, start in zip(sheets, lengths)] + [lengths[-1:]]
+            ).astype(np.int64),
+            np.concatenate([a.ms for a in sheets] or [np.empty(0, np.int64)]),
+            np.concatenate([a.km for a in sheets] or [np.empty(0, np.float64)]),
+            np.concatenate([a.station for a in sheets] or [np.empty(0, np.int32)]),
+            np.concatenate([a.stop for a in sheets] or [np.empty(0, np.int16)]),
+            dicts,
+        )
+
+    def __len__(self) -> int:
+        return len(self.trains)
+
+    def extent(self) -> tuple[float, float, float, float]:
+        """(from_ms, to_ms, km_min, km_max) of the whole plot."""
+        if not len(self):
+            return 0.0, 0.0, 0.0, 0.0
+        return (float(self.t_min.min()), float(self.t_max.max()),
+                float(self.k_min.min()), float(self.k_max.max()))
+
+    def simplified(self, ms_per_px: float, km_per_px: float) -> PlotIndex:
+        """The index with each series simplified to within one pixel at this scale."""
+        x = self.ms / ms_per_px
+        y = self.km / km_per_px
+        keep = np.zeros(len(self.ms), dtype=bool)
+        keep[self.offsets[:-1]] = True
+        keep[self.offsets[1:] - 1] = True
+        if len(self.ms):
+            keep |= self.stop != self.dicts["stop_types"].index(None)
+        anchors = np.flatnonzero(keep).tolist()
+        for a, b in zip(anchors, anchors[1:]):
+            if b - a > 1:
+                _douglas_peucker(x, y, a, b, keep)
+
+        kept_before = np.concatenate(([0], np.cumsum(keep)))
+        return PlotIndex(
+            self.trains, self.sheet, kept_before[self.offsets],
+            self.ms[keep], self.km[keep], self.station[keep], self.stop[keep], self.dicts,
+        )
+
+    def query(self, from_ms: float, to_ms: float, km_min: float, km_max: float) -> list[tuple[int, int, int]]:
+        """(series, start, end) point ranges of the series touching the window, in series order."""
+        first = np.searchsorted(self.reach, from_ms, side="left")
+        end = np.searchsorted(self.sorted_start, to_ms, side="right")
+        candidates = self.by_start[first:end]
+        hits = candidates[
+            (self.t_max[candidates] >= from_ms)
+            & (self.k_max[candidates] >= km_min)
+            & (self.k_min[candidates] <= km_max)
+        ]
+        ranges = []
+        for i in np.sort(hits).tolist():
+            a, b = int(self.offsets[i]), int(self.offsets[i + 1])
+            if b - a == 1:
+                ranges.append((i, a, b))
+                continue
+            t, k = self.ms[a:b], self.km[a:b]
+            # segments whose bounding box meets the window
+            touching = np.flatnonzero(
+                (np.minimum(t[:-1], t[1:]) <= to_ms) & (np.maximum(t[:-1], t[1:]) >= from_ms)
+                & (np.minimum(k[:-1], k[1:]) <= km_max) & (np.maximum(k[:-1], k[1:]) >= km_min)
+            )
+            if len(touching):
+                ranges.append((i, a + int(touching[0]), a + int(touching[-1]) + 2))
+        return ranges
+
+    def series(self, ranges: list[tuple[int, int, int]], columnar: bool = False) -> list[dict]:
+        """The given ranges as plot series, in the points or columnar shape."""
+        stations, sheets, stop_types = self.dicts["stations"], self.dicts["sheets"], self.dicts["stop_types"]
+        out = []
+        for i, a, b in ranges:
+            tn, sheet = self.trains[i], int(self.sheet[i])
+            ms, km = self.ms[a:b].tolist(), self.km[a:b].tolist()
+            station, stop = self.station[a:b].tolist(), self.stop[a:b].tolist()
+            name = f"{tn} ({sheets[sheet]})"
+            if columnar:
+                out.append({"name": name, "train": tn, "sheet": sheet,
+                            "ms": ms, "km": km, "station": station, "stop": stop})
+            else:
+                out.append({"name": name, "points": [
+                    {"value": [ms[j], km[j]], "station": stations[station[j]], "train": tn,
+                     "sheet": sheets[sheet], "stopType": stop_types[stop[j]]}
+                    for j in range(len(ms))
+                ]})
+        return out
+
+
+def _douglas_peucker(x: np.ndarray, y: np.ndarray, first: int, last: int, keep: np.ndarray) -> None:
+    """Mark in ``keep`` the points between ``first`` and ``last`` (both kept)
+    needed to stay within distance 1 of the original polyline."""
+    stack = [(first, last)]
+    while stack:
+        a, b = stack.pop()
+        if b - a < 2:
+            continue
+        px, py = x[a + 1:b], y[a + 1:b]
+        dx, dy = x[b] - x[a], y[b] - y[a]
+        length2 = dx * dx + dy * dy
+        if length2 > 0:
+            t = np.clip(((px - x[a]) * dx + (py - y[a]) * dy) / length2, 0.0, 1.0)
+            dist2 = (px - x[a] - t * dx) ** 2 + (py - y[a] - t * dy) ** 2
+        else:
+            dist2 = (px - x[a]) ** 2 + (py - y[a]) ** 2
+        worst = int(np.argmax(dist2))
+        if dist2[worst] > 1.0:
+            mid = a + 1 + worst
+            keep[mid] = True
+            stack.append((a, mid))
+            stack.append((mid, b))
+
+
+def _bucket(units_per_px: float) -> int:
+    return math.floor(math.log2(units_per_px) * LOD_BUCKETS_PER_OCTAVE)
+
+
+def plot_index(session: SessionState) -> PlotIndex:
+    """The PlotIndex of the session's current payload, memoized per version."""
+    key = (session.version, session.get("selected_sheet", ""))
+    with _lock:
+        cached = session.cache.get(_CACHE_KEY)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+    index = PlotIndex.from_payload(trains_payload(session, "arrays"))
+    with _lock:
+        session.cache[_CACHE_KEY] = (key, index)
+    return index
+
+
+def lod_index(session: SessionState, index: PlotIndex, bucket: tuple[int, int]) -> PlotIndex:
+    """``index`` simplified for a zoom bucket, memoized per (version, selected_sheet, bucket)."""
+    key = (session.version, session.get("selected_sheet", ""), bucket)
+    with _lock:
+        entries: dict = session.cache.get(_LOD_CACHE_KEY, {})
+        cached = entries.get(key)
+        if cached is not None:
+            return cached
+    # scale of the bucket's lower bound: within a pixel there is within a pixel here
+    simplified = index.simplified(*(2.0 ** (b / LOD_BUCKETS_PER_OCTAVE) for b in bucket))
+    with _lock:
+        entries = {k: v for k, v in session.cache.get(_LOD_CACHE_KEY, {}).items() if k[0] == key[0]}
+        entries[key] = simplified
+        while len(entries) > LOD_CACHE_SIZE:
+            del entries[next(iter(entries))]
+        session.cache[_LOD_CACHE_KEY] = entries
+    return simplified
+
+
+def plot_window(
+    session: SessionState,
+    from_ms: float | None = None,
+    to_ms: float | None = None,
+    km_min: float | None = None,
+    km_max: float | None = None,
+    columnar: bool = False,
+    width_px: int | None = None,
+    height_px: int | None = None,
+) -> dict[str, Any]:
+    """The series intersecting the window (unbounded sides left None), clipped
+    to it; simplified for a ``width_px`` x ``height_px`` view when given."""
+    index = plot_index(session)
+    window = {
+        "from_ms": -math.inf if from_ms is None else from_ms,
+        "to_ms": math.inf if to_ms is None else to_ms,
+        "km_min": -math.inf if km_min is None else km_min,
+        "km_max": math.inf if km_max is None else km_max,
+    }
+    lod = None
+    if width_px is not None and height_px is not None:
+        full = index.extent()
+        t0, t1 = max(window["from_ms"], full[0]), min(window["to_ms"], full[1])
+        k0, k1 = max(window["km_min"], full[2]), min(window["km_max"], full[3])
+        bucket = (_bucket(max(t1 - t0, 1.0) / width_px), _bucket(max(k1 - k0, 1e-3) / height_px))
+        points = len(index.ms)
+        index = lod_index(session, index, bucket)
+        lod = {"bucket": list(bucket), "points": len(index.ms), "of": points}
+
+    ranges = index.query(**window)
+    result: dict[str, Any] = {
+        "plot_series": index.series(ranges, columnar),
+        "total_series": len(index),
+        "from_ms": from_ms, "to_ms": to_ms, "km_min": km_min, "km_max": km_max,
+    }
+    if lod is not None:
+        result["lod"] = lod
+    if columnar:
+        result["plot_format"] = "columnar"
+        result["plot_dicts"] = index.dicts
+    return result
@@ -0,0 +1,180 @@
+"""Background upload jobs.
+
+POST /api/upload/jobs hands the upload to a worker thread and returns a job
+id at once; the client follows progress over Server-Sent Events. Each job
+keeps an append-only event log, so a client that reconnects (e.g. after a
+proxy timeout) resumes from the last event id it saw.
+
+Cancellation is cooperative: the worker checks the job's flag at every
+progress report (once per sheet read / extracted) and stops there, which
+also cancels its sheets still queued in the extraction process pool. A job still queued is dropped
+without running.
+
+Work that ends in a session write is split: the worker thread returns its
+result and ``finish`` applies it on the event loop that submitted the job,
+so the session is only ever written from the loop.
+"""
+from __future__ import annotations
+
+import asyncio
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable
+
+from backend.config import UPLOAD_JOB_WORKERS
+
+# Final events; the SSE stream ends after one of them
+TERMINAL_EVENTS = ("done", "failed", "cancelled")
+
+# Finished jobs kept around for late / reconnecting clients
+_KEEP_FINISHED = 16
+
+
+class JobCancelled(Exception):
+    """Raised inside the worker when its job has been cancelled."""
+
+
+class JobFailed(Exception):
+    """Raised by job work to end the job with a "failed" event."""
+
+    def __init__(self, status_code: int, detail: str) -> None:
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+class UploadJob:
+    def __init__(self, filename: str) -> None:
+        self.id = uuid.uuid4().hex
+        self.filename = filename
+        self.status = "queued"
+        self.events: list[dict[str, Any]] = []
+        self.future: Future | None = None
+        self._cancel = threading.Event()
+        self._cond = threading.Condition()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in TERMINAL_EVENTS
+
+    @property
+    def cancel_requested(self) -> bool:
+        return self._cancel.is_set()
+
+    def emit(self, event: str, **data: Any) -> None:
+        """Append an event; terminal and "status" events also set the job status."""
+        with self._cond:
+            if self.finished:
+                return
+            if event in TERMINAL_EVENTS:
+                self.status = event
+            elif event == "status":
+                self.status = data["status"]
+            self.events.append({"event": event, **data})
+            self._cond.notify_all()
+
+    def progress(self, phase: str) -> Callable[[str, int, int], None]:
+        """Per-sheet callback for read_workbook / extract_excel_data."""
+
+        def report(sheet: str, done: int, total: int) -> None:
+            self.check_cancelled()
+            self.emit("progress", phase=phase, sheet=sheet, done=done, total=total)
+
+        return report
+
+    def check_cancelled(self) -> None:
+        if self._cancel.is_set():
+            raise JobCancelled()
+
+    def wait_events(self, cursor: int, timeout: float) -> list[dict[str, Any]]:
+        """Events from index ``cursor`` on, waiting up to ``timeout`` s for new ones."""
+        with self._cond:
+            self._cond.wait_for(lambda: len(self.events) > cursor, timeout)
+            return self.events[cursor:]
+
+
+class UploadJobManager:
+    def __init__(self, workers: int) -> None:
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="upload")
+        self._jobs: OrderedDict[str, UploadJob] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, filename: str, work: Callable[[UploadJob], Any],
+               cleanup: Callable[[], None] | None = None,
+               finish: Callable[[Any], dict[str, Any]] | None = None) -> UploadJob:
+        """Run ``work(job)`` in the pool; its return value is the "done" event payload.
+
+        With ``finish`` (only from a coroutine), ``finish(result)`` is called
+        on the running event loop instead and its return value is the payload;
+        it may raise JobFailed too. ``cleanup`` runs once the work has
+        finished, however it ended.
+        """
+        loop = asyncio.get_running_loop() if finish is not None else None
+        job = UploadJob(filename)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._prune()
+        job.future = self._executor.submit(self._run, job, work, finish, loop)
+        if cleanup is not None:
+            job.future.add_done_callback(lambda _f: cleanup())
+        return job
+
+    def get(self, job_id: str) -> UploadJob | None:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> UploadJob | None:
+        job = self.get(job_id)
+        if job is None or job.finished:
+            return job
+        job._cancel.set()
+        if job.future is not None and job.future.cancel():
+            # never started: the worker is free right away
+            job.emit("cancelled")
+        return job
+
+    def _run(self, job: UploadJob, work: Callable[[UploadJob], Any],
+             finish: Callable[[Any], dict[str, Any]] | None = None,
+             loop: asyncio.AbstractEventLoop | None = None) -> None:
+        try:
+            job.check_cancelled()
+            job.emit("status", status="running")
+            result = work(job)
+        except JobCancelled:
+            job.emit("cancelled")
+        except JobFailed as exc:
+            job.emit("failed", status_code=exc.status_code, detail=exc.detail)
+        except Exception as exc:
+            job.emit("failed", status_code=500, detail=str(exc))
+        else:
+            if finish is None:
+                job.emit("done", result=result)
+                return
+            try:
+                loop.call_soon_threadsafe(self._finish, job, finish, result)
+            except RuntimeError:
+                job.emit("failed", status_code=500, detail="Serwer konczy prace.")
+
+    def _finish(self, job: UploadJob, finish: Callable[[Any], dict[str, Any]], result: Any) -> None:
+        """Second half of a job, on the event loop."""
+        if job.cancel_requested:
+            job.emit("cancelled")
+            return
+        try:
+            payload = finish(result)
+        except JobFailed as exc:
+            job.emit("failed", status_code=exc.status_code, detail=exc.detail)
+        except Exception as exc:
+            job.emit("failed", status_code=500, detail=str(exc))
+        else:
+            job.emit("done", result=payload)
+
+    def _prune(self) -> None:
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+        for job_id in finished[:-_KEEP_FINISHED]:
+            del self._jobs[job_id]
+
+
+upload_jobs = UploadJobManager(UPLOAD_JOB_WORKERS)
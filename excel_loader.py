@@ -1,6 +1,11 @@
 import io
-from typing import Any, Dict, List, Optional, Set, Tuple
+import math
+import threading
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, BinaryIO, Callable, Dict, Iterator, List, Optional, Set, Tuple, Union
 
+import numpy as np
 import pandas as pd
 from openpyxl import load_workbook
 
@@ -8,25 +13,101 @@ from utils import (
     find_headers,
     extract_stations,
     extract_train_columns,
-    parse_time,
+    parse_times,
     format_time_decimal,
     apply_midnight_correction,
 )
+from timetable_store import CORE_FIELDS, SheetTimetable
+from xlsx_reader import MergedRange, XlsxReader, read_sheet_layout, sheet_fingerprints, sheet_parts
 
 
-def read_workbook(file_bytes: bytes) -> Tuple[List[str], Dict[str, pd.DataFrame], Dict[str, Set[int]]]:
+# Loader engines accepted by read_workbook()
+ENGINES = ("openpyxl", "streaming", "xml")
+
+# Raw workbook bytes or a seekable binary file (e.g. a spooled upload)
+WorkbookSource = Union[bytes, BinaryIO]
+
+# Progress hook: called with (sheet_name, sheets_done, sheets_total) after each sheet
+SheetCallback = Callable[[str, int, int], None]
+
+# (max rows, max cols) of the top-left band searched for headers; None = unbounded
+HeaderBand = Tuple[Optional[int], Optional[int]]
+
+
+class WorkbookTooLarge(ValueError):
+    """The workbook would inflate past the allowed uncompressed size."""
+
+
+def _open_source(source: WorkbookSource) -> BinaryIO:
+    """Return a readable file object positioned at the start of the workbook."""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return io.BytesIO(source)
+    source.seek(0)
+    return source
+
+
+def check_workbook_size(source: WorkbookSource, max_uncompressed: int) -> int:
+    """Raise ``WorkbookTooLarge`` if the archive members add up to more than
+    ``max_uncompressed`` bytes; returns the total.
+
+    Only the zip central directory is read. The declared sizes are a real
+    bound: zipfile stops inflating a member once its declared size is reached.
+    """
+    with zipfile.ZipFile(_open_source(source)) as archive:
+        total = sum(info.file_size for info in archive.infolist())
+    if total > max_uncompressed:
+        raise WorkbookTooLarge(
+            f"Workbook inflates to {total} bytes, more than the allowed {max_uncompressed}."
+        )
+    return total
+
+
+def workbook_fingerprints(source: WorkbookSource) -> Dict[str, str]:
+    """Per-sheet content fingerprints (see ``xlsx_reader.sheet_fingerprints``)."""
+    with zipfile.ZipFile(_open_source(source)) as archive:
+        return sheet_fingerprints(archive)
+
+
+def read_workbook(
+    source: WorkbookSource,
+    engine: str = "openpyxl",
+    on_sheet: Optional[SheetCallback] = None,
+    only_sheets: Optional[Set[str]] = None,
+) -> Tuple[List[str], Dict[str, pd.DataFrame], Dict[str, Set[int]]]:
     """Read all sheets with merged cells expanded so every cell in a merged range
     carries the top-left value. Returns (sheet_names, {name: DataFrame}, {name: hidden_col_indices}).
 
+    ``source`` is the workbook as bytes or as a seekable binary file; files
+    are read in place, so a spooled upload is never copied into memory whole.
+    ``on_sheet`` is called after each sheet has been read; an exception it
+    raises aborts the read (used to cancel background uploads).
+    With ``only_sheets`` just those sheets are read; sheet_names still lists
+    every sheet in workbook order.
+
     The resulting DataFrames keep Python None for empty cells (so pd.isna works),
     and preserve original types where possible.
+
+    ``engine`` selects the reader:
+    - "openpyxl": full in-memory workbook, merged ranges unmerged in place
+    - "streaming": read-only openpyxl, one sheet at a time; merged ranges are
+      expanded from the sheet's merge metadata without touching any cells
+    - "xml": native SpreadsheetML parser (xlsx_reader.XlsxReader), no openpyxl
+      cell objects at all
     """
-    wb = load_workbook(io.BytesIO(file_bytes), data_only=True, read_only=False)
+    if engine == "streaming":
+        return _read_workbook_streaming(source, on_sheet, only_sheets)
+    if engine == "xml":
+        return _read_workbook_xml(source, on_sheet, only_sheets)
+    if engine != "openpyxl":
+        raise ValueError(f"Unknown workbook engine: {engine!r} (expected one of {ENGINES}).")
+
+    wb = load_workbook(_open_source(source), data_only=True, read_only=False)
     sheet_names = wb.sheetnames
+    selected = [name for name in sheet_names if only_sheets is None or name in only_sheets]
     sheets: Dict[str, pd.DataFrame] = {}
     hidden_cols: Dict[str, Set[int]] = {}
 
-    for name in sheet_names:
+    for name in selected:
         ws = wb[name]
 
         # Collect hidden column indices (0-based) from column dimensions
@@ -52,55 +133,191 @@ def read_workbook(file_bytes: bytes) -> Tuple[List[str], Dict[str, pd.DataFrame]
                 for c in range(min_col, max_col + 1):
                     ws.cell(row=r, column=c).value = top_left_value
 
-        # Determine effective used area (trim trailing empty rows/cols)
-        effective_max_row = 0
-        effective_max_col = 0
-        row_values: List[List[Optional[object]]] = []
-        for r_idx, row in enumerate(ws.iter_rows(values_only=True), start=1):
-            values = list(row) if row is not None else []
-            last_nonempty_col = 0
-            for c_idx, val in enumerate(values, start=1):
-                if val is not None and (not isinstance(val, str) or val != ""):
-                    last_nonempty_col = c_idx
-            if last_nonempty_col > 0:
-                effective_max_row = r_idx
-                if last_nonempty_col > effective_max_col:
-                    effective_max_col = last_nonempty_col
-            row_values.append(values)
-
-        # Build rectangular data limited to effective bounds
-        trimmed_rows: List[List[Optional[object]]] = []
-        for values in row_values[:effective_max_row]:
-            row_list = list(values[:effective_max_col])
-            if len(row_list) < effective_max_col:
-                row_list.extend([None] * (effective_max_col - len(row_list)))
-            trimmed_rows.append(row_list)
-
-        df = pd.DataFrame(trimmed_rows)
-        sheets[name] = df
+        row_values = [list(row) if row is not None else [] for row in ws.iter_rows(values_only=True)]
+        sheets[name] = _rows_to_frame(row_values)
+        if on_sheet is not None:
+            on_sheet(name, len(sheets), len(selected))
 
     return sheet_names, sheets, hidden_cols
 
 
+def _read_workbook_streaming(
+    source: WorkbookSource,
+    on_sheet: Optional[SheetCallback] = None,
+    only_sheets: Optional[Set[str]] = None,
+) -> Tuple[List[str], Dict[str, pd.DataFrame], Dict[str, Set[int]]]:
+    """Read-only variant of ``read_workbook``: only one sheet's rows are held at a time."""
+    # Both readers below share one file object; zipfile seeks before every read
+    source = _open_source(source)
+    wb = load_workbook(source, data_only=True, read_only=True)
+    sheets: Dict[str, pd.DataFrame] = {}
+    hidden_cols: Dict[str, Set[int]] = {}
+    try:
+        sheet_names = wb.sheetnames
+        selected = [name for name in sheet_names if only_sheets is None or name in only_sheets]
+        with zipfile.ZipFile(source) as archive:
+            parts = dict(sheet_parts(archive))
+            for name in selected:
+                ws = wb[name]
+                # Dimension records written by other tools are often wrong; read what is there
+                ws.reset_dimensions()
+                sheet_hidden, merged_ranges = (
+                    read_sheet_layout(archive, parts[name]) if name in parts else (set(), [])
+                )
+                hidden_cols[name] = sheet_hidden
+
+                row_values = [list(row) for row in ws.iter_rows(values_only=True)]
+                _fill_merged_ranges(row_values, merged_ranges)
+                sheets[name] = _rows_to_frame(row_values)
+                if on_sheet is not None:
+                    on_sheet(name, len(sheets), len(selected))
+    finally:
+        wb.close()
+
+    return sheet_names, sheets, hidden_cols
+
+
+def _read_workbook_xml(
+    source: WorkbookSource,
+    on_sheet: Optional[SheetCallback] = None,
+    only_sheets: Optional[Set[str]] = None,
+) -> Tuple[List[str], Dict[str, pd.DataFrame], Dict[str, Set[int]]]:
+    """``read_workbook`` on top of the native SpreadsheetML parser."""
+    sheets: Dict[str, pd.DataFrame] = {}
+    hidden_cols: Dict[str, Set[int]] = {}
+    with zipfile.ZipFile(_open_source(source)) as archive:
+        reader = XlsxReader(archive)
+        selected = [(name, part) for name, part in reader.sheets if only_sheets is None or name in only_sheets]
+        for name, part in selected:
+            row_values, hidden_cols[name], merged_ranges = reader.read_sheet(part)
+            _fill_merged_ranges(row_values, merged_ranges)
+            sheets[name] = _rows_to_frame(row_values)
+            if on_sheet is not None:
+                on_sheet(name, len(sheets), len(selected))
+        sheet_names = reader.sheet_names
+
+    return sheet_names, sheets, hidden_cols
+
+
+def _fill_merged_ranges(row_values: List[List[Optional[object]]], merged_ranges: List[MergedRange]) -> None:
+    """Copy each merged range's top-left value into every cell of the range (in place).
+
+    Rows are padded with None where a range reaches past the stored cells.
+    """
+    for min_col, min_row, max_col, max_row in merged_ranges:
+        while len(row_values) < max_row:
+            row_values.append([])
+        top_row = row_values[min_row - 1]
+        top_left_value = top_row[min_col - 1] if len(top_row) >= min_col else None
+        for r in range(min_row - 1, max_row):
+            values = row_values[r]
+            if len(values) < max_col:
+                values.extend([None] * (max_col - len(values)))
+            for c in range(min_col - 1, max_col):
+                values[c] = top_left_value
+
+
+def _rows_to_frame(row_values: List[List[Optional[object]]]) -> pd.DataFrame:
+    """Trim trailing empty rows/cols and build a rectangular DataFrame."""
+    # Determine effective used area (trim trailing empty rows/cols)
+    effective_max_row = 0
+    effective_max_col = 0
+    for r_idx, values in enumerate(row_values, start=1):
+        last_nonempty_col = 0
+        for c_idx, val in enumerate(values, start=1):
+            if val is not None and (not isinstance(val, str) or val != ""):
+                last_nonempty_col = c_idx
+        if last_nonempty_col > 0:
+            effective_max_row = r_idx
+            if last_nonempty_col > effective_max_col:
+                effective_max_col = last_nonempty_col
+
+    # Build rectangular data limited to effective bounds
+    trimmed_rows: List[List[Optional[object]]] = []
+    for values in row_values[:effective_max_row]:
+        row_list = list(values[:effective_max_col])
+        if len(row_list) < effective_max_col:
+            row_list.extend([None] * (effective_max_col - len(row_list)))
+        trimmed_rows.append(row_list)
+
+    return pd.DataFrame(trimmed_rows)
+
+
 def extract_excel_data(sheet_names: List[str], sheets: Dict[str, pd.DataFrame],
-                       hidden_cols: Optional[Dict[str, Set[int]]] = None):
+                       hidden_cols: Optional[Dict[str, Set[int]]] = None,
+                       workers: int = 1,
+                       on_sheet: Optional[SheetCallback] = None,
+                       reference_stations: Optional[Dict[str, float]] = None,
+                       header_band: HeaderBand = (None, None)):
     """Extract station map from first sheet and per-sheet trains data.
 
+    With ``workers`` > 1, sheets after the reference lookup are extracted in a
+    process pool of that size; results are identical to the serial run.
+    ``on_sheet`` is called after each extracted sheet, as in ``read_workbook``;
+    raising from it stops extraction and cancels queued pool work.
+    ``reference_stations`` replaces the first sheet as the station reference
+    (used when re-extracting only some sheets of a loaded workbook).
+    ``header_band`` is the (rows, cols) band searched for headers, see
+    ``find_headers`` (None = whole sheet).
+
     Returns a dict with keys:
     - station_map: Dict[str, float]  # station -> km from the first sheet
+    - station_maps: Dict[str, Dict[str, float]]  # per-sheet station -> km
     - station_check: Dict[str, Any]  # {'ok': bool, 'mismatches': List[str]}
-    - sheets_data: List[Dict[str, Any]]  # [{'sheet': name, 'trains': List[...]}]
+    - sheet_mismatches: Dict[str, List[str]]  # station_check mismatches per sheet
+    - sheets_data: List[Dict[str, Any]]  # [{'sheet': name, 'trains': SheetTimetable}]
     """
     if not sheet_names:
         return {
             "station_map": {},
             "station_check": {"ok": False, "mismatches": ["Workbook has no sheets."]},
+            "sheet_mismatches": {},
             "sheets_data": [],
         }
 
-    first_sheet = sheet_names[0]
-    df_first = sheets[first_sheet]
-    pos_first = find_headers(df_first)
+    if reference_stations is not None:
+        station_to_km = dict(reference_stations)
+    else:
+        station_to_km = extract_reference_stations(sheets[sheet_names[0]], header_band)
+    reference_station_set = set(station_to_km.keys())
+
+    mismatches: List[str] = []
+    sheet_mismatches_by_name: Dict[str, List[str]] = {}
+    sheets_data: List[Dict[str, Any]] = []
+    station_maps: Dict[str, Dict[str, float]] = {sheet_names[0]: station_to_km}
+
+    results = extract_sheets(sheet_names, sheets, hidden_cols, reference_station_set, workers=workers,
+                             header_band=header_band)
+    try:
+        for sheet, (sheet_map, sheet_mismatches, trains_list) in results:
+            station_maps[sheet] = sheet_map
+            mismatches.extend(sheet_mismatches)
+            sheet_mismatches_by_name[sheet] = sheet_mismatches
+            sheets_data.append({"sheet": sheet, "trains": trains_list})
+            if on_sheet is not None:
+                on_sheet(sheet, len(sheets_data), len(sheet_names))
+    finally:
+        # cancels the sheets still queued in the worker pool if on_sheet aborted the loop
+        results.close()
+
+    station_check = {"ok": len(mismatches) == 0, "mismatches": mismatches}
+
+    return {
+        "station_map": station_to_km,
+        "station_maps": station_maps,
+        "station_check": station_check,
+        "sheet_mismatches": sheet_mismatches_by_name,
+        "sheets_data": sheets_data,
+    }
+
+
+def extract_reference_stations(df_first: pd.DataFrame,
+                               header_band: HeaderBand = (None, None)) -> Dict[str, float]:
+    """Station -> km map of the first (reference) sheet.
+
+    Raises ValueError when the sheet has no station headers.
+    """
+    pos_first = find_headers(df_first, *header_band)
 
     if not all(
         pos_first.get(k) is not None
@@ -115,123 +332,182 @@ def extract_excel_data(sheet_names: List[str], sheets: Dict[str, pd.DataFrame],
         station_col=pos_first["station_col"],
         km_col=pos_first["km_col"],
     )
+    return {station: km for km, station, _ in stations_first}
 
-    # station_map based on the first sheet
-    station_to_km = {station: km for km, station, _ in stations_first}
-    reference_station_set = set(station_to_km.keys())
 
+def extract_sheets(
+    sheet_names: List[str],
+    sheets: Dict[str, pd.DataFrame],
+    hidden_cols: Optional[Dict[str, Set[int]]],
+    reference_station_set: Set[str],
+    workers: int = 1,
+    header_band: HeaderBand = (None, None),
+) -> Iterator[Tuple[str, Tuple[Dict[str, float], List[str], List[Dict[str, Any]]]]]:
+    """Yield (sheet, (station_map, mismatches, trains)) for each sheet, in the given order.
+
+    With ``workers`` > 1 the sheets are extracted in the shared process pool
+    of that size; closing the generator early cancels the sheets still queued.
+    """
+    frames = [sheets[sheet] for sheet in sheet_names]
+    hidden_per_sheet = [(hidden_cols or {}).get(sheet, set()) for sheet in sheet_names]
+    references = [reference_station_set] * len(sheet_names)
+    bands = [header_band] * len(sheet_names)
+
+    if workers <= 1 or len(sheet_names) <= 1:
+        yield from zip(sheet_names, map(_extract_sheet, sheet_names, frames, hidden_per_sheet, references, bands))
+        return
+    pool = _extract_pool(workers)
+    futures = [pool.submit(_extract_sheet, *args)
+               for args in zip(sheet_names, frames, hidden_per_sheet, references, bands)]
+    try:
+        # results in submission order, so sheets stay in workbook order
+        for sheet, future in zip(sheet_names, futures):
+            yield sheet, future.result()
+    finally:
+        for future in futures:
+            future.cancel()
+
+
+# Process pool for extract_sheets, started on first use and kept for the
+# life of the process (worker start-up costs more than a small sheet)
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+
+def _extract_pool(workers: int) -> ProcessPoolExecutor:
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = ProcessPoolExecutor(max_workers=workers)
+            _pool_workers = workers
+        return _pool
+
+
+def shutdown_extract_pool() -> None:
+    """Stop the extraction worker processes (at app shutdown)."""
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(cancel_futures=True)
+        _pool = None
+        _pool_workers = 0
+
+
+def _extract_sheet(
+    sheet: str,
+    df: pd.DataFrame,
+    sheet_hidden: Set[int],
+    reference_station_set: Set[str],
+    header_band: HeaderBand = (None, None),
+) -> Tuple[Dict[str, float], List[str], SheetTimetable]:
+    """Extract one sheet: (station_map, station mismatches, train events).
+
+    Only depends on its arguments, so sheets can be processed in any order or
+    in worker processes.
+    """
     mismatches: List[str] = []
-    sheets_data: List[Dict[str, Any]] = []
-    station_maps: Dict[str, Dict[str, float]] = {sheet_names[0]: station_to_km}
+    pos = find_headers(df, *header_band)
 
-    for sheet in sheet_names:
-        df = sheets[sheet]
-        pos = find_headers(df)
-
-        # Extract and verify station list for the sheet (order-independent)
-        if all(
-            pos.get(k) is not None
-            for k in ("station_start_row", "station_end_row", "station_col", "km_col")
-        ):
-            stations = extract_stations(
-                df,
-                start_row=pos["station_start_row"],
-                end_row=pos["station_end_row"],
-                station_col=pos["station_col"],
-                km_col=pos["km_col"],
-            )
-            # per-sheet station map
-            station_maps[sheet] = {s: km for km, s, _ in stations}
-            sheet_station_set = {s for _, s, _ in stations}
-            if sheet_station_set != reference_station_set:
-                only_in_sheet = sorted(sheet_station_set - reference_station_set)
-                only_in_ref = sorted(reference_station_set - sheet_station_set)
-                if only_in_sheet:
-                    mismatches.append(
-                        f"Sheet '{sheet}' has stations not in reference: {only_in_sheet}"
-                    )
-                if only_in_ref:
-                    mismatches.append(
-                        f"Sheet '{sheet}' misses stations from reference: {only_in_ref}"
-                    )
-        else:
-            mismatches.append(f"Sheet '{sheet}' is missing station headers.")
-            stations = []
-            station_maps[sheet] = {}
-
-        # Extract trains
-        trains_list: List[Dict[str, Any]] = []
-        if pos.get("train_row") is not None and stations:
-            train_columns = extract_train_columns(
-                df,
-                pos["train_row"],
-                station_start_row=pos.get("station_start_row"),
-                station_end_row=pos.get("station_end_row"),
-            )
-
-            # Filter out hidden columns
-            if hidden_cols:
-                sheet_hidden = hidden_cols.get(sheet, set())
-                if sheet_hidden:
-                    train_columns = {k: v for k, v in train_columns.items()
-                                     if v not in sheet_hidden}
-
-            # Build entries: train_number - station - km (from this sheet) - time (HH:MM or HH:MM (+d))
-            # Collect raw times per train first, then apply midnight correction
-            # Detect dual stations: (station_name, km) appearing in multiple rows
-            _station_occurrences = {}
+    # Extract and verify station list for the sheet (order-independent)
+    if all(
+        pos.get(k) is not None
+        for k in ("station_start_row", "station_end_row", "station_col", "km_col")
+    ):
+        stations = extract_stations(
+            df,
+            start_row=pos["station_start_row"],
+            end_row=pos["station_end_row"],
+            station_col=pos["station_col"],
+            km_col=pos["km_col"],
+        )
+        # per-sheet station map
+        station_map = {s: km for km, s, _ in stations}
+        sheet_station_set = {s for _, s, _ in stations}
+        if sheet_station_set != reference_station_set:
+            only_in_sheet = sorted(sheet_station_set - reference_station_set)
+            only_in_ref = sorted(reference_station_set - sheet_station_set)
+            if only_in_sheet:
+                mismatches.append(
+                    f"Sheet '{sheet}' has stations not in reference: {only_in_sheet}"
+                )
+            if only_in_ref:
+                mismatches.append(
+                    f"Sheet '{sheet}' misses stations from reference: {only_in_ref}"
+                )
+    else:
+        mismatches.append(f"Sheet '{sheet}' is missing station headers.")
+        stations = []
+        station_map = {}
+
+    # Extract trains, one list per field (see timetable_store)
+    columns: Dict[str, List[Any]] = {field: [] for field in (*CORE_FIELDS, "stop_type")}
+    if pos.get("train_row") is not None and stations:
+        # Parse the whole time area (station rows x all columns) in one batch;
+        # stations exist, so the station header rows are known here
+        area_start = pos["station_start_row"] + 1
+        time_area = parse_times(df.iloc[area_start:pos["station_end_row"]])
+
+        train_columns = extract_train_columns(
+            df,
+            pos["train_row"],
+            station_start_row=pos.get("station_start_row"),
+            station_end_row=pos.get("station_end_row"),
+            has_time=~np.isnan(time_area),
+        )
+
+        # Filter out hidden columns
+        if sheet_hidden:
+            train_columns = {k: v for k, v in train_columns.items()
+                             if v not in sheet_hidden}
+
+        # Build entries: train_number - station - km (from this sheet) - time (HH:MM or HH:MM (+d))
+        # Collect raw times per train first, then apply midnight correction
+        # Detect dual stations: (station_name, km) appearing in multiple rows
+        _station_occurrences = {}
+        for km_ref, station_name, row_idx in stations:
+            _station_occurrences.setdefault((station_name, float(km_ref)), []).append(row_idx)
+        _dual_keys = {k for k, v in _station_occurrences.items() if len(v) > 1}
+
+        for train_nr, col in train_columns.items():
+            raw_entries = []  # (station_name, km_ref, raw_time, stop_type)
+            col_times = time_area[:, col]
             for km_ref, station_name, row_idx in stations:
-                _station_occurrences.setdefault((station_name, float(km_ref)), []).append(row_idx)
-            _dual_keys = {k for k, v in _station_occurrences.items() if len(v) > 1}
-
-            for train_nr, col in train_columns.items():
-                raw_entries = []  # (station_name, km_ref, raw_time, stop_type)
-                for km_ref, station_name, row_idx in stations:
-                    raw_val = df.iat[row_idx, col]
-                    t = parse_time(raw_val)
-                    if t is None:
-                        continue
-                    sk = (station_name, float(km_ref))
-                    if sk in _dual_keys:
-                        occ_idx = _station_occurrences[sk].index(row_idx)
-                        stop_type = "o" if occ_idx > 0 else "p"
-                    else:
-                        stop_type = None
-                    raw_entries.append((station_name, float(km_ref), float(t), stop_type))
-
-                if not raw_entries:
+                t = col_times[row_idx - area_start]
+                if math.isnan(t):
                     continue
+                sk = (station_name, float(km_ref))
+                if sk in _dual_keys:
+                    occ_idx = _station_occurrences[sk].index(row_idx)
+                    stop_type = "o" if occ_idx > 0 else "p"
+                else:
+                    stop_type = None
+                raw_entries.append((station_name, float(km_ref), float(t), stop_type))
+
+            if not raw_entries:
+                continue
+
+            # Apply midnight correction to the sequence of raw times
+            raw_times = [e[2] for e in raw_entries]
+            corrected_times = apply_midnight_correction(raw_times)
+
+            train_label = str(train_nr)
+            for i, (station_name, km_ref, _raw_t, stop_type) in enumerate(raw_entries):
+                corrected_t = corrected_times[i]
+                columns["train_number"].append(train_label)
+                columns["station"].append(station_name)
+                columns["km"].append(km_ref)
+                columns["time"].append(format_time_decimal(corrected_t))
+                columns["time_decimal"].append(corrected_t)
+                columns["stop_type"].append(stop_type)
+    else:
+        # No trains found or no stations available to map
+        pass
+
+    return station_map, mismatches, SheetTimetable.from_columns(**columns)
 
-                # Apply midnight correction to the sequence of raw times
-                raw_times = [e[2] for e in raw_entries]
-                corrected_times = apply_midnight_correction(raw_times)
-
-                for i, (station_name, km_ref, _raw_t, stop_type) in enumerate(raw_entries):
-                    corrected_t = corrected_times[i]
-                    rec = {
-                        "train_number": str(train_nr),
-                        "station": station_name,
-                        "km": km_ref,
-                        "time": format_time_decimal(corrected_t),
-                        "time_decimal": corrected_t,
-                    }
-                    if stop_type is not None:
-                        rec["stop_type"] = stop_type
-                    trains_list.append(rec)
-        else:
-            # No trains found or no stations available to map
-            pass
-
-        sheets_data.append({"sheet": sheet, "trains": trains_list})
-
-    station_check = {"ok": len(mismatches) == 0, "mismatches": mismatches}
-
-    return {
-        "station_map": station_to_km,
-        "station_maps": station_maps,
-        "station_check": station_check,
-        "sheets_data": sheets_data,
-    }
 
 
 def read_and_store_in_session(file_bytes: bytes, session_state) -> None:
@@ -1,6 +1,7 @@
 import React, { useCallback, useState } from "react";
 import { useStore } from "./store";
 import * as api from "./api";
+import type { TrainsData, UploadProgress } from "./types";
 import FileUpload from "./components/FileUpload";
 import SheetSelector from "./components/SheetSelector";
 import TrainPlot from "./components/TrainPlot";
@@ -35,7 +36,7 @@ export default function App() {
     plotHeight,
     setSheets,
     setTrainsData,
-    setTrainColors,
+    applyColors,
     setActiveColor,
     setLoading,
     setError,
@@ -43,26 +44,57 @@ export default function App() {
   } = useStore();
 
   const [editInfo, setEditInfo] = useState<EditInfo | null>(null);
+  const [uploadJobId, setUploadJobId] = useState<string | null>(null);
+  const [uploadProgress, setUploadProgress] = useState<UploadProgress | null>(null);
+
+  // Lazy uploads render the first sheet right away; extract the rest afterwards
+  const loadPendingSheets = useCallback(
+    async (data: TrainsData) => {
+      if (!data.pending_sheets?.length) return;
+      try {
+        await api.loadPendingSheets();
+        setTrainsData(await api.getTrains());
+      } catch (e: any) {
+        setError(e.message);
+      }
+    },
+    [setTrainsData, setError],
+  );
 
   const handleUpload = useCallback(
     async (file: File) => {
       setLoading(true);
       setError(null);
       setActiveColor(null);
+      setUploadProgress(null);
       try {
-        const res = await api.uploadFile(file);
+        const job = await api.startUploadJob(file);
+        setUploadJobId(job.job_id);
+        const res = await api.followUploadJob(job.job_id, setUploadProgress);
         setSheets(res.sheets, res.selected_sheet);
         const trains = await api.getTrains();
         setTrainsData(trains);
+        void loadPendingSheets(trains);
       } catch (e: any) {
         setError(e.message || "Błąd wczytywania pliku");
       } finally {
+        setUploadJobId(null);
+        setUploadProgress(null);
         setLoading(false);
       }
     },
-    [setSheets, setTrainsData, setLoading, setError],
+    [setSheets, setTrainsData, setLoading, setError, loadPendingSheets],
   );
 
+  const handleUploadCancel = useCallback(async () => {
+    if (uploadJobId === null) return;
+    try {
+      await api.cancelUploadJob(uploadJobId);
+    } catch (e: any) {
+      setError(e.message);
+    }
+  }, [uploadJobId, setError]);
+
   const handleSheetSelect = useCallback(
     async (sheet: string) => {
       setLoading(true);
@@ -91,38 +123,35 @@ export default function App() {
 
   const handleClearAllColors = useCallback(async () => {
     try {
-      const colors = await api.clearAllColors();
-      setTrainColors(colors);
+      applyColors(await api.clearAllColors());
       setActiveColor(null);
     } catch (e: any) {
       setError(e.message);
     }
-  }, [setTrainColors, setActiveColor, setError]);
+  }, [applyColors, setActiveColor, setError]);
 
   const handlePointClick = useCallback(
     async (train: string) => {
       if (activeColor === null) return;
       try {
-        const colors = await api.setColor(train, activeColor);
-        setTrainColors(colors);
+        applyColors(await api.setColor(train, activeColor));
       } catch (e: any) {
         setError(e.message);
       }
     },
-    [activeColor, setTrainColors, setError],
+    [activeColor, applyColors, setError],
   );
 
   const handleCellClick = useCallback(
     async (field: string) => {
       if (activeColor === null) return;
       try {
-        const colors = await api.setColor(field, activeColor);
-        setTrainColors(colors);
+        applyColors(await api.setColor(field, activeColor));
       } catch (e: any) {
         setError(e.message);
       }
     },
-    [activeColor, setTrainColors, setError],
+    [activeColor, applyColors, setError],
   );
 
   const handlePointDoubleClick = useCallback(
@@ -206,8 +235,8 @@ export default function App() {
           day_offset: editInfo.dayOffset,
           stop_type: editInfo.stopType,
           propagate,
-        });
-        setTrainsData(data);
+        }, trainsData?.version);
+        setTrainsData(await api.applyEdit(trainsData, data));
         setEditInfo(null);
       } catch (e: any) {
         setError(e.message);
@@ -215,7 +244,7 @@ export default function App() {
         setLoading(false);
       }
     },
-    [editInfo, setTrainsData, setLoading, setError],
+    [editInfo, trainsData, setTrainsData, setLoading, setError],
   );
 
   const handleClear = useCallback(async () => {
@@ -228,15 +257,15 @@ export default function App() {
         km: editInfo.km,
         train_number: editInfo.trainNumber,
         stop_type: editInfo.stopType,
-      });
-      setTrainsData(data);
+      }, trainsData?.version);
+      setTrainsData(await api.applyEdit(trainsData, data));
       setEditInfo(null);
     } catch (e: any) {
       setError(e.message);
     } finally {
       setLoading(false);
     }
-  }, [editInfo, setTrainsData, setLoading, setError]);
+  }, [editInfo, trainsData, setTrainsData, setLoading, setError]);
 
   const hasData = trainsData !== null && trainsData.grid_rows.length > 0;
 
@@ -244,7 +273,12 @@ export default function App() {
     <div className="app">
       <h1>Rozkład Jazdy - wykresy z tabeli</h1>
 
-      <FileUpload onUpload={handleUpload} loading={loading} />
+      <FileUpload
+        onUpload={handleUpload}
+        loading={loading}
+        progress={uploadProgress}
+        onCancel={uploadJobId !== null ? handleUploadCancel : undefined}
+      />
 
       <XlsxRequirements />
 
@@ -1,4 +1,7 @@
-import type { TrainsData, SheetsData, UploadResponse } from "./types";
+import type {
+  ColorsResponse, ColumnarSeries, EditOp, PlotDicts, PlotSeries, PlotWindow, TrainsData, TrainsDelta, SheetsData, UploadJob, UploadProgress, UploadResponse,
+} from "./types";
+import { decodeTrainsBinary } from "./binary";
 
 const BASE = "/api";
 
@@ -11,12 +14,67 @@ async function request<T>(url: string, init?: RequestInit): Promise<T> {
   return res.json();
 }
 
+// Trains payloads carry their data version in a header
+async function requestTrains<T extends TrainsData | TrainsDelta>(url: string, init?: RequestInit): Promise<T> {
+  const res = await fetch(`${BASE}${url}`, init);
+  if (!res.ok) {
+    const text = await res.text();
+    throw new Error(`${res.status}: ${text}`);
+  }
+  const data = await res.json();
+  const version = res.headers.get("X-Data-Version");
+  if (version !== null) data.version = version;
+  return data;
+}
+
+function editUrl(path: string, baseVersion?: string): string {
+  return baseVersion === undefined
+    ? `/edit/${path}`
+    : `/edit/${path}?base_version=${encodeURIComponent(baseVersion)}`;
+}
+
 export async function uploadFile(file: File): Promise<UploadResponse> {
   const form = new FormData();
   form.append("file", file);
   return request<UploadResponse>("/upload", { method: "POST", body: form });
 }
 
+export async function startUploadJob(file: File): Promise<UploadJob> {
+  const form = new FormData();
+  form.append("file", file);
+  return request<UploadJob>("/upload/jobs", { method: "POST", body: form });
+}
+
+// Follow a background upload over SSE; EventSource reconnects (with
+// Last-Event-ID) on its own if the connection drops mid-way.
+export function followUploadJob(
+  jobId: string,
+  onProgress: (progress: UploadProgress) => void,
+): Promise<UploadResponse> {
+  return new Promise((resolve, reject) => {
+    const source = new EventSource(`${BASE}/upload/jobs/${jobId}/events`);
+    const data = (e: Event) => JSON.parse((e as MessageEvent).data);
+    source.addEventListener("progress", (e) => onProgress(data(e)));
+    source.addEventListener("done", (e) => {
+      source.close();
+      resolve(data(e).result);
+    });
+    source.addEventListener("failed", (e) => {
+      source.close();
+      const { status_code, detail } = data(e);
+      reject(new Error(`${status_code}: ${detail}`));
+    });
+    source.addEventListener("cancelled", () => {
+      source.close();
+      reject(new Error("Wczytywanie anulowane"));
+    });
+  });
+}
+
+export async function cancelUploadJob(jobId: string): Promise<UploadJob> {
+  return request<UploadJob>(`/upload/jobs/${jobId}`, { method: "DELETE" });
+}
+
 export async function getSheets(): Promise<SheetsData> {
   return request<SheetsData>("/sheets");
 }
@@ -29,8 +87,75 @@ export async function selectSheet(sheet: string): Promise<SheetsData> {
   });
 }
 
+export async function loadPendingSheets(): Promise<SheetsData> {
+  return request<SheetsData>("/sheets/load", { method: "POST" });
+}
+
+const BINARY_TYPE = "application/vnd.timetable.binary";
+const COLUMNAR_TYPE = "application/vnd.timetable.columnar+json";
+
+// Negotiated as binary (or columnar JSON) and expanded to plot points here
 export async function getTrains(): Promise<TrainsData> {
-  return request<TrainsData>("/trains");
+  const res = await fetch(`${BASE}/trains`, {
+    headers: { Accept: `${BINARY_TYPE}, ${COLUMNAR_TYPE};q=0.9, application/json;q=0.5` },
+  });
+  if (!res.ok) {
+    const text = await res.text();
+    throw new Error(`${res.status}: ${text}`);
+  }
+  const type = res.headers.get("Content-Type") ?? "";
+  let data: any;
+  if (type.startsWith(BINARY_TYPE)) {
+    data = decodeTrainsBinary(await res.arrayBuffer());
+  } else {
+    data = await res.json();
+    if (data.plot_format === "columnar") {
+      data.plot_series = expandColumnar(data.plot_series, data.plot_dicts);
+      delete data.plot_format;
+      delete data.plot_dicts;
+    }
+  }
+  const version = res.headers.get("X-Data-Version");
+  if (version !== null) data.version = version;
+  return data as TrainsData;
+}
+
+// Only the series visible in a zoomed view; omitted bounds are open. With
+// the plot's size in pixels the series come simplified to what can be seen.
+// Not called by TrainPlot yet; it still draws the full payload's series.
+export async function getPlotWindow(window: {
+  from_ms?: number;
+  to_ms?: number;
+  km_min?: number;
+  km_max?: number;
+  width_px?: number;
+  height_px?: number;
+}): Promise<PlotWindow> {
+  const params = new URLSearchParams({ format: "columnar" });
+  for (const [key, value] of Object.entries(window)) {
+    if (value !== undefined) params.set(key, String(value));
+  }
+  const data = await request<any>(`/trains/plot?${params}`);
+  data.plot_series = expandColumnar(data.plot_series, data.plot_dicts);
+  delete data.plot_format;
+  delete data.plot_dicts;
+  return data as PlotWindow;
+}
+
+function expandColumnar(series: ColumnarSeries[], dicts: PlotDicts): PlotSeries[] {
+  return series.map((s) => {
+    const sheet = dicts.sheets[s.sheet];
+    return {
+      name: s.name,
+      points: s.ms.map((ms, i) => ({
+        value: [ms, s.km[i]] as [number, number],
+        station: dicts.stations[s.station[i]],
+        train: s.train,
+        sheet,
+        stopType: dicts.stop_types[s.stop[i]],
+      })),
+    };
+  });
 }
 
 export async function saveTime(body: {
@@ -44,8 +169,8 @@ export async function saveTime(body: {
   day_offset?: number;
   stop_type?: string | null;
   propagate?: boolean;
-}): Promise<TrainsData> {
-  return request<TrainsData>("/edit/save", {
+}, baseVersion?: string): Promise<TrainsData | TrainsDelta> {
+  return requestTrains(editUrl("save", baseVersion), {
     method: "POST",
     headers: { "Content-Type": "application/json" },
     body: JSON.stringify(body),
@@ -58,28 +183,100 @@ export async function clearTime(body: {
   km: number;
   train_number: string;
   stop_type?: string | null;
-}): Promise<TrainsData> {
-  return request<TrainsData>("/edit/clear", {
+}, baseVersion?: string): Promise<TrainsData | TrainsDelta> {
+  return requestTrains(editUrl("clear", baseVersion), {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify(body),
+  });
+}
+
+// Apply several edits atomically with one payload rebuild; a failing
+// operation rejects the whole batch (HTTP 400 with its index).
+export async function editBatch(ops: EditOp[], baseVersion?: string): Promise<TrainsData | TrainsDelta> {
+  return requestTrains(editUrl("batch", baseVersion), {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify({ ops }),
+  });
+}
+
+// Shift whole trains by N minutes; the given criteria are combined.
+export async function shiftTimes(body: {
+  delta_minutes: number;
+  sheets?: string[];
+  train_numbers?: string[];
+  colors?: string[];
+  departure_from?: string; // "HH:MM"
+  departure_to?: string;
+}, baseVersion?: string): Promise<TrainsData | TrainsDelta> {
+  return requestTrains(editUrl("shift", baseVersion), {
     method: "POST",
     headers: { "Content-Type": "application/json" },
     body: JSON.stringify(body),
   });
 }
 
-export async function setColor(train_number: string, color: string): Promise<Record<string, string>> {
-  const res = await request<{ train_colors: Record<string, string> }>("/colors", {
+// Edit functions called with the current payload's version answer with a
+// delta, or with the full payload when that version is stale or belongs to
+// another session; apply the delta, or refetch when it was computed for
+// another version.
+export async function applyEdit(
+  current: TrainsData | null,
+  res: TrainsData | TrainsDelta,
+): Promise<TrainsData> {
+  if (!("base_version" in res)) return res;
+  if (current === null || res.base_version !== current.version) {
+    return getTrains();
+  }
+  const next: TrainsData = { ...current, version: res.version };
+  if (res.grid_rows) {
+    next.grid_rows = res.grid_rows;
+    next.column_defs = res.column_defs!;
+    next.station_items = res.station_items!;
+  } else if (res.row_cells?.length) {
+    next.grid_rows = current.grid_rows.slice();
+    for (const { row, cells, decimals } of res.row_cells) {
+      const updated = { ...next.grid_rows[row], ...cells, _decimals: { ...next.grid_rows[row]._decimals } };
+      for (const [tn, dec] of Object.entries(decimals)) {
+        if (dec === null) delete updated._decimals[tn];
+        else updated._decimals[tn] = dec;
+      }
+      next.grid_rows[row] = updated;
+    }
+  }
+  if (res.series && Object.keys(res.series).length) {
+    const changes = { ...res.series };
+    next.plot_series = [];
+    for (const s of current.plot_series) {
+      if (!(s.name in changes)) next.plot_series.push(s);
+      else {
+        const replaced = changes[s.name];
+        if (replaced) next.plot_series.push(replaced);
+        delete changes[s.name];
+      }
+    }
+    for (const s of Object.values(changes)) if (s) next.plot_series.push(s);
+  }
+  next.x_min_ms = res.x_min_ms ?? current.x_min_ms;
+  next.x_max_ms = res.x_max_ms ?? current.x_max_ms;
+  next.train_colors = res.train_colors ?? current.train_colors;
+  next.pending_sheets = res.pending_sheets ?? current.pending_sheets;
+  return next;
+}
+
+export async function setColor(train_number: string, color: string): Promise<ColorsResponse> {
+  return request<ColorsResponse>("/colors", {
     method: "PUT",
     headers: { "Content-Type": "application/json" },
     body: JSON.stringify({ train_number, color }),
   });
-  return res.train_colors;
 }
 
-export async function clearAllColors(): Promise<Record<string, string>> {
-  const res = await request<{ train_colors: Record<string, string> }>("/colors/all", {
+export async function clearAllColors(): Promise<ColorsResponse> {
+  return request<ColorsResponse>("/colors/all", {
     method: "DELETE",
   });
-  return res.train_colors;
 }
 
 export function downloadUrl(path: string): string {
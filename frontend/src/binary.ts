@@ -0,0 +1,72 @@
+// Decoder for application/vnd.timetable.binary (see
+// backend/services/binary_payload.py): a JSON header plus 8-byte aligned
+// typed-array buffers. The buffers are read through typed-array views, but
+// the result is the same TrainsData as the JSON formats (per-point plot
+// objects, dense grid rows), so binary cuts transfer size and JSON parsing,
+// not the client's memory or build time.
+import type { GridRow, PlotDicts, PlotSeries, TrainsData } from "./types";
+
+interface BufferInfo {
+  dtype: string;
+  offset: number;
+  length: number;
+}
+
+const ARRAYS: Record<string, any> = {
+  int64: BigInt64Array,
+  float64: Float64Array,
+  int32: Int32Array,
+  int16: Int16Array,
+  uint16: Uint16Array,
+};
+
+export function decodeTrainsBinary(buf: ArrayBuffer): TrainsData {
+  const magic = new TextDecoder().decode(new Uint8Array(buf, 0, 4));
+  if (magic !== "TTB1") throw new Error("Nieprawidłowy format danych binarnych");
+  const size = new DataView(buf).getUint32(4, true);
+  const header = JSON.parse(new TextDecoder().decode(new Uint8Array(buf, 8, size)));
+  const view = (name: string) => {
+    const info: BufferInfo = header.buffers[name];
+    return new ARRAYS[info.dtype](buf, info.offset, info.length);
+  };
+
+  const dicts: PlotDicts = header.plot_dicts;
+  const offsets: Int32Array = view("series_offsets");
+  const ms: BigInt64Array = view("ms");
+  const km: Float64Array = view("km");
+  const station: Int32Array = view("station");
+  const stop: Int16Array = view("stop");
+  const plot_series: PlotSeries[] = header.plot_series.map(
+    (s: { name: string; train: string; sheet: number }, i: number) => {
+      const sheet = dicts.sheets[s.sheet];
+      const points = [];
+      for (let j = offsets[i]; j < offsets[i + 1]; j++) {
+        points.push({
+          value: [Number(ms[j]), km[j]] as [number, number],
+          station: dicts.stations[station[j]],
+          train: s.train,
+          sheet,
+          stopType: dicts.stop_types[stop[j]],
+        });
+      }
+      return { name: s.name, points };
+    },
+  );
+
+  const trains: string[] = header.column_defs.slice(2).map((c: { field: string }) => c.field);
+  const times: string[] = header.grid_times;
+  const cells = view("grid_cells");
+  const decimals: Float64Array = view("grid_decimals");
+  const grid_rows: GridRow[] = header.grid_rows.map((meta: GridRow, r: number) => {
+    const row: GridRow = { ...meta, _decimals: {} };
+    trains.forEach((tn, c) => {
+      const k = r * trains.length + c;
+      row[tn] = times[cells[k]];
+      if (!Number.isNaN(decimals[k])) row._decimals[tn] = decimals[k];
+    });
+    return row;
+  });
+
+  const { buffers, plot_dicts, plot_format, grid_times, ...rest } = header;
+  return { ...rest, plot_series, grid_rows };
+}
@@ -1,11 +1,19 @@
 import React, { useCallback, useRef, useState } from "react";
+import type { UploadProgress } from "../types";
 
 interface Props {
   onUpload: (file: File) => void;
   loading: boolean;
+  progress?: UploadProgress | null;
+  onCancel?: () => void;
 }
 
-export default function FileUpload({ onUpload, loading }: Props) {
+const PHASE_LABELS: Record<UploadProgress["phase"], string> = {
+  read: "Odczyt arkusza",
+  extract: "Analiza arkusza",
+};
+
+export default function FileUpload({ onUpload, loading, progress, onCancel }: Props) {
   const inputRef = useRef<HTMLInputElement>(null);
   const [dragOver, setDragOver] = useState(false);
 
@@ -52,7 +60,24 @@ export default function FileUpload({ onUpload, loading }: Props) {
         }}
       />
       {loading ? (
-        <p>Wczytywanie...</p>
+        <>
+          <p>
+            {progress
+              ? `${PHASE_LABELS[progress.phase]} ${progress.done}/${progress.total}: ${progress.sheet}`
+              : "Wczytywanie..."}
+          </p>
+          {onCancel && (
+            <button
+              type="button"
+              onClick={(e) => {
+                e.stopPropagation();
+                onCancel();
+              }}
+            >
+              Anuluj
+            </button>
+          )}
+        </>
       ) : (
         <>
           <p>Przeciągnij plik Excel (.xlsx) lub projekt (.json) tutaj</p>
@@ -1,5 +1,5 @@
 import { create } from "zustand";
-import type { TrainsData } from "./types";
+import type { ColorsResponse, TrainsData } from "./types";
 
 interface AppState {
   // Data
@@ -19,6 +19,7 @@ interface AppState {
   setTrainsData: (data: TrainsData) => void;
   setSelectedSheet: (sheet: string) => void;
   setTrainColors: (colors: Record<string, string>) => void;
+  applyColors: (res: ColorsResponse) => void;
   setActiveColor: (color: string | null) => void;
   setLoading: (loading: boolean) => void;
   setError: (error: string | null) => void;
@@ -44,6 +45,16 @@ export const useStore = create<AppState>((set) => ({
     }),
   setSelectedSheet: (sheet) => set({ selectedSheet: sheet }),
   setTrainColors: (colors) => set({ trainColors: colors }),
+  // The payload stays current only if it was at the write's base version;
+  // otherwise its stale version makes the next edit refetch in full.
+  applyColors: (res) =>
+    set((state) => ({
+      trainColors: res.train_colors,
+      trainsData:
+        state.trainsData && state.trainsData.version === res.base_version
+          ? { ...state.trainsData, train_colors: res.train_colors, version: res.version }
+          : state.trainsData,
+    })),
   setActiveColor: (color) => set({ activeColor: color }),
   setLoading: (loading) => set({ loading }),
   setError: (error) => set({ error }),
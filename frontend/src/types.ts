@@ -16,6 +16,24 @@ export interface PlotSeries {
   points: PlotPoint[];
 }
 
+// plot_series of GET /api/trains?format=columnar: parallel arrays, with
+// sheet/station/stop as indexes into PlotDicts
+export interface ColumnarSeries {
+  name: string;
+  train: string;
+  sheet: number;
+  ms: number[];
+  km: number[];
+  station: number[];
+  stop: number[];
+}
+
+export interface PlotDicts {
+  stations: string[];
+  sheets: string[];
+  stop_types: (string | null)[];
+}
+
 export interface ColumnDef {
   field: string;
   headerName: string;
@@ -41,11 +59,54 @@ export interface TrainsData {
   x_max_ms: number;
   train_colors: Record<string, string>;
   selected_sheet: string;
+  pending_sheets?: string[]; // sheets of a lazy upload not extracted yet
+  version?: string; // X-Data-Version "<session id>:<version>" of the response (base for edit deltas)
+}
+
+export interface RowCells {
+  row: number;
+  cells: Record<string, string>;
+  decimals: Record<string, number | null>;
+}
+
+// Edit response with a current ?base_version=; a stale base or one from
+// another session gets the full TrainsData instead.
+export interface TrainsDelta {
+  base_version: string;
+  version: string;
+  row_cells?: RowCells[];
+  grid_rows?: GridRow[]; // with column_defs/station_items when the grid's shape changed
+  column_defs?: ColumnDef[];
+  station_items?: StationItem[];
+  series?: Record<string, PlotSeries | null>; // null: series removed
+  x_min_ms?: number;
+  x_max_ms?: number;
+  train_colors?: Record<string, string>;
+  pending_sheets?: string[];
+}
+
+// GET /api/trains/plot: series touching a time / km window, clipped to it
+// PUT /api/colors, DELETE /api/colors/all
+export interface ColorsResponse {
+  train_colors: Record<string, string>;
+  base_version: string;
+  version: string;
+}
+
+export interface PlotWindow {
+  plot_series: PlotSeries[];
+  total_series: number;
+  from_ms: number | null;
+  to_ms: number | null;
+  km_min: number | null;
+  km_max: number | null;
+  lod?: { bucket: [number, number]; points: number; of: number }; // with width_px/height_px
 }
 
 export interface SheetsData {
   sheets: string[];
   selected_sheet: string;
+  pending?: string[];
 }
 
 export interface UploadResponse {
@@ -53,4 +114,40 @@ export interface UploadResponse {
   sheets: string[];
   selected_sheet: string;
   message: string;
+  pending?: string[];
+  reused?: string[];
+  reparsed?: string[];
+}
+
+export interface UploadJob {
+  job_id: string;
+  status: string;
+}
+
+export interface UploadProgress {
+  phase: "read" | "extract";
+  sheet: string;
+  done: number;
+  total: number;
 }
+
+interface CellRef {
+  sheet: string;
+  station: string;
+  km: number;
+  train_number: string;
+}
+
+// One operation of POST /api/edit/batch
+export type EditOp =
+  | (CellRef & {
+      op: "save";
+      hour: number;
+      minute: number;
+      second?: number;
+      day_offset?: number;
+      stop_type?: string | null;
+      propagate?: boolean;
+    })
+  | (CellRef & { op: "clear"; stop_type?: string | null })
+  | (CellRef & { op: "propagate"; delta_minutes: number });
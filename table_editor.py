@@ -1,6 +1,9 @@
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, Iterable, List, Optional
 import datetime as _dt
 
+import numpy as np
+
+from timetable_store import ensure_timetable
 from utils import format_time_decimal
 
 
@@ -27,12 +30,7 @@ def save_cell_time(
     active = next((s for s in sheets_data if s.get("sheet") == selected_sheet), None)
     if active is None:
         return
-    trains_list: List[Dict[str, Any]] = active.get("trains", [])
-
-    key = (station, float(km), str(train_number))
-
-    def rec_key(r: Dict[str, Any]) -> Tuple[str, float, str]:
-        return (r["station"], float(r["km"]), str(r["train_number"]))
+    trains_list = ensure_timetable(active)
 
     # compute decimal and canonical string
     h = int(time_value.hour)
@@ -42,16 +40,17 @@ def save_cell_time(
     canonical = format_time_decimal(float(decimal))
 
     # Find matching record by stop_type
-    target_idx = None
-    for i, r in enumerate(trains_list):
-        if rec_key(r) == key and r.get("stop_type") == stop_type:
-            target_idx = i
-            break
+    target_row = trains_list.find(station, km, train_number, stop_type)
 
-    if target_idx is not None:
-        trains_list[target_idx]["time"] = canonical
-        trains_list[target_idx]["time_decimal"] = float(decimal)
+    if target_row is not None:
+        rec = trains_list.record(target_row)
+        rec["time"] = canonical
+        rec["time_decimal"] = float(decimal)
     else:
+        labels = session_state.get("_labels")
+        if labels is not None:
+            station = labels.intern(station)
+            train_number = labels.intern(str(train_number))
         new_rec = {
             "train_number": str(train_number),
             "station": station,
@@ -89,21 +88,11 @@ def clear_cell_time(
     active = next((s for s in sheets_data if s.get("sheet") == selected_sheet), None)
     if active is None:
         return
-    trains_list: List[Dict[str, Any]] = active.get("trains", [])
-
-    key = (station, float(km), str(train_number))
-
-    def rec_key(r: Dict[str, Any]) -> Tuple[str, float, str]:
-        return (r["station"], float(r["km"]), str(r["train_number"]))
+    trains_list = ensure_timetable(active)
 
-    target_idx = None
-    for i, r in enumerate(trains_list):
-        if rec_key(r) == key and r.get("stop_type") == stop_type:
-            target_idx = i
-            break
-
-    if target_idx is not None:
-        del trains_list[target_idx]
+    target_row = trains_list.find(station, km, train_number, stop_type)
+    if target_row is not None:
+        trains_list.remove_row(target_row)
 
     active["trains"] = trains_list
     for i, s in enumerate(sheets_data):
@@ -131,49 +120,30 @@ def propagate_time_shift(
     active = next((s for s in sheets_data if s.get("sheet") == selected_sheet), None)
     if active is None:
         return
-    trains_list: List[Dict[str, Any]] = active.get("trains", [])
-
-    # Collect all records for this train that have valid time_decimal
-    train_recs = [
-        r for r in trains_list
-        if str(r.get("train_number")) == str(train_number) and r.get("time_decimal") is not None
-    ]
+    trains_list = ensure_timetable(active)
 
-    if len(train_recs) < 2:
+    # Detect direction from the train's timed records; the edited station
+    # (from_km) is excluded so that a just-saved extreme value cannot flip it.
+    ascending = trains_list.train_direction(train_number, exclude_km=float(from_km))
+    if ascending is None:
         # Not enough data to determine direction; nothing to propagate
         return
 
-    # Detect direction: exclude the edited station (from_km) so that
-    # a just-saved extreme value cannot flip the detected direction.
-    direction_recs = [r for r in train_recs if float(r.get("km", 0.0)) != float(from_km)]
-    if len(direction_recs) < 2:
-        direction_recs = train_recs  # fallback: not enough non-edited stations
-    sorted_by_km = sorted(direction_recs, key=lambda r: float(r.get("km", 0.0)))
-    first_time = float(sorted_by_km[0].get("time_decimal", 0.0))
-    last_time = float(sorted_by_km[-1].get("time_decimal", 0.0))
-    ascending = last_time >= first_time  # True = forward (km increases with time)
-
-    for rec in trains_list:
-        if str(rec.get("train_number")) != str(train_number):
-            continue
-        km_val = float(rec.get("km", 0.0))
-        if ascending:
-            if km_val <= float(from_km):
-                continue
-        else:
-            if km_val >= float(from_km):
-                continue
-        t_dec = rec.get("time_decimal")
-        if t_dec is None:
-            continue
-        try:
-            new_dec = float(t_dec) + float(delta_hours)
-        except Exception:
-            continue
-        if new_dec < 0:
-            new_dec = new_dec % 24
-        rec["time_decimal"] = new_dec
-        rec["time"] = format_time_decimal(new_dec)
+    # The train's events are ordered by km: downstream is a contiguous run
+    rows = trains_list.train_events(train_number)
+    kms = trains_list.values_at("km", rows)
+    if ascending:
+        rows = rows[np.searchsorted(kms, float(from_km), side="right"):]
+    else:
+        rows = rows[:np.searchsorted(kms, float(from_km), side="left")]
+    decimals = trains_list.values_at("time_decimal", rows)
+    timed = ~np.isnan(decimals)
+    rows, decimals = rows[timed], decimals[timed]
+    if len(rows):
+        new_dec = decimals + float(delta_hours)
+        new_dec = np.where(new_dec < 0, new_dec % 24, new_dec)
+        trains_list.update_column(rows, "time_decimal", new_dec.tolist())
+        trains_list.update_column(rows, "time", [format_time_decimal(d) for d in new_dec.tolist()])
 
     active["trains"] = trains_list
     for i, s in enumerate(sheets_data):
@@ -183,3 +153,62 @@ def propagate_time_shift(
     session_state["sheets_data"] = sheets_data
 
 
+def shift_train_times(
+    selected_sheet: str,
+    delta_hours: float,
+    session_state: Any,
+    train_numbers: Optional[Iterable[str]] = None,
+    departure_from: Optional[float] = None,
+    departure_to: Optional[float] = None,
+) -> int:
+    """Shift every timed record of the selected trains on a sheet by ``delta_hours``.
+
+    ``train_numbers`` limits the shift to those trains (None = all trains of
+    the sheet). ``departure_from`` / ``departure_to`` (decimal hours) further
+    keep only trains whose first time on the sheet falls in
+    ``[departure_from, departure_to)``. Times stay decimal hours, so a shift
+    past midnight renders as ``(+d)``. A train that a backward shift would
+    take below zero is moved forward a whole day as one piece (every one of
+    its events, not only those below zero), so its times stay in order.
+    Returns the number of records shifted.
+    """
+    sheets_data: List[Dict[str, Any]] = session_state.get("sheets_data", [])
+    active = next((s for s in sheets_data if s.get("sheet") == selected_sheet), None)
+    if active is None:
+        return 0
+    trains_list = ensure_timetable(active)
+
+    names, group = trains_list.train_groups()
+    decimals = trains_list.column("time_decimal")
+    timed = ~np.isnan(decimals)
+    selected = np.ones(len(names), dtype=bool)
+    if train_numbers is not None:
+        wanted = {str(tn) for tn in train_numbers}
+        selected &= np.array([tn in wanted for tn in names], dtype=bool)
+    if departure_from is not None or departure_to is not None:
+        departure = np.full(len(names), np.inf)
+        np.minimum.at(departure, group[timed], decimals[timed])
+        if departure_from is not None:
+            selected &= departure >= float(departure_from)
+        if departure_to is not None:
+            selected &= departure < float(departure_to)
+
+    targets = np.flatnonzero(timed & selected[group])
+    if len(targets):
+        new_dec = decimals[targets] + float(delta_hours)
+        # whole days to add per train so its earliest event is not below zero
+        earliest = np.zeros(len(names))
+        np.minimum.at(earliest, group[targets], new_dec)
+        new_dec = new_dec + 24.0 * np.ceil(-earliest / 24.0)[group[targets]]
+        labels = {d: format_time_decimal(d) for d in set(new_dec.tolist())}
+        rows = trains_list.rows()[targets]
+        trains_list.update_column(rows, "time_decimal", new_dec.tolist())
+        trains_list.update_column(rows, "time", [labels[d] for d in new_dec.tolist()])
+
+    active["trains"] = trains_list
+    for i, s in enumerate(sheets_data):
+        if s.get("sheet") == selected_sheet:
+            sheets_data[i] = active
+            break
+    session_state["sheets_data"] = sheets_data
+    return len(targets)
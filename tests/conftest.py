@@ -0,0 +1,72 @@
+"""Shared fixtures: small timetable workbooks built in memory."""
+
+import datetime as dt
+from io import BytesIO
+from pathlib import Path
+
+import pytest
+from openpyxl import Workbook
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+EXAMPLE_WORKBOOKS = sorted(
+    list((REPO_ROOT / "example_table").glob("*.xlsx"))
+    + list((REPO_ROOT / "example_outputs").glob("*.xlsx"))
+)
+
+
+def build_timetable_workbook(sheet_names=("WL", "LW")) -> bytes:
+    """Small timetable laid out like the uploads: headers in E3/D11/E11,
+    a dual station with merged name/km cells, a merged train header
+    spanning two time columns and one hidden column."""
+    wb = Workbook()
+    wb.remove(wb.active)
+    for name in sheet_names:
+        ws = wb.create_sheet(title=name)
+        # assorted cell types above the timetable area
+        ws["A1"] = True
+        ws["B1"] = dt.datetime(2024, 5, 1, 7, 45)
+        ws["C1"] = "=1+1"
+        ws["D1"] = 45000.5
+        ws["D1"].number_format = "yyyy-mm-dd hh:mm"
+        ws["E3"] = "numer pociągu"
+        ws["G3"] = "101"
+        ws["H3"] = "203"
+        ws.merge_cells("H3:I3")
+        ws["J3"] = "305"
+        ws["D11"] = "km"
+        ws["E11"] = "ze stacji"
+
+        ws["D12"], ws["E12"] = 0.0, "Legnica"
+        ws["D13"], ws["E13"] = "12,5", "Jawor"
+        ws.merge_cells("D13:D14")
+        ws.merge_cells("E13:E14")
+        ws["D15"], ws["E15"] = 65.0, "Wrocław"
+        ws["E16"] = "do stacji"
+
+        ws["G12"] = dt.time(6, 0)
+        ws["G13"] = "6:30"
+        ws["G14"] = "06.35"
+        ws["G15"] = 0.3125  # 7:30 as Excel day fraction
+        ws["H12"] = dt.time(23, 40)
+        ws["H15"] = "0:20 (+1)"
+        ws["I13"] = "23:55"
+        ws["J12"] = dt.time(9, 0)
+        ws["J15"] = dt.time(10, 0)
+        ws.column_dimensions["J"].hidden = True
+    buf = BytesIO()
+    wb.save(buf)
+    return buf.getvalue()
+
+
+@pytest.fixture
+def timetable_xlsx() -> bytes:
+    return build_timetable_workbook()
+
+
+def example_workbook_bytes(path: Path) -> bytes:
+    """Bytes of an example workbook, skipping the test when only a Git LFS
+    pointer is checked out instead of the real file."""
+    data = path.read_bytes()
+    if not data.startswith(b"PK"):
+        pytest.skip(f"{path.name} is not checked out (Git LFS pointer)")
+    return data
@@ -0,0 +1,50 @@
+"""Tests for the binary encoding of the trains payload."""
+
+import asyncio
+import json
+import struct
+
+import numpy as np
+import pytest
+
+from backend.models.requests import SaveTimeRequest
+from backend.models.session import SessionState
+from backend.routers import edit
+from backend.services.binary_payload import MAGIC, decode_trains_binary, encode_trains_binary
+from backend.services.excel_service import load_excel
+from backend.services.plot_data import build_trains_payload
+
+
+@pytest.fixture
+def session(timetable_xlsx):
+    s = SessionState()
+    load_excel(timetable_xlsx, "t.xlsx", s)
+    return s
+
+
+class TestBinaryPayload:
+    def test_round_trip(self, session):
+        data = encode_trains_binary(build_trains_payload(session, "arrays"))
+        assert data[:4] == MAGIC
+        assert decode_trains_binary(data) == build_trains_payload(session)
+
+    def test_buffers_aligned_and_typed(self, session):
+        data = encode_trains_binary(build_trains_payload(session, "arrays"))
+        (size,) = struct.unpack_from("<I", data, 4)
+        buffers = json.loads(data[8:8 + size])["buffers"]
+        assert all(entry["offset"] % 8 == 0 for entry in buffers.values())
+        assert buffers["ms"]["dtype"] == "int64" and buffers["km"]["dtype"] == "float64"
+        ms = np.frombuffer(data, "<i8", buffers["ms"]["length"], buffers["ms"]["offset"])
+        points = build_trains_payload(session)["plot_series"]
+        assert ms.tolist() == [p["value"][0] for s in points for p in s["points"]]
+
+    def test_empty_session(self):
+        session = SessionState()
+        data = encode_trains_binary(build_trains_payload(session, "arrays"))
+        assert decode_trains_binary(data) == build_trains_payload(session)
+
+    def test_full_edit_response(self, session):
+        body = SaveTimeRequest(sheet="WL", station="Legnica", km=0.0, train_number="101",
+                               hour=5, minute=55)
+        response = asyncio.run(edit.save_time(body, session, wire_format="binary"))
+        assert decode_trains_binary(response.body) == build_trains_payload(session)
@@ -0,0 +1,12 @@
+"""Tests for backend.config environment parsing."""
+
+from backend import config
+
+
+def test_bad_int_setting_falls_back_to_default(monkeypatch):
+    monkeypatch.setenv("EXTRACT_WORKERS", "four")
+    assert config._env_int("EXTRACT_WORKERS", 1) == 1
+    monkeypatch.setenv("EXTRACT_WORKERS", "3")
+    assert config._env_int("EXTRACT_WORKERS", 1) == 3
+    monkeypatch.delenv("EXTRACT_WORKERS")
+    assert config._env_int("EXTRACT_WORKERS", 1) == 1
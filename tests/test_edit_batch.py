@@ -0,0 +1,117 @@
+"""Tests for the multi-edit endpoints: /api/edit/batch (ordered, all-or-nothing)
+and /api/edit/shift (bulk time shifts)."""
+
+import asyncio
+import json
+
+import pytest
+from fastapi import HTTPException
+from pydantic import ValidationError
+
+from backend.models.requests import BatchEditRequest, ShiftTimesRequest
+from backend.models.session import SessionState
+from backend.routers import edit
+from backend.services import payload_cache
+from backend.services.excel_service import load_excel
+from timetable_store import as_records
+from utils import format_time_decimal, parse_time
+
+
+@pytest.fixture
+def session(timetable_xlsx):
+    s = SessionState()
+    load_excel(timetable_xlsx, "t.xlsx", s)
+    return s
+
+
+def _cell(session, station, train, stop_type=None, sheet="WL"):
+    trains = next(e["trains"] for e in session["sheets_data"] if e["sheet"] == sheet)
+    row = trains.find(station, session["station_maps"][sheet][station], train, stop_type)
+    return None if row is None else trains.record(row)["time"]
+
+
+def _batch(session, ops):
+    return asyncio.run(edit.edit_batch(BatchEditRequest(ops=ops), session))
+
+
+class TestEditBatch:
+    def test_applies_in_order_with_one_rebuild(self, session, monkeypatch):
+        calls = []
+        real = payload_cache.build_trains_payload
+        monkeypatch.setattr(payload_cache, "build_trains_payload", lambda s, *args: calls.append(1) or real(s, *args))
+        response = _batch(session, [
+            {"op": "save", "sheet": "WL", "station": "Legnica", "km": 0, "train_number": "101",
+             "hour": 5, "minute": 10},
+            {"op": "save", "sheet": "WL", "station": "Legnica", "km": 0, "train_number": "101",
+             "hour": 5, "minute": 20},
+            {"op": "clear", "sheet": "WL", "station": "Jawor", "km": 12.5, "train_number": "101",
+             "stop_type": "o"},
+            {"op": "save", "sheet": "LW", "station": "Legnica", "km": 0, "train_number": "203",
+             "hour": 23, "minute": 50, "day_offset": 1},
+        ])
+        assert calls == [1]
+        assert json.loads(response.body)["grid_rows"]
+        assert _cell(session, "Legnica", "101") == "05:20"
+        assert _cell(session, "Jawor", "101", "o") is None
+        assert _cell(session, "Legnica", "203", sheet="LW") == "23:50 (+1)"
+
+    def test_propagate_op(self, session):
+        before = _cell(session, "Wrocław", "101")
+        _batch(session, [{"op": "propagate", "sheet": "WL", "station": "Legnica", "km": 0,
+                          "train_number": "101", "delta_minutes": 15}])
+        h, m = map(int, before.split(":"))
+        assert _cell(session, "Wrocław", "101") == f"{h + (m + 15) // 60:02d}:{(m + 15) % 60:02d}"
+
+    def test_bad_op_rolls_back_everything(self, session):
+        before = {e["sheet"]: as_records(e["trains"]) for e in session["sheets_data"]}
+        with pytest.raises(HTTPException) as exc_info:
+            _batch(session, [
+                {"op": "save", "sheet": "WL", "station": "Legnica", "km": 0, "train_number": "101",
+                 "hour": 5, "minute": 10},
+                {"op": "clear", "sheet": "LW", "station": "Legnica", "km": 0, "train_number": "101"},
+                {"op": "save", "sheet": "WL", "station": "Legnica", "km": 0, "train_number": "101",
+                 "hour": 25, "minute": 0},
+            ])
+        assert exc_info.value.status_code == 400
+        assert exc_info.value.detail["index"] == 2
+        assert {e["sheet"]: as_records(e["trains"]) for e in session["sheets_data"]} == before
+
+    def test_unknown_sheet_rejected_before_any_change(self, session):
+        before = as_records(session["sheets_data"][0]["trains"])
+        with pytest.raises(HTTPException) as exc_info:
+            _batch(session, [
+                {"op": "clear", "sheet": "WL", "station": "Legnica", "km": 0, "train_number": "101"},
+                {"op": "clear", "sheet": "XX", "station": "Legnica", "km": 0, "train_number": "101"},
+            ])
+        assert exc_info.value.detail["index"] == 1
+        assert as_records(session["sheets_data"][0]["trains"]) == before
+
+    def test_unknown_op_is_a_validation_error(self):
+        with pytest.raises(ValidationError):
+            BatchEditRequest(ops=[{"op": "move", "sheet": "WL"}])
+
+
+def _shift(session, **body):
+    return asyncio.run(edit.shift_times(ShiftTimesRequest(**body), session))
+
+
+class TestShiftTimes:
+    def test_by_color_across_sheets(self, session):
+        session["train_colors"] = {"203": "#e6194b"}
+        before = {s: _cell(session, "Legnica", "203", sheet=s) for s in ("WL", "LW")}
+        before_101 = _cell(session, "Legnica", "101")
+        _shift(session, delta_minutes=60, colors=["#e6194b"])
+        for sheet, time in before.items():
+            assert _cell(session, "Legnica", "203", sheet=sheet) == format_time_decimal(parse_time(time) + 1)
+        assert _cell(session, "Legnica", "101") == before_101
+
+    def test_rejects_empty_selection_and_bad_window(self, session):
+        with pytest.raises(HTTPException) as exc_info:
+            _shift(session, delta_minutes=5)
+        assert exc_info.value.status_code == 400
+        with pytest.raises(HTTPException) as exc_info:
+            _shift(session, delta_minutes=5, departure_from="jutro")
+        assert exc_info.value.status_code == 400
+        with pytest.raises(HTTPException) as exc_info:
+            _shift(session, delta_minutes=5, sheets=["XX"])
+        assert exc_info.value.status_code == 404
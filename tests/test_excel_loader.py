@@ -0,0 +1,191 @@
+"""Tests for excel_loader — workbook engines must agree with the default
+openpyxl reader on values, merged ranges and hidden columns."""
+
+import datetime as dt
+import io
+import tempfile
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from backend.models.session import SessionState
+from backend.services import excel_service
+from backend.services.parse_cache import parse_cache
+import excel_loader
+from excel_loader import ENGINES, WorkbookTooLarge, check_workbook_size, read_workbook, extract_excel_data
+from utils import extract_train_columns, find_headers, parse_times
+
+
+@pytest.mark.parametrize("engine", [e for e in ENGINES if e != "openpyxl"])
+class TestEngineEquivalence:
+    def test_frames_match_default_engine(self, engine, timetable_xlsx):
+        data = timetable_xlsx
+        names_ref, sheets_ref, hidden_ref = read_workbook(data)
+        names, sheets, hidden = read_workbook(data, engine=engine)
+        assert names == names_ref
+        assert hidden == hidden_ref
+        for name in names_ref:
+            assert sheets[name].shape == sheets_ref[name].shape
+            assert sheets[name].equals(sheets_ref[name])
+
+    def test_merged_ranges_expanded(self, engine, timetable_xlsx):
+        _, sheets, _ = read_workbook(timetable_xlsx, engine=engine)
+        df = sheets["WL"]
+        # station name and km copied into the second row of the dual station
+        assert df.iat[13, 4] == "Jawor"
+        assert df.iat[13, 3] == "12,5"
+        # merged train header copied across its span
+        assert df.iat[2, 8] == "203"
+
+    def test_extraction_matches_default_engine(self, engine, timetable_xlsx):
+        names_ref, sheets_ref, hidden_ref = read_workbook(timetable_xlsx)
+        ref = extract_excel_data(names_ref, sheets_ref, hidden_cols=hidden_ref)
+        names, sheets, hidden = read_workbook(timetable_xlsx, engine=engine)
+        out = extract_excel_data(names, sheets, hidden_cols=hidden)
+        assert out == ref
+        trains = {r["train_number"] for r in out["sheets_data"][0]["trains"]}
+        assert "305" not in trains  # hidden column dropped
+
+
+def test_parallel_extraction_matches_serial(timetable_xlsx):
+    names, sheets, hidden = read_workbook(timetable_xlsx)
+    serial = extract_excel_data(names, sheets, hidden_cols=hidden)
+    parallel = extract_excel_data(names, sheets, hidden_cols=hidden, workers=2)
+    assert parallel == serial
+    assert [e["sheet"] for e in parallel["sheets_data"]] == names
+
+
+def test_extract_pool_started_once(timetable_xlsx):
+    names, sheets, hidden = read_workbook(timetable_xlsx)
+    try:
+        first = extract_excel_data(names, sheets, hidden_cols=hidden, workers=2)
+        pool = excel_loader._pool
+        assert pool is not None
+        again = extract_excel_data(names, sheets, hidden_cols=hidden, workers=2)
+        assert excel_loader._pool is pool
+        assert again == first
+    finally:
+        excel_loader.shutdown_extract_pool()
+    assert excel_loader._pool is None
+
+
+def test_aborted_extraction_keeps_the_pool(timetable_xlsx):
+    names, sheets, hidden = read_workbook(timetable_xlsx)
+
+    def abort(sheet, done, total):
+        raise RuntimeError("stop")
+
+    try:
+        with pytest.raises(RuntimeError):
+            extract_excel_data(names, sheets, hidden_cols=hidden, workers=2, on_sheet=abort)
+        pool = excel_loader._pool
+        out = extract_excel_data(names, sheets, hidden_cols=hidden, workers=2)
+        assert excel_loader._pool is pool
+        assert [e["sheet"] for e in out["sheets_data"]] == names
+    finally:
+        excel_loader.shutdown_extract_pool()
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_reads_spooled_file(timetable_xlsx, engine):
+    expected = read_workbook(timetable_xlsx, engine=engine)
+    with tempfile.SpooledTemporaryFile(max_size=1024) as spool:
+        spool.write(timetable_xlsx)
+        names, sheets, hidden = read_workbook(spool, engine=engine)
+        assert not spool.closed
+    assert names == expected[0] and hidden == expected[2]
+    for name in names:
+        pd.testing.assert_frame_equal(sheets[name], expected[1][name])
+
+
+class TestSizeGuard:
+    def test_total_uncompressed_size(self, timetable_xlsx):
+        total = check_workbook_size(timetable_xlsx, 1 << 30)
+        assert total > len(timetable_xlsx)
+        with pytest.raises(WorkbookTooLarge):
+            check_workbook_size(io.BytesIO(timetable_xlsx), total - 1)
+
+    def test_load_excel_rejects_before_parsing(self, timetable_xlsx, monkeypatch):
+        monkeypatch.setattr(excel_service, "MAX_UNCOMPRESSED_BYTES", 100)
+        monkeypatch.setattr(excel_service, "read_workbook", lambda *a, **k: pytest.fail("parsed"))
+        session = SessionState()
+        with pytest.raises(WorkbookTooLarge):
+            excel_service.load_excel(io.BytesIO(timetable_xlsx), "t.xlsx", session)
+        assert "sheets_data" not in session
+
+
+def test_unknown_engine_rejected(timetable_xlsx):
+    with pytest.raises(ValueError):
+        read_workbook(timetable_xlsx, engine="nope")
+
+
+class TestTrainColumns:
+    def test_merged_header_and_fallbacks(self, timetable_xlsx):
+        _, sheets, _ = read_workbook(timetable_xlsx)
+        df = sheets["WL"]
+        pos = find_headers(df)
+        mapping = extract_train_columns(
+            df, pos["train_row"], pos["station_start_row"], pos["station_end_row"],
+        )
+        assert mapping == {"101": 6, "203": 7, "203 (2)": 8, "305": 9}
+
+    def test_precomputed_mask_matches(self, timetable_xlsx):
+        _, sheets, _ = read_workbook(timetable_xlsx)
+        df = sheets["LW"]
+        pos = find_headers(df)
+        start, end = pos["station_start_row"], pos["station_end_row"]
+        mask = ~np.isnan(parse_times(df.iloc[start + 1:end]))
+        assert extract_train_columns(df, pos["train_row"], start, end, has_time=mask) == \
+            extract_train_columns(df, pos["train_row"], start, end)
+
+
+class TestFindHeaders:
+    def test_first_match_in_row_major_order(self):
+        df = pd.DataFrame([
+            [None, 1.5, "Km", None],
+            ["Nr pociągu:", None, " KILOMETRAŻ ", "Numer pociagu"],
+            [None, "Ze stacji", "od stacji", None],
+            [12, None, "Do stacji", "na stację"],
+        ])
+        assert find_headers(df) == dict(
+            train_row=1, km_col=2, station_col=1, station_start_row=2, station_end_row=3,
+        )
+
+    def test_non_string_cells_ignored(self):
+        df = pd.DataFrame([[None, np.nan, 3.0], [dt.time(6, 0), True, "km"]])
+        pos = find_headers(df)
+        assert pos["km_col"] == 2
+        assert pos["train_row"] is None and pos["station_start_row"] is None
+
+    def test_header_band(self, timetable_xlsx):
+        _, sheets, _ = read_workbook(timetable_xlsx)
+        df = sheets["WL"]
+        full = find_headers(df)
+        assert find_headers(df, max_rows=len(df), max_cols=df.shape[1]) == full
+        top = find_headers(df, max_rows=full["station_end_row"])
+        assert top["station_end_row"] is None
+        assert top["train_row"] == full["train_row"]
+
+    def test_headers_found_anywhere_by_default(self, timetable_xlsx):
+        names, sheets, hidden = read_workbook(timetable_xlsx)
+        rows, cols = 2100, 40  # beyond any band a default could reasonably pick
+        shifted = {}
+        for name, df in sheets.items():
+            df = pd.concat([pd.DataFrame(index=range(rows), columns=df.columns), df], ignore_index=True)
+            pad = pd.DataFrame(index=df.index, columns=range(cols))
+            shifted[name] = pd.concat([pad, df.set_axis(range(cols, cols + df.shape[1]), axis=1)], axis=1)
+        shifted_hidden = {name: {c + cols for c in hc} for name, hc in hidden.items()}
+
+        expected = extract_excel_data(names, sheets, hidden_cols=hidden)
+        result = extract_excel_data(names, shifted, hidden_cols=shifted_hidden,
+                                    header_band=excel_service._HEADER_BAND)
+        assert result["station_map"] == expected["station_map"]
+        for got, want in zip(result["sheets_data"], expected["sheets_data"]):
+            assert len(got["trains"]) == len(want["trains"]) > 0
+
+    def test_upload_uses_configured_band(self, timetable_xlsx, monkeypatch):
+        monkeypatch.setattr(excel_service, "_HEADER_BAND", (3, None))
+        parse_cache.clear()
+        with pytest.raises(ValueError):
+            excel_service.load_excel(timetable_xlsx, "t.xlsx", SessionState())
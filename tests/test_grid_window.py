@@ -0,0 +1,91 @@
+"""Tests for the windowed, sparse grid endpoints."""
+
+import asyncio
+import datetime as dt
+import json
+
+import pytest
+from fastapi import HTTPException
+
+from backend.models.session import SessionState
+from backend.routers import trains
+from backend.services.excel_service import load_excel
+from backend.services.plot_data import build_trains_payload
+from table_editor import save_cell_time
+
+
+@pytest.fixture
+def session(timetable_xlsx):
+    s = SessionState()
+    load_excel(timetable_xlsx, "t.xlsx", s)
+    return s
+
+
+def _columns(session, etag=None):
+    return asyncio.run(trains.get_grid_columns(session, if_none_match=etag))
+
+
+def _grid(session, **params):
+    return asyncio.run(trains.get_grid_window(session, **params))
+
+
+def _dense(columns, window):
+    """The window's cells filled back into grid rows (as the client does)."""
+    train_cols = [c["field"] for c in columns["column_defs"][2:]]
+    rows = [{**meta, "_decimals": {}, **{tn: "" for tn in train_cols}} for meta in columns["rows"]]
+    for r, c, text, dec in zip(window["row"], window["col"], window["text"], window["decimal"]):
+        rows[r][train_cols[c]] = text
+        if dec is not None:
+            rows[r]["_decimals"][train_cols[c]] = dec
+    return rows
+
+
+class TestGridWindow:
+    def test_full_window_matches_dense_grid(self, session):
+        columns = json.loads(_columns(session).body)
+        payload = build_trains_payload(session)
+        assert columns["column_defs"] == payload["column_defs"]
+        window = _grid(session)
+        assert len(window["text"]) < len(payload["grid_rows"]) * len(columns["column_defs"][2:])
+        assert "" not in window["text"]
+        assert _dense(columns, window) == payload["grid_rows"]
+
+    def test_window_lists_only_its_cells(self, session):
+        full = _grid(session)
+        window = _grid(session, row_start=1, row_end=4, col_start=1, col_end=3)
+        expected = [
+            (r, c, t, d) for r, c, t, d in zip(full["row"], full["col"], full["text"], full["decimal"])
+            if 1 <= r < 4 and 1 <= c < 3
+        ]
+        assert list(zip(window["row"], window["col"], window["text"], window["decimal"])) == expected
+        assert expected
+
+    def test_columns_revalidated_by_version(self, session):
+        first = _columns(session)
+        etag = first.headers["etag"]
+        assert _columns(session, etag).status_code == 304
+        session["selected_sheet"] = "LW"
+        assert _columns(session, etag).status_code == 200
+        session["selected_sheet"] = "WL"
+        save_cell_time("WL", "Legnica", 0.0, "101", dt.time(5, 0), session)
+        response = _columns(session, etag)
+        assert response.status_code == 200 and response.headers["etag"] != etag
+
+    def test_etag_not_reused_by_a_new_session(self, session, timetable_xlsx):
+        etag = _columns(session).headers["etag"]
+        fresh = SessionState()  # e.g. after a restart: same upload, same version
+        load_excel(timetable_xlsx, "t.xlsx", fresh)
+        assert fresh.version == session.version
+        assert _columns(fresh, etag).status_code == 200
+
+    def test_edit_shows_in_window(self, session):
+        save_cell_time("WL", "Legnica", 0.0, "101", dt.time(5, 0), session)
+        columns = json.loads(_columns(session).body)
+        col = [c["field"] for c in columns["column_defs"][2:]].index("101")
+        window = _grid(session, row_start=0, row_end=1, col_start=col, col_end=col + 1)
+        assert window["text"] == ["05:00"]
+
+    def test_bad_range(self, session):
+        for params in ({"row_start": -1}, {"row_start": 3, "row_end": 1}, {"col_start": 2, "col_end": 0}):
+            with pytest.raises(HTTPException):
+                _grid(session, **params)
@@ -0,0 +1,141 @@
+"""Tests for incremental re-import: per-sheet fingerprints and merging only
+the changed sheets into the loaded session."""
+
+import datetime as dt
+import io
+import zipfile
+
+from openpyxl import load_workbook
+
+from backend.models.session import SessionState
+from backend.services.excel_service import load_excel
+from backend.services.parse_cache import parse_cache
+from conftest import build_timetable_workbook
+from excel_loader import read_workbook, workbook_fingerprints
+from table_editor import save_cell_time
+from xlsx_reader import sheet_fingerprints
+
+
+def _revise(data: bytes, sheet: str, cell: str, value) -> bytes:
+    wb = load_workbook(io.BytesIO(data))
+    wb[sheet][cell] = value
+    buf = io.BytesIO()
+    wb.save(buf)
+    return buf.getvalue()
+
+
+def _shared_strings_workbook(sheet1: str, sheet2: str, strings: list) -> bytes:
+    """Minimal two-sheet workbook whose cells reference the shared string table."""
+    ns = 'xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"'
+    rel = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+    parts = {
+        "[Content_Types].xml": '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types"/>',
+        "_rels/.rels": (
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            f'<Relationship Id="rId1" Type="{rel}/officeDocument" Target="xl/workbook.xml"/></Relationships>'
+        ),
+        "xl/workbook.xml": (
+            f'<workbook {ns} xmlns:r="{rel}"><sheets>'
+            '<sheet name="A" sheetId="1" r:id="rId1"/><sheet name="B" sheetId="2" r:id="rId2"/>'
+            "</sheets></workbook>"
+        ),
+        "xl/_rels/workbook.xml.rels": (
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            f'<Relationship Id="rId1" Type="{rel}/worksheet" Target="worksheets/sheet1.xml"/>'
+            f'<Relationship Id="rId2" Type="{rel}/worksheet" Target="worksheets/sheet2.xml"/>'
+            f'<Relationship Id="rId3" Type="{rel}/sharedStrings" Target="sharedStrings.xml"/>'
+            "</Relationships>"
+        ),
+        "xl/sharedStrings.xml": f"<sst {ns}>" + "".join(f"<si><t>{s}</t></si>" for s in strings) + "</sst>",
+        "xl/worksheets/sheet1.xml": f"<worksheet {ns}><sheetData>{sheet1}</sheetData></worksheet>",
+        "xl/worksheets/sheet2.xml": f"<worksheet {ns}><sheetData>{sheet2}</sheetData></worksheet>",
+    }
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as archive:
+        for name, xml in parts.items():
+            archive.writestr(name, xml)
+    return buf.getvalue()
+
+
+class TestFingerprints:
+    def test_stable_across_saves(self):
+        assert workbook_fingerprints(build_timetable_workbook()) == workbook_fingerprints(build_timetable_workbook())
+
+    def test_only_edited_sheet_changes(self, timetable_xlsx):
+        before = workbook_fingerprints(timetable_xlsx)
+        after = workbook_fingerprints(_revise(timetable_xlsx, "LW", "G13", "6:40"))
+        assert list(after) == ["WL", "LW"]
+        assert after["WL"] == before["WL"]
+        assert after["LW"] != before["LW"]
+
+    def test_follows_referenced_shared_strings(self):
+        row1 = '<row r="1"><c r="A1" t="s"><v>0</v></c><c r="B1" t="s"/></row>'
+        row2 = '<row r="1"><c r="A1" s="0" t="s">\n<v>1</v></c></row>'
+
+        def fingerprints(strings):
+            data = _shared_strings_workbook(row1, row2, strings)
+            with zipfile.ZipFile(io.BytesIO(data)) as archive:
+                return sheet_fingerprints(archive)
+
+        base = fingerprints(["Legnica", "Jawor"])
+        renamed = fingerprints(["Legnica", "Jawor Zachod"])
+        appended = fingerprints(["Legnica", "Jawor", "Wroclaw"])
+        assert renamed["A"] == base["A"] and renamed["B"] != base["B"]
+        assert appended == base
+
+
+class TestOnlySheets:
+    def test_reads_requested_sheets(self, timetable_xlsx):
+        for engine in ("openpyxl", "streaming", "xml"):
+            names, sheets, hidden = read_workbook(timetable_xlsx, engine=engine, only_sheets={"LW"})
+            assert names == ["WL", "LW"]
+            assert list(sheets) == ["LW"] and list(hidden) == ["LW"]
+
+
+class TestIncrementalImport:
+    def setup_method(self):
+        parse_cache.clear()
+
+    def test_unchanged_sheets_reused_with_edits(self, timetable_xlsx):
+        session = SessionState()
+        load_excel(timetable_xlsx, "t.xlsx", session)
+        save_cell_time("WL", "Legnica", 0.0, "101", dt.time(6, 5), session)
+        wl_before = session["sheets_data"][0]
+        session["train_colors"] = {"101": "#e6194b"}
+        session["selected_sheet"] = "LW"
+
+        revised = _revise(timetable_xlsx, "LW", "G13", "6:40")
+        result = load_excel(revised, "t2.xlsx", session, incremental=True)
+
+        assert result["reused"] == ["WL"] and result["reparsed"] == ["LW"]
+        assert session["sheets_data"][0] is wl_before
+        assert session["train_colors"] == {"101": "#e6194b"}
+        assert session["selected_sheet"] == "LW"
+
+        fresh = SessionState()
+        load_excel(revised, "t2.xlsx", fresh)
+        assert session["sheets_data"][1] == fresh["sheets_data"][1]
+        assert session["station_maps"] == fresh["station_maps"]
+        assert session["station_check"] == fresh["station_check"]
+        assert session["sheet_fingerprints"] == fresh["sheet_fingerprints"]
+
+    def test_nothing_changed_reads_nothing(self, timetable_xlsx, monkeypatch):
+        session = SessionState()
+        load_excel(timetable_xlsx, "t.xlsx", session)
+        parse_cache.clear()
+        monkeypatch.setattr("backend.services.excel_service.read_workbook", lambda *a, **k: 1 / 0)
+        result = load_excel(build_timetable_workbook(), "t.xlsx", session, incremental=True)
+        assert result["reused"] == ["WL", "LW"] and result["reparsed"] == []
+
+    def test_changed_reference_reparses_everything(self, timetable_xlsx):
+        session = SessionState()
+        load_excel(timetable_xlsx, "t.xlsx", session)
+        revised = _revise(timetable_xlsx, "WL", "G13", "6:40")
+        result = load_excel(revised, "t2.xlsx", session, incremental=True)
+        assert result["reused"] == [] and result["reparsed"] == ["WL", "LW"]
+
+    def test_full_import_by_default(self, timetable_xlsx):
+        session = SessionState()
+        load_excel(timetable_xlsx, "t.xlsx", session)
+        result = load_excel(timetable_xlsx, "t.xlsx", session)
+        assert result["reused"] == [] and result["reparsed"] == ["WL", "LW"]
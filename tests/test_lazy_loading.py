@@ -0,0 +1,78 @@
+"""Tests for lazy per-sheet loading of uploaded workbooks."""
+
+import pytest
+
+from backend.models.session import SessionState
+from backend.services.excel_service import ensure_sheets_loaded, load_excel, pending_sheets
+from backend.services.parse_cache import parse_cache
+from backend.services.plot_data import build_trains_payload
+from conftest import build_timetable_workbook
+
+SHEETS = ("WL", "LW", "WL2")
+
+
+@pytest.fixture(autouse=True)
+def _fresh_cache():
+    parse_cache.clear()
+    yield
+    parse_cache.clear()
+
+
+@pytest.fixture
+def workbook() -> bytes:
+    return build_timetable_workbook(sheet_names=SHEETS)
+
+
+def _eager(workbook: bytes) -> SessionState:
+    session = SessionState()
+    load_excel(workbook, "t.xlsx", session)
+    parse_cache.clear()
+    return session
+
+
+class TestLazyLoading:
+    def test_only_first_sheet_extracted(self, workbook):
+        session = SessionState()
+        load_excel(workbook, "t.xlsx", session, lazy=True)
+        assert [e["sheet"] for e in session["sheets_data"]] == list(SHEETS)
+        assert session["sheet_status"] == {"WL": "loaded", "LW": "pending", "WL2": "pending"}
+        assert session["sheets_data"][0]["trains"]
+        assert session["sheets_data"][1]["trains"] == []
+        assert pending_sheets(session) == ["LW", "WL2"]
+
+    def test_payload_lists_pending_sheets(self, workbook):
+        session = SessionState()
+        load_excel(workbook, "t.xlsx", session, lazy=True)
+        payload = build_trains_payload(session)
+        assert payload["pending_sheets"] == ["LW", "WL2"]
+        assert {s["name"].rsplit("(", 1)[1] for s in payload["plot_series"]} == {"WL)"}
+
+    def test_load_single_sheet(self, workbook):
+        session = SessionState()
+        load_excel(workbook, "t.xlsx", session, lazy=True)
+        assert ensure_sheets_loaded(session, ["WL2"]) == ["WL2"]
+        assert session["sheet_status"]["WL2"] == "loaded"
+        assert pending_sheets(session) == ["LW"]
+        assert ensure_sheets_loaded(session, ["WL2"]) == []
+
+    def test_fully_loaded_matches_eager(self, workbook):
+        eager = _eager(workbook)
+        session = SessionState()
+        load_excel(workbook, "t.xlsx", session, lazy=True)
+        assert ensure_sheets_loaded(session) == ["LW", "WL2"]
+        assert pending_sheets(session) == []
+        for key in ("sheets_data", "station_map", "station_maps", "station_check"):
+            assert session[key] == eager[key]
+        assert session.get("_lazy") is None
+
+    def test_single_sheet_workbook_not_lazy(self):
+        session = SessionState()
+        load_excel(build_timetable_workbook(sheet_names=("A",)), "t.xlsx", session, lazy=True)
+        assert pending_sheets(session) == []
+
+    def test_eager_load_clears_pending_state(self, workbook):
+        session = SessionState()
+        load_excel(workbook, "t.xlsx", session, lazy=True)
+        load_excel(workbook, "t.xlsx", session)
+        assert pending_sheets(session) == []
+        assert ensure_sheets_loaded(session) == []
@@ -0,0 +1,71 @@
+"""Tests for the memoized normalize layer and the label intern table."""
+
+import datetime as dt
+
+from backend.models.session import SessionState
+from backend.services.excel_service import load_excel, load_project_json
+from backend.services.export_service import build_project_json
+from table_editor import save_cell_time
+from utils import LabelTable, normalize, normalize_cache_info
+
+
+class TestNormalize:
+    def test_same_results(self):
+        assert normalize(None) == ""
+        assert normalize("  Nr\xa0 Pociągu: ") == "nr pociagu:"
+        assert normalize(12.5) == "12.5"
+
+    def test_repeated_calls_hit_memo(self):
+        before = normalize_cache_info()
+        normalize("Żagań  Miasto")
+        normalize("Żagań  Miasto")
+        after = normalize_cache_info()
+        assert after["hits"] >= before["hits"] + 1
+        assert after["size"] <= after["max_size"]
+
+
+class TestLabelTable:
+    def test_intern_returns_canonical_copy(self):
+        labels = LabelTable()
+        a = "".join(["Leg", "nica"])
+        b = "".join(["Leg", "nica"])
+        assert a is not b
+        assert labels.intern(a) is a
+        assert labels.intern(b) is a
+        assert labels.intern(101) == 101
+        assert labels.stats() == {"labels": 1, "lookups": 2, "hits": 1}
+
+
+def _station_objects(session):
+    return {
+        id(rec["station"])
+        for entry in session["sheets_data"]
+        for rec in entry["trains"]
+        if rec["station"] == "Legnica"
+    }
+
+
+class TestSessionInterning:
+    def test_labels_shared_across_sheets(self, timetable_xlsx):
+        session = SessionState()
+        load_excel(timetable_xlsx, "t.xlsx", session)
+        assert len(_station_objects(session)) == 1
+        assert len(session["_labels"]) > 0
+
+    def test_project_json_load_interns(self, timetable_xlsx):
+        session = SessionState()
+        load_excel(timetable_xlsx, "t.xlsx", session)
+        restored = SessionState()
+        load_project_json(build_project_json(session), restored)
+        assert len(_station_objects(restored)) == 1
+        assert restored["sheets_data"] == session["sheets_data"]
+
+    def test_new_record_uses_interned_label(self, timetable_xlsx):
+        session = SessionState()
+        load_excel(timetable_xlsx, "t.xlsx", session)
+        station = "".join(["Leg", "nica"])
+        km = session["station_map"]["Legnica"]
+        save_cell_time("WL", station, km, "999", dt.time(8, 0), session)
+        rec = session["sheets_data"][0]["trains"][-1]
+        assert rec["train_number"] == "999"
+        assert rec["station"] is session["_labels"].intern("Legnica")
@@ -0,0 +1,74 @@
+"""Tests for the content-addressed upload parse cache."""
+
+import pytest
+
+from backend.models.session import SessionState
+from backend.services import excel_service
+from backend.services.parse_cache import ParseCache, file_digest, parse_cache
+
+
+class TestParseCache:
+    def test_hit_returns_independent_copy(self):
+        cache = ParseCache(max_bytes=1 << 20)
+        cache.put("k", {"sheets_data": [{"sheet": "S", "trains": []}]})
+        first = cache.get("k")
+        first["sheets_data"][0]["trains"].append({"train_number": "1"})
+        second = cache.get("k")
+        assert second["sheets_data"][0]["trains"] == []
+        assert cache.stats()["hits"] == 2
+
+    def test_miss_counted(self):
+        cache = ParseCache(max_bytes=1 << 20)
+        assert cache.get("nope") is None
+        assert cache.stats()["misses"] == 1
+
+    def test_lru_eviction_by_size(self):
+        payload = {"blob": "x" * 1000}
+        cache = ParseCache(max_bytes=2500)
+        cache.put("a", payload)
+        cache.put("b", payload)
+        cache.get("a")  # a becomes most recently used
+        cache.put("c", payload)
+        assert cache.get("b") is None
+        assert cache.get("a") is not None
+        assert cache.get("c") is not None
+        assert cache.stats()["bytes"] <= 2500
+
+    def test_oversized_entry_not_stored(self):
+        cache = ParseCache(max_bytes=100)
+        cache.put("big", {"blob": "x" * 1000})
+        assert cache.stats()["entries"] == 0
+
+
+class TestLoadExcelUsesCache:
+    @pytest.fixture(autouse=True)
+    def _fresh_cache(self):
+        parse_cache.clear()
+        yield
+        parse_cache.clear()
+
+    def test_reupload_hits_cache(self, timetable_xlsx, monkeypatch):
+        session = SessionState()
+        excel_service.load_excel(timetable_xlsx, "a.xlsx", session)
+        expected = session["sheets_data"]
+
+        def _fail(*args, **kwargs):
+            raise AssertionError("workbook parsed again on a cache hit")
+
+        monkeypatch.setattr(excel_service, "read_workbook", _fail)
+        session2 = SessionState()
+        excel_service.load_excel(timetable_xlsx, "a.xlsx", session2)
+        assert session2["sheets_data"] == expected
+        assert parse_cache.stats()["hits"] == 1
+        assert parse_cache.stats()["misses"] == 1
+
+    def test_session_edits_do_not_leak_into_cache(self, timetable_xlsx):
+        session = SessionState()
+        excel_service.load_excel(timetable_xlsx, "a.xlsx", session)
+        session["sheets_data"][0]["trains"].clear()
+        excel_service.load_excel(timetable_xlsx, "a.xlsx", session)
+        assert session["sheets_data"][0]["trains"]
+
+    def test_key_is_content_hash(self, timetable_xlsx):
+        assert file_digest(timetable_xlsx) == file_digest(bytes(timetable_xlsx))
+        assert file_digest(timetable_xlsx) != file_digest(timetable_xlsx + b"\0")
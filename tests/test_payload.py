@@ -134,3 +134,72 @@ class TestPlotStopType:
         pts = lw_series[0]["points"]
         stop_types = {p["stopType"] for p in pts}
         assert stop_types == {"p", "o"}
+
+
+def _expand(payload):
+    """Columnar plot_series back to point objects (as the frontend does)."""
+    dicts = payload["plot_dicts"]
+    return [
+        {"name": s["name"], "points": [
+            {"value": [ms, km], "station": dicts["stations"][st], "train": s["train"],
+             "sheet": dicts["sheets"][s["sheet"]], "stopType": dicts["stop_types"][stop]}
+            for ms, km, st, stop in zip(s["ms"], s["km"], s["station"], s["stop"])
+        ]}
+        for s in payload["plot_series"]
+    ]
+
+
+class TestColumnarFormat:
+    def test_same_series_as_points(self, timetable_xlsx):
+        from backend.services.excel_service import load_excel
+
+        session = SessionState()
+        load_excel(timetable_xlsx, "t.xlsx", session)
+        points = build_trains_payload(session)
+        columnar = build_trains_payload(session, "columnar")
+        assert columnar["plot_format"] == "columnar"
+        assert _expand(columnar) == points["plot_series"]
+        assert columnar["grid_rows"] == points["grid_rows"]
+
+    def test_unusual_stop_type_keeps_its_label(self):
+        session = SessionState()
+        session["sheets_data"] = [{"sheet": "S", "trains": [
+            _make_rec("101", "A", 0.0, 6.0, stop_type="x"),
+            _make_rec("101", "B", 10.0, 6.5),
+        ]}]
+        session["station_map"] = {"A": 0, "B": 10}
+        session["station_maps"] = {"S": {"A": 0, "B": 10}}
+        session["selected_sheet"] = "S"
+        session["train_colors"] = {}
+
+        columnar = build_trains_payload(session, "columnar")
+        assert _expand(columnar) == build_trains_payload(session)["plot_series"]
+
+    def test_stop_type_dictionary_is_per_payload(self):
+        from backend.services.binary_payload import decode_trains_binary, encode_trains_binary
+
+        session = SessionState()
+        session["sheets_data"] = [
+            {"sheet": "WL", "trains": [_make_rec("101", "A", 0.0, 6.0, stop_type="z"),
+                                       _make_rec("101", "B", 10.0, 6.5, stop_type="p")]},
+            {"sheet": "LW", "trains": [_make_rec("202", "A", 0.0, 7.0, stop_type="x"),
+                                       _make_rec("202", "B", 10.0, 7.5, stop_type="o")]},
+        ]
+        session["station_map"] = {"A": 0, "B": 10}
+        session["station_maps"] = {"WL": {"A": 0, "B": 10}, "LW": {"A": 0, "B": 10}}
+        session["selected_sheet"] = "WL"
+        session["train_colors"] = {}
+
+        points = build_trains_payload(session)
+        columnar = build_trains_payload(session, "columnar")
+        assert columnar["plot_dicts"]["stop_types"] == [None, "p", "o", "x", "z"]
+        assert _expand(columnar) == points["plot_series"]
+        decoded = decode_trains_binary(encode_trains_binary(build_trains_payload(session, "arrays")))
+        assert decoded["plot_series"] == points["plot_series"]
+
+        # labels seen in other sessions do not leak into this one's dictionary
+        plain = SessionState()
+        plain["sheets_data"] = [{"sheet": "S", "trains": [_make_rec("1", "A", 0.0, 6.0)]}]
+        plain["station_map"] = {"A": 0}
+        plain["selected_sheet"] = "S"
+        assert build_trains_payload(plain, "columnar")["plot_dicts"]["stop_types"] == [None, "p", "o"]
@@ -0,0 +1,143 @@
+"""Tests for the session data version and the memoized trains payload."""
+
+import asyncio
+import copy
+import datetime as dt
+import json
+
+import pytest
+from fastapi import HTTPException
+
+from backend.deps import get_wire_format
+from backend.models.requests import SaveTimeRequest, SetColorRequest
+from backend.models.session import SessionState
+from backend.routers import colors, edit, trains
+from backend.services import payload_cache, plot_data
+from backend.services.payload_cache import BINARY_MEDIA_TYPE, COLUMNAR_MEDIA_TYPE
+from backend.services.excel_service import load_excel
+from backend.services.plot_data import build_trains_payload
+from table_editor import save_cell_time
+
+
+@pytest.fixture
+def session(timetable_xlsx):
+    s = SessionState()
+    load_excel(timetable_xlsx, "t.xlsx", s)
+    return s
+
+
+@pytest.fixture
+def builds(monkeypatch):
+    calls = []
+    monkeypatch.setattr(
+        payload_cache, "build_trains_payload",
+        lambda s, *args: calls.append(s.get("selected_sheet")) or build_trains_payload(s, *args),
+    )
+    return calls
+
+
+def _get(session):
+    return asyncio.run(trains.get_trains(session)).body
+
+
+class TestVersion:
+    def test_bumped_by_writes_not_by_reads_or_view(self, session):
+        v = session.version
+        session.get("sheets_data")
+        session["selected_sheet"] = "LW"
+        assert session.version == v
+        save_cell_time("WL", "Legnica", 0.0, "101", dt.time(6, 5), session)
+        assert session.version > v
+        v = session.version
+        asyncio.run(colors.set_color(SetColorRequest(train_number="101", color="#e6194b"), session))
+        assert session.version > v
+        v = session.version
+        session.touch()
+        assert session.version == v + 1
+
+
+class TestPayloadCache:
+    def test_repeated_reads_build_and_serialize_once(self, session, builds):
+        first = _get(session)
+        assert _get(session) is first
+        assert builds == ["WL"]
+        assert json.loads(first) == build_trains_payload(session)
+
+    def test_sheet_switch_reuses_per_sheet_payload(self, session, builds):
+        _get(session)
+        session["selected_sheet"] = "LW"
+        _get(session)
+        session["selected_sheet"] = "WL"
+        _get(session)
+        assert builds == ["WL", "LW"]
+
+    def test_edit_invalidates_and_warms_next_read(self, session, builds):
+        before = json.loads(_get(session))
+        body = SaveTimeRequest(sheet="WL", station="Legnica", km=0.0, train_number="101",
+                               hour=5, minute=55)
+        edited = asyncio.run(edit.save_time(body, session)).body
+        assert _get(session) is edited
+        assert builds == ["WL", "WL"]
+        assert json.loads(edited) != before
+
+    def test_formats_negotiated_and_cached_apart(self, session, builds):
+        assert get_wire_format() == "points"
+        assert get_wire_format("columnar") == "columnar"
+        assert get_wire_format(accept=COLUMNAR_MEDIA_TYPE) == "columnar"
+        assert get_wire_format(accept=f"application/json;q=0.5, {BINARY_MEDIA_TYPE}") == "binary"
+        assert get_wire_format(accept=f"{BINARY_MEDIA_TYPE};q=0.2, {COLUMNAR_MEDIA_TYPE}") == "columnar"
+        with pytest.raises(HTTPException):
+            get_wire_format("xml")
+
+        points = _get(session)
+        columnar = asyncio.run(trains.get_trains(session, wire_format="columnar"))
+        assert columnar.media_type == COLUMNAR_MEDIA_TYPE
+        assert json.loads(columnar.body)["plot_format"] == "columnar"
+        assert "plot_format" not in json.loads(points)
+        binary = asyncio.run(trains.get_trains(session, wire_format="binary"))
+        assert binary.media_type == BINARY_MEDIA_TYPE
+        assert asyncio.run(trains.get_trains(session, wire_format="binary")).body is binary.body
+        assert builds == ["WL", "WL", "WL"]
+
+    def test_upload_invalidates(self, session, builds, timetable_xlsx):
+        _get(session)
+        load_excel(timetable_xlsx, "t.xlsx", session)
+        _get(session)
+        assert len(builds) == 2
+
+
+class TestSeriesCache:
+    @pytest.fixture
+    def rebuilt(self, monkeypatch):
+        calls = []
+        real = plot_data._sheet_series
+        monkeypatch.setattr(plot_data, "_sheet_series",
+                            lambda sheet, *args: calls.append(sheet) or real(sheet, *args))
+        return calls
+
+    def test_edit_recomputes_only_that_sheet(self, session, rebuilt):
+        build_trains_payload(session)
+        assert sorted(rebuilt) == ["LW", "WL"]
+        rebuilt.clear()
+        save_cell_time("LW", "Legnica", 0.0, "203", dt.time(6, 5), session)
+        payload = build_trains_payload(session)
+        assert rebuilt == ["LW"]
+        session.cache.clear()
+        assert build_trains_payload(session)["plot_series"] == payload["plot_series"]
+
+    def test_keyed_by_projection(self, session, rebuilt):
+        session["station_maps"]["LW"] = {"Legnica": 65.0, "Jawor": 52.5, "Wrocław": 0.0}
+        build_trains_payload(session)
+        session["selected_sheet"] = "LW"
+        build_trains_payload(session)
+        session["selected_sheet"] = "WL"
+        build_trains_payload(session)
+        assert len(rebuilt) == 4
+
+    def test_replaced_timetable_is_recomputed(self, session, rebuilt):
+        build_trains_payload(session)
+        rebuilt.clear()
+        entry = session["sheets_data"][0]
+        entry["trains"] = copy.copy(entry["trains"])
+        build_trains_payload(session)
+        assert rebuilt == [entry["sheet"]]
@@ -0,0 +1,148 @@
+"""Tests for delta responses of the edit endpoints."""
+
+import asyncio
+import copy
+import json
+
+import pytest
+
+from backend.models.requests import BatchEditRequest, ClearTimeRequest, SaveTimeRequest, SetColorRequest
+from backend.models.session import SessionState
+from backend.routers import colors, edit, trains
+from backend.services.excel_service import load_excel
+from backend.services import payload_cache
+from backend.services.payload_cache import VERSION_HEADER, data_version
+from backend.services.plot_data import build_trains_payload
+
+
+@pytest.fixture
+def session(timetable_xlsx):
+    s = SessionState()
+    load_excel(timetable_xlsx, "t.xlsx", s)
+    return s
+
+
+def _fetch(session):
+    response = asyncio.run(trains.get_trains(session))
+    return json.loads(response.body), response.headers[VERSION_HEADER]
+
+
+def _apply(payload, delta):
+    """What the client does with a delta."""
+    payload = copy.deepcopy(payload)
+    if "grid_rows" in delta:
+        payload["grid_rows"] = delta["grid_rows"]
+        payload["column_defs"] = delta["column_defs"]
+        payload["station_items"] = delta["station_items"]
+    for change in delta.get("row_cells", []):
+        row = payload["grid_rows"][change["row"]]
+        row.update(change["cells"])
+        for tn, dec in change["decimals"].items():
+            if dec is None:
+                row["_decimals"].pop(tn, None)
+            else:
+                row["_decimals"][tn] = dec
+    series = {s["name"]: s for s in payload["plot_series"]}
+    for name, s in delta["series"].items():
+        if s is None:
+            series.pop(name)
+        else:
+            series[name] = s
+    payload["plot_series"] = list(series.values())
+    for key in ("x_min_ms", "x_max_ms", "train_colors", "pending_sheets"):
+        payload[key] = delta[key]
+    return payload
+
+
+def _by_name(payload):
+    return {**payload, "plot_series": {s["name"]: s for s in payload["plot_series"]}}
+
+
+class TestPayloadDelta:
+    def test_save_sends_only_the_change(self, session):
+        payload, version = _fetch(session)
+        body = SaveTimeRequest(sheet="WL", station="Legnica", km=0.0, train_number="101",
+                               hour=5, minute=55)
+        response = asyncio.run(edit.save_time(body, session, base_version=version))
+        delta = json.loads(response.body)
+        assert delta["base_version"] == version
+        assert delta["version"] == response.headers[VERSION_HEADER] != version
+        assert "grid_rows" not in delta
+        assert delta["row_cells"] == [{"row": 0, "cells": {"101": "05:55"},
+                                       "decimals": {"101": pytest.approx(5 + 55 / 60)}}]
+        assert list(delta["series"]) == ["101 (WL)"]
+        assert _by_name(_apply(payload, delta)) == _by_name(build_trains_payload(session))
+
+    def test_grid_shape_change_sends_rows(self, session):
+        payload, version = _fetch(session)
+        body = ClearTimeRequest(sheet="WL", station="Jawor", km=12.5, train_number="101",
+                                stop_type="o")
+        delta = json.loads(asyncio.run(edit.clear_time(body, session, base_version=version)).body)
+        assert _by_name(_apply(payload, delta)) == _by_name(build_trains_payload(session))
+
+    def test_batch_delta(self, session):
+        payload, version = _fetch(session)
+        ops = BatchEditRequest(ops=[
+            {"op": "save", "sheet": "LW", "station": "Legnica", "km": 0, "train_number": "203",
+             "hour": 23, "minute": 50, "day_offset": 1},
+            {"op": "propagate", "sheet": "WL", "station": "Legnica", "km": 0,
+             "train_number": "101", "delta_minutes": 5},
+        ])
+        delta = json.loads(asyncio.run(edit.edit_batch(ops, session, base_version=version)).body)
+        assert _by_name(_apply(payload, delta)) == _by_name(build_trains_payload(session))
+
+    def test_stale_base_gets_the_full_payload(self, session):
+        _payload, version = _fetch(session)
+        session["train_colors"] = {"101": "#e6194b"}  # changed elsewhere meanwhile
+        body = SaveTimeRequest(sheet="WL", station="Legnica", km=0.0, train_number="101",
+                               hour=5, minute=55)
+        response = asyncio.run(edit.save_time(body, session, base_version=version))
+        assert json.loads(response.body) == build_trains_payload(session)
+        assert response.headers[VERSION_HEADER] == data_version(session)
+
+    def test_base_from_another_session_gets_the_full_payload(self, session, timetable_xlsx):
+        _payload, version = _fetch(session)
+        fresh = SessionState()  # e.g. after a restart: same upload, same version number
+        load_excel(timetable_xlsx, "t.xlsx", fresh)
+        assert fresh.version == session.version
+        body = SaveTimeRequest(sheet="WL", station="Legnica", km=0.0, train_number="101",
+                               hour=5, minute=55)
+        response = asyncio.run(edit.save_time(body, fresh, base_version=version))
+        assert "base_version" not in json.loads(response.body)
+
+    def test_color_write_hands_back_the_new_base(self, session):
+        payload, version = _fetch(session)
+        res = asyncio.run(colors.set_color(SetColorRequest(train_number="101", color="#e6194b"), session))
+        assert res["base_version"] == version
+        # what the client does when it held the base: take the colors and the version
+        payload["train_colors"] = res["train_colors"]
+        body = SaveTimeRequest(sheet="WL", station="Legnica", km=0.0, train_number="101",
+                               hour=5, minute=55)
+        delta = json.loads(asyncio.run(edit.save_time(body, session, base_version=res["version"])).body)
+        assert delta["base_version"] == res["version"]
+        assert _by_name(_apply(payload, delta)) == _by_name(build_trains_payload(session))
+
+        res = asyncio.run(colors.clear_all_colors(session))
+        assert (res["base_version"], res["version"]) == (delta["version"], data_version(session))
+
+
+@pytest.mark.parametrize("wire_format, plot_format", [("binary", "arrays"), ("columnar", "columnar")])
+def test_delta_in_the_cached_format(session, monkeypatch, wire_format, plot_format):
+    version = asyncio.run(trains.get_trains(session, wire_format)).headers[VERSION_HEADER]
+    payload = build_trains_payload(session)  # what the client decoded
+    built = []
+    real_build = payload_cache.build_trains_payload
+    monkeypatch.setattr(payload_cache, "build_trains_payload",
+                        lambda s, fmt="points": built.append(fmt) or real_build(s, fmt))
+
+    ops = BatchEditRequest(ops=[
+        {"op": "save", "sheet": "LW", "station": "Legnica", "km": 0, "train_number": "203",
+         "hour": 23, "minute": 50, "day_offset": 1},
+        {"op": "clear", "sheet": "WL", "station": "Jawor", "km": 12.5, "train_number": "101",
+         "stop_type": "o"},
+    ])
+    delta = json.loads(asyncio.run(edit.edit_batch(ops, session, base_version=version)).body)
+    assert built == [plot_format]
+    assert delta["base_version"] == version
+    assert set(delta["series"]) == {"203 (LW)", "101 (WL)"}
+    assert _by_name(_apply(payload, delta)) == _by_name(build_trains_payload(session))
@@ -0,0 +1,190 @@
+"""Tests for window queries of plot data (GET /api/trains/plot)."""
+
+import asyncio
+import datetime as dt
+import random
+
+import numpy as np
+import pytest
+from fastapi import HTTPException
+
+from backend.models.session import SessionState
+from backend.routers import trains
+from backend.services.excel_service import load_excel
+from backend.services.plot_data import build_trains_payload
+from backend.services.plot_window import PlotIndex, plot_index
+from table_editor import save_cell_time
+from utils import format_time_decimal
+
+
+def _session(records):
+    session = SessionState()
+    session["sheets_data"] = [{"sheet": "S", "trains": records}]
+    session["station_map"] = {"A": 0, "B": 10, "C": 20, "D": 30}
+    session["station_maps"] = {"S": session["station_map"]}
+    session["selected_sheet"] = "S"
+    session["train_colors"] = {}
+    return session
+
+
+def _line(tn, hours):
+    return [
+        {"train_number": tn, "station": st, "km": km, "time": format_time_decimal(h), "time_decimal": h}
+        for (st, km), h in zip((("A", 0.0), ("B", 10.0), ("C", 20.0), ("D", 30.0)), hours)
+    ]
+
+
+def _window(session, **params):
+    return asyncio.run(trains.get_plot_window(session, **params))
+
+
+def _stations(result):
+    return {s["name"]: [p["station"] for p in s["points"]] for s in result["plot_series"]}
+
+
+H = 3_600_000
+
+
+class TestPlotWindow:
+    def test_no_window_is_whole_plot(self, timetable_xlsx):
+        session = SessionState()
+        load_excel(timetable_xlsx, "t.xlsx", session)
+        result = _window(session)
+        assert result["plot_series"] == build_trains_payload(session)["plot_series"]
+        assert result["total_series"] == len(result["plot_series"])
+
+    def test_clipped_with_one_point_either_side(self):
+        session = _session(_line("1", [6, 7, 8, 9]) + _line("2", [12, 13, 14, 15]))
+        result = _window(session, from_ms=7.4 * H, to_ms=7.6 * H)
+        assert _stations(result) == {"1 (S)": ["B", "C"]}
+        result = _window(session, from_ms=6.5 * H, to_ms=8.5 * H, km_min=12, km_max=18)
+        assert _stations(result) == {"1 (S)": ["B", "C"]}
+        result = _window(session, from_ms=7.5 * H, to_ms=8.5 * H)
+        assert _stations(result) == {"1 (S)": ["B", "C", "D"]}
+        assert _window(session, from_ms=10 * H, to_ms=11 * H)["plot_series"] == []
+
+    def test_extents_overlap_but_line_misses(self):
+        session = _session(_line("1", [6, 7, 8, 9]))
+        # top-left corner of the train's box, above the line
+        assert _window(session, from_ms=6 * H, to_ms=6.5 * H, km_min=25, km_max=30)["plot_series"] == []
+
+    def test_matches_brute_force(self, timetable_xlsx):
+        session = SessionState()
+        load_excel(timetable_xlsx, "t.xlsx", session)
+        full = build_trains_payload(session)["plot_series"]
+        rng = random.Random(7)
+        for _ in range(50):
+            t0, t1 = sorted(rng.uniform(0, 30 * H) for _ in range(2))
+            k0, k1 = sorted(rng.uniform(-5, 70) for _ in range(2))
+            expected = []
+            for s in full:
+                pts = s["points"]
+                inside = [
+                    j for j in range(len(pts) - 1)
+                    if min(pts[j]["value"][0], pts[j + 1]["value"][0]) <= t1
+                    and max(pts[j]["value"][0], pts[j + 1]["value"][0]) >= t0
+                    and min(pts[j]["value"][1], pts[j + 1]["value"][1]) <= k1
+                    and max(pts[j]["value"][1], pts[j + 1]["value"][1]) >= k0
+                ]
+                if len(pts) == 1 and t0 <= pts[0]["value"][0] <= t1 and k0 <= pts[0]["value"][1] <= k1:
+                    expected.append(s)
+                elif inside:
+                    expected.append({"name": s["name"], "points": pts[inside[0]:inside[-1] + 2]})
+            result = _window(session, from_ms=t0, to_ms=t1, km_min=k0, km_max=k1)
+            assert result["plot_series"] == expected
+
+    def test_series_ended_before_window_are_cut_off(self):
+        session = _session(_line("1", [6, 7, 8, 9]) + _line("2", [10, 11, 12, 13]) + _line("3", [12, 13, 14, 15]))
+        index = plot_index(session)
+        assert index.reach.tolist() == [9 * H, 13 * H, 15 * H]
+        assert int(np.searchsorted(index.reach, 12.5 * H)) == 1
+        result = _window(session, from_ms=12.5 * H, to_ms=12.6 * H)
+        assert _stations(result) == {"2 (S)": ["C", "D"], "3 (S)": ["A", "B"]}
+
+    def test_columnar(self):
+        session = _session(_line("1", [6, 7, 8, 9]))
+        result = _window(session, from_ms=7.4 * H, to_ms=7.6 * H, format="columnar")
+        (series,) = result["plot_series"]
+        assert [result["plot_dicts"]["stations"][i] for i in series["station"]] == ["B", "C"]
+        assert series["ms"] == [7 * H, 8 * H]
+
+    def test_index_rebuilt_only_after_changes(self, timetable_xlsx):
+        session = SessionState()
+        load_excel(timetable_xlsx, "t.xlsx", session)
+        index = plot_index(session)
+        assert plot_index(session) is index
+        save_cell_time("WL", "Legnica", 0.0, "101", dt.time(5, 0), session)
+        assert plot_index(session) is not index
+
+    def test_bad_window(self):
+        session = _session(_line("1", [6, 7, 8, 9]))
+        for params in ({"from_ms": 2.0, "to_ms": 1.0}, {"km_min": 5.0, "km_max": 1.0}, {"format": "xml"}):
+            with pytest.raises(HTTPException) as exc_info:
+                _window(session, **params)
+            assert exc_info.value.status_code == 400
+
+
+def _segment_distance(p, a, b):
+    dx, dy = b[0] - a[0], b[1] - a[1]
+    length2 = dx * dx + dy * dy
+    t = 0.0 if length2 == 0 else max(0.0, min(1.0, ((p[0] - a[0]) * dx + (p[1] - a[1]) * dy) / length2))
+    return ((p[0] - a[0] - t * dx) ** 2 + (p[1] - a[1] - t * dy) ** 2) ** 0.5
+
+
+class TestLevelOfDetail:
+    def _wiggly(self):
+        # many stations on a near-straight line, one dual station in the middle
+        stations = {f"S{i}": float(i) for i in range(40)}
+        records = []
+        for i in range(40):
+            h = 6 + i / 40 + (0.0005 if i % 2 else 0.0)
+            rec = {"train_number": "1", "station": f"S{i}", "km": float(i),
+                   "time": format_time_decimal(h), "time_decimal": h}
+            if i == 20:
+                records.append({**rec, "stop_type": "p"})
+                rec = {**rec, "stop_type": "o", "time_decimal": h + 0.001}
+            records.append(rec)
+        session = _session(records)
+        session["station_map"] = session["station_maps"]["S"] = stations
+        return session
+
+    def test_within_one_pixel_and_keeps_anchors(self):
+        session = self._wiggly()
+        full = _window(session)["plot_series"][0]["points"]
+        width, height = 400, 300
+        result = _window(session, width_px=width, height_px=height)
+        pts = result["plot_series"][0]["points"]
+        assert result["lod"]["points"] == len(pts) < len(full)
+        assert pts[0] == full[0] and pts[-1] == full[-1]
+        assert [p["stopType"] for p in pts if p["stopType"]] == ["p", "o"]
+
+        t0, t1 = full[0]["value"][0], full[-1]["value"][0]
+        sx, sy = width / (t1 - t0), height / 39.0
+        px = [(p["value"][0] * sx, p["value"][1] * sy) for p in pts]
+        for p in full:
+            q = (p["value"][0] * sx, p["value"][1] * sy)
+            assert min(_segment_distance(q, a, b) for a, b in zip(px, px[1:])) <= 1.0 + 1e-9
+
+    def test_zoomed_in_keeps_everything(self):
+        session = self._wiggly()
+        full = _window(session, from_ms=6.2 * H, to_ms=6.3 * H)["plot_series"]
+        zoomed = _window(session, from_ms=6.2 * H, to_ms=6.3 * H, width_px=4000, height_px=4000)
+        assert zoomed["plot_series"] == full
+
+    def test_cached_per_zoom_bucket(self, monkeypatch):
+        session = self._wiggly()
+        calls = []
+        real = PlotIndex.simplified
+        monkeypatch.setattr(PlotIndex, "simplified", lambda self, *a: calls.append(a) or real(self, *a))
+        span = 0.2 * H
+        for start in (6.0, 6.1, 6.3):  # panning
+            _window(session, from_ms=start * H, to_ms=start * H + span, width_px=800, height_px=600)
+        assert len(calls) == 1
+        _window(session, from_ms=6 * H, to_ms=6 * H + span / 4, width_px=800, height_px=600)
+        assert len(calls) == 2
+
+    def test_size_needs_both_dimensions(self):
+        session = self._wiggly()
+        for params in ({"width_px": 100}, {"width_px": 0, "height_px": 10}):
+            with pytest.raises(HTTPException):
+                _window(session, **params)
@@ -12,7 +12,7 @@ import datetime as dt
 import pytest
 
 from backend.models.session import SessionState
-from table_editor import save_cell_time, clear_cell_time, propagate_time_shift
+from table_editor import save_cell_time, clear_cell_time, propagate_time_shift, shift_train_times
 from utils import format_time_decimal, format_time_hhmm
 
 
@@ -707,3 +707,60 @@ class TestEdgeCases:
         assert format_time_decimal(25.5) == "01:30 (+1)"
         assert format_time_decimal(48.0) == "00:00 (+2)"
         assert format_time_decimal(-1.0) == "23:00"
+
+
+# ---------------------------------------------------------------------------
+# Bulk shift
+# ---------------------------------------------------------------------------
+
+class TestShiftTrainTimes:
+    def _session(self) -> SessionState:
+        session = _ascending_train_session()
+        trains = session.get("sheets_data")[0]["trains"]
+        trains.append(_make_train_rec("102", "A", 0.0, 14.5))
+        trains.append(_make_train_rec("102", "B", 10.0, 23.75))
+        trains.append(_make_train_rec("103", "A", 0.0, 16.0))
+        return session
+
+    def test_shift_selected_trains(self):
+        session = self._session()
+        shifted = shift_train_times("WL", 0.5, session, train_numbers=["102"])
+        assert shifted == 2
+        times = _get_train_times(session, "WL", "102")
+        assert abs(times["A"] - 15.0) < 0.001
+        assert _get_train_times(session, "WL", "101")["A"] == 6.0
+
+    def test_midnight_renders_next_day(self):
+        session = self._session()
+        shift_train_times("WL", 0.5, session, train_numbers=["102"])
+        rec = next(r for r in session.get("sheets_data")[0]["trains"]
+                   if r["train_number"] == "102" and r["station"] == "B")
+        assert rec["time"] == "00:15 (+1)"
+
+    def test_departure_window(self):
+        session = self._session()
+        assert shift_train_times("WL", -1.0, session, departure_from=14.0) == 3
+        assert _get_train_times(session, "WL", "101")["A"] == 6.0
+        assert abs(_get_train_times(session, "WL", "103")["A"] - 15.0) < 0.001
+        assert shift_train_times("WL", 1.0, session, departure_from=13.0, departure_to=14.0) == 2
+
+    def test_backward_across_midnight_keeps_order(self):
+        session = self._session()
+        trains = session.get("sheets_data")[0]["trains"]
+        trains.append(_make_train_rec("104", "A", 0.0, 10 / 60))
+        trains.append(_make_train_rec("104", "B", 10.0, 30 / 60))
+        assert shift_train_times("WL", -20 / 60, session, train_numbers=["104"]) == 2
+        times = _get_train_times(session, "WL", "104")
+        assert abs(times["A"] - (23 + 50 / 60)) < 0.001
+        assert abs(times["B"] - (24 + 10 / 60)) < 0.001
+        rec = next(r for r in session.get("sheets_data")[0]["trains"]
+                   if r["train_number"] == "104" and r["station"] == "B")
+        assert rec["time"] == "00:10 (+1)"
+        # trains that stay after midnight are not moved a day
+        shift_train_times("WL", -1.0, session, train_numbers=["102"])
+        assert abs(_get_train_times(session, "WL", "102")["A"] - 13.5) < 0.001
+
+    def test_whole_sheet(self):
+        session = self._session()
+        assert shift_train_times("WL", 0.25, session) == 8
+        assert shift_train_times("XX", 0.25, session) == 0
@@ -0,0 +1,69 @@
+"""Equivalence tests: utils.parse_times must match utils.parse_time cell by
+cell, bit for bit, on the same cells extract_excel_data reads."""
+
+import datetime as dt
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import EXAMPLE_WORKBOOKS, example_workbook_bytes
+from excel_loader import ENGINES, read_workbook
+from utils import parse_time, parse_times
+
+
+def _assert_matches_scalar(df: pd.DataFrame) -> None:
+    batch = parse_times(df)
+    assert batch.dtype == np.float64
+    assert batch.shape == df.shape
+    for r in range(df.shape[0]):
+        for c in range(df.shape[1]):
+            expected = parse_time(df.iat[r, c])
+            got = batch[r, c]
+            if expected is None:
+                assert np.isnan(got), (r, c, df.iat[r, c])
+            else:
+                assert np.float64(expected).tobytes() == got.tobytes(), (r, c, df.iat[r, c])
+
+
+MIXED_CELLS = [
+    [0.25, "6:30", "06.35", "0:20 (+1)", None],
+    [dt.time(23, 59, 59), dt.datetime(2024, 1, 1, 5, 7), pd.Timestamp("2024-01-01 13:45"), "23", "7"],
+    ["12:5:30", "abc", "", "0,5", "7.5"],
+    [1.0 / 3, 18, True, float("nan"), "1:00 ( +2 )"],
+    ["-3.15", "25.00", "1e-1", ":", "x:y"],
+]
+
+
+class TestParseTimes:
+    def test_mixed_object_block(self):
+        _assert_matches_scalar(pd.DataFrame(MIXED_CELLS))
+
+    def test_plain_2d_list(self):
+        batch = parse_times(MIXED_CELLS)
+        assert batch[0, 0] == parse_time(0.25)
+        assert np.isnan(batch[2, 1])
+
+    def test_typed_columns(self):
+        df = pd.DataFrame({
+            "f": [0.5, 7.25, np.nan, 1.0],
+            "i": [0, 5, 23, -3],
+            "s": ["06:00", None, "7.30", "x"],
+        })
+        _assert_matches_scalar(df)
+
+    def test_rejects_non_2d(self):
+        with pytest.raises(ValueError):
+            parse_times([1, 2, 3])
+
+    @pytest.mark.parametrize("engine", ENGINES)
+    def test_fixture_workbook(self, engine, timetable_xlsx):
+        _, sheets, _ = read_workbook(timetable_xlsx, engine=engine)
+        for df in sheets.values():
+            _assert_matches_scalar(df)
+
+    @pytest.mark.parametrize("path", EXAMPLE_WORKBOOKS, ids=lambda p: p.name)
+    def test_example_workbooks(self, path):
+        _, sheets, _ = read_workbook(example_workbook_bytes(path))
+        for df in sheets.values():
+            _assert_matches_scalar(df)
@@ -0,0 +1,231 @@
+"""Tests for the columnar timetable store and its list-of-dicts compatibility."""
+
+import copy
+import datetime as dt
+import json
+import pickle
+
+import numpy as np
+
+from backend.models.session import SessionState
+from backend.services.excel_service import load_excel, load_project_json
+from backend.services.export_service import build_project_json
+from table_editor import clear_cell_time, propagate_time_shift, save_cell_time
+from timetable_store import SheetTimetable, as_records
+
+
+def _records():
+    return [
+        {"train_number": "101", "station": "A", "km": 0.0, "time": "06:00", "time_decimal": 6.0},
+        {"train_number": "101", "station": "B", "km": 10.0, "time": "06:30", "time_decimal": 6.5,
+         "stop_type": "p"},
+        {"train_number": "101", "station": "B", "km": 10.0, "time": "06:32", "time_decimal": 6.5333,
+         "stop_type": "o"},
+        {"train_number": "202", "station": "A", "km": 0.0, "time": "bad", "time_decimal": None},
+    ]
+
+
+class TestDictView:
+    def test_round_trip_and_equality(self):
+        store = SheetTimetable(_records())
+        assert store.to_records() == _records()
+        assert store == _records()
+        assert list(store[1]) == ["train_number", "station", "km", "time", "time_decimal", "stop_type"]
+        assert "stop_type" not in store[0]
+        assert store[3].get("time_decimal") is None
+
+    def test_writes_go_to_columns(self):
+        store = SheetTimetable(_records())
+        rec = store[0]
+        rec["time_decimal"] = 7.25
+        rec["time"] = "07:15"
+        assert store.column("time_decimal")[0] == 7.25
+        assert store.to_records()[0]["time"] == "07:15"
+
+    def test_append_delete_keep_order(self):
+        store = SheetTimetable(_records())
+        store.append({"train_number": "303", "station": "C", "km": 20.0, "time": "08:00", "time_decimal": 8.0})
+        del store[1]
+        expected = _records()
+        del expected[1]
+        expected.append({"train_number": "303", "station": "C", "km": 20.0, "time": "08:00", "time_decimal": 8.0})
+        assert store == expected
+        assert len(store) == 4
+        assert list(store.column("km")) == [0.0, 10.0, 0.0, 20.0]
+
+    def test_compacts_after_many_deletes(self):
+        store = SheetTimetable({**_records()[0], "km": float(i)} for i in range(100))
+        for _ in range(80):
+            del store[0]
+        assert len(store) == 20 and store._n < 40
+        assert store[0]["km"] == 80.0
+
+    def test_odd_values_kept_verbatim(self):
+        store = SheetTimetable([{**_records()[0], "km": "12,5", "note": "x"}])
+        assert store.to_records() == [{**_records()[0], "km": "12,5", "note": "x"}]
+
+
+class TestColumns:
+    def test_find_and_train_mask(self):
+        store = SheetTimetable(_records())
+        assert store.find("B", 10.0, "101", "o") == 2
+        assert store.find("B", 10.004, "101", "p", km_tol=0.01) == 1
+        assert store.find("B", 10.0, "101") is None
+        assert list(store.train_mask(202)) == [False, False, False, True]
+
+    def test_pickle_and_copy_are_compact(self):
+        store = SheetTimetable(_records())
+        del store[0]
+        for clone in (pickle.loads(pickle.dumps(store)), copy.deepcopy(store)):
+            assert clone == store and clone._dead == 0
+            assert clone.revision == store.revision
+
+    def test_smaller_than_dicts(self):
+        store = SheetTimetable({**_records()[1], "km": float(i)} for i in range(1000))
+        assert store.nbytes() / len(store) < 64
+
+
+class TestSessionIntegration:
+    def test_loaded_sheets_are_columnar(self, timetable_xlsx):
+        session = SessionState()
+        load_excel(timetable_xlsx, "t.xlsx", session)
+        trains = session["sheets_data"][0]["trains"]
+        assert isinstance(trains, SheetTimetable)
+        assert {r["train_number"] for r in trains} >= {"101", "203"}
+
+    def test_project_json_round_trip(self, timetable_xlsx):
+        session = SessionState()
+        load_excel(timetable_xlsx, "t.xlsx", session)
+        restored = SessionState()
+        load_project_json(build_project_json(session), restored)
+        for before, after in zip(session["sheets_data"], restored["sheets_data"]):
+            assert isinstance(after["trains"], SheetTimetable)
+            assert as_records(after["trains"]) == as_records(before["trains"])
+        assert not np.isnan(restored["sheets_data"][0]["trains"].column("time_decimal")).any()
+
+
+class TestCellIndex:
+    def _indexed(self):
+        store = SheetTimetable(_records())
+        assert store.find("A", 0.0, "101") == 0  # builds the index
+        return store
+
+    def test_lookups_do_not_scan(self, monkeypatch):
+        store = self._indexed()
+        monkeypatch.setattr(store, "column", lambda field: 1 / 0)
+        assert store.find("B", 10.0, "101", "o") == 2
+        assert store.find("B", 10.004, "101", "o", km_tol=0.01) == 2
+        assert store.find("C", 0.0, "101") is None
+
+    def test_kept_up_to_date(self):
+        store = self._indexed()
+        store.append({"train_number": "303", "station": "C", "km": 20.0, "time": "08:00", "time_decimal": 8.0})
+        assert store.find("C", 20.0, "303") == 4
+
+        store[4]["km"] = 21.0
+        assert store.find("C", 20.0, "303") is None
+        assert store.find("C", 21.0, "303") == 4
+
+        del store[2]["stop_type"]
+        assert store.find("B", 10.0, "101", "o") is None
+        assert store.find("B", 10.0, "101") == 2
+
+        store[0] = {**_records()[0], "station": "Z"}
+        assert store.find("A", 0.0, "101") is None and store.find("Z", 0.0, "101") == 0
+
+        store.remove_row(4)
+        assert store.find("C", 21.0, "303") is None
+
+    def test_duplicate_cells_first_wins(self):
+        store = self._indexed()
+        store.append(_records()[0])
+        assert store.find("A", 0.0, "101") == 0
+        del store[0]
+        assert store.find("A", 0.0, "101") == 4
+
+    def test_rebuilt_after_compaction(self):
+        store = SheetTimetable({**_records()[0], "km": float(i)} for i in range(100))
+        assert store.find("A", 99.0, "101") == 99
+        for _ in range(60):
+            del store[0]
+        assert store.record(store.find("A", 99.0, "101"))["km"] == 99.0
+
+    def test_edits_after_project_json_and_upload(self, timetable_xlsx):
+        for load in ("xlsx", "json"):
+            session = SessionState()
+            load_excel(timetable_xlsx, "t.xlsx", session)
+            if load == "json":
+                restored = SessionState()
+                load_project_json(build_project_json(session), restored)
+                session = restored
+            trains = session["sheets_data"][0]["trains"]
+            before = len(trains)
+            save_cell_time("WL", "Jawor", 12.5, "101", dt.time(6, 20), session, stop_type="o")
+            assert len(trains) == before
+            assert trains.record(trains.find("Jawor", 12.5, "101", "o"))["time"] == "06:20"
+            clear_cell_time("WL", "Jawor", 12.5, "101", session, stop_type="o")
+            assert len(trains) == before - 1
+            assert trains.find("Jawor", 12.5, "101", "o") is None
+
+    def test_null_stop_type_and_km_from_project_json(self):
+        project = {
+            "_format": "train-timetable-plotter-project",
+            "station_map": {"A": 0.0},
+            "selected_sheet": "S",
+            "sheets_data": [{"sheet": "S", "trains": [
+                {"train_number": "1", "station": "A", "km": 0.0, "time": "06:00",
+                 "time_decimal": 6.0, "stop_type": None},
+                {"train_number": "1", "station": "X", "km": None, "time": "07:00",
+                 "time_decimal": 7.0, "stop_type": None},
+            ]}],
+        }
+        session = SessionState()
+        load_project_json(json.dumps(project).encode("utf-8"), session)
+        trains = session["sheets_data"][0]["trains"]
+        assert trains.find("A", 0.0, "1") is not None
+        save_cell_time("S", "A", 0.0, "1", dt.time(6, 30), session)
+        assert len(trains) == 2
+        assert trains.record(trains.find("A", 0.0, "1"))["time"] == "06:30"
+        assert trains.record(1)["km"] is None
+        assert trains.to_records()[1]["km"] is None
+
+
+class TestTrainIndex:
+    def _store(self):
+        return SheetTimetable([
+            {"train_number": "7", "station": s, "km": km, "time": "", "time_decimal": t}
+            for s, km, t in (("C", 20.0, 6.0), ("A", 0.0, 7.0), ("B", 10.0, None), ("D", 30.0, 5.5))
+        ] + _records())
+
+    def test_events_ordered_by_km(self):
+        store = self._store()
+        assert [store.record(r)["station"] for r in store.train_events("7")] == ["A", "B", "C", "D"]
+        assert store.train_direction("7") is False
+        assert store.train_direction(101) is True
+        assert store.train_direction("202") is None
+
+    def test_exclude_edited_station(self):
+        store = self._store()
+        assert store.train_direction("7", exclude_km=30.0) is False
+        assert store.train_direction("7", exclude_km=0.0) is False
+        store[0]["time_decimal"] = 8.0  # C now after A: ascending once D is left out
+        assert store.train_direction("7", exclude_km=30.0) is True
+
+    def test_cache_follows_edits(self):
+        store = self._store()
+        assert store.train_direction("7") is False
+        store.record(store.find("A", 0.0, "7"))["time_decimal"] = 4.0
+        assert store.train_direction("7") is True
+        store.append({"train_number": "7", "station": "E", "km": 5.0, "time": "", "time_decimal": 4.5})
+        assert [store.record(r)["station"] for r in store.train_events("7")] == ["A", "E", "B", "C", "D"]
+        store.remove_row(store.find("D", 30.0, "7"))
+        assert len(store.train_events("7")) == 4
+
+    def test_propagate_touches_only_that_train(self, monkeypatch):
+        session = SessionState()
+        session["sheets_data"] = [{"sheet": "S", "trains": self._store()}]
+        store = session["sheets_data"][0]["trains"]
+        store.train_events("7")
+        monkeypatch.setattr(store, "column", lambda field: 1 / 0)
+        propagate_time_shift("S", "7", 20.0, -0.5, session)
+        assert [r["time_decimal"] for r in store][:4] == [6.0, 6.5, None, 5.5]
@@ -0,0 +1,240 @@
+"""Tests for background upload jobs and their SSE progress stream."""
+
+import asyncio
+import io
+import threading
+
+import pytest
+from fastapi import HTTPException, UploadFile
+
+from backend.models.session import SessionState
+from backend.routers import upload
+from backend.routers.upload import upload_job_events
+from backend.services import upload_jobs as jobs_module
+from backend.services.excel_service import parse_excel, store_excel
+from backend.services.parse_cache import parse_cache
+from backend.services.upload_jobs import UploadJobManager
+
+
+@pytest.fixture
+def manager():
+    m = UploadJobManager(workers=1)
+    yield m
+    m._executor.shutdown(wait=True)
+
+
+def _parse_work(data, session):
+    def work(job):
+        parsed = parse_excel(data, on_read=job.progress("read"), on_extract=job.progress("extract"))
+        return store_excel(parsed, "t.xlsx", session)
+    return work
+
+
+class TestUploadJobs:
+    def test_progress_then_result(self, manager, timetable_xlsx):
+        parse_cache.clear()
+        session = SessionState()
+        cleaned = threading.Event()
+        job = manager.submit("t.xlsx", _parse_work(timetable_xlsx, session), cleanup=cleaned.set)
+        job.future.result(timeout=30)
+
+        kinds = [(e["event"], e.get("phase")) for e in job.events]
+        assert kinds == [
+            ("status", None),
+            ("progress", "read"), ("progress", "read"),
+            ("progress", "extract"), ("progress", "extract"),
+            ("done", None),
+        ]
+        assert job.events[-1]["result"]["sheets"] == ["WL", "LW"]
+        assert [e["sheet"] for e in session["sheets_data"]] == ["WL", "LW"]
+        assert cleaned.wait(5)
+
+    def test_cancel_running_job_stops_at_next_sheet(self, manager):
+        started, release = threading.Event(), threading.Event()
+        reached = []
+
+        def work(job):
+            report = job.progress("extract")
+            for i in range(1, 4):
+                started.set()
+                release.wait(5)
+                report(f"S{i}", i, 3)
+                reached.append(i)
+            return {}
+
+        job = manager.submit("t.xlsx", work)
+        assert started.wait(5)
+        manager.cancel(job.id)
+        release.set()
+        job.future.result(timeout=5)
+        assert job.status == "cancelled"
+        assert reached == []
+
+    def test_cancel_queued_job_never_runs(self, manager):
+        release = threading.Event()
+        blocker = manager.submit("a.xlsx", lambda job: release.wait(5) and {})
+        ran = threading.Event()
+        queued = manager.submit("b.xlsx", lambda job: ran.set() or {})
+        manager.cancel(queued.id)
+        assert queued.status == "cancelled"
+        release.set()
+        blocker.future.result(timeout=5)
+        assert not ran.is_set()
+
+    def test_running_status_set_with_its_event(self, manager):
+        release = threading.Event()
+        job = manager.submit("t.xlsx", lambda job: release.wait(5) and {})
+        assert job.wait_events(0, 5) == [{"event": "status", "status": "running"}]
+        assert job.status == "running"
+        release.set()
+        job.future.result(timeout=5)
+
+        finished = jobs_module.UploadJob("t.xlsx")
+        finished.emit("cancelled")
+        finished.emit("status", status="running")
+        assert finished.status == "cancelled"
+
+    def test_failure_becomes_failed_event(self, manager):
+        def work(job):
+            raise jobs_module.JobFailed(413, "za duzy")
+
+        job = manager.submit("t.xlsx", work)
+        job.future.result(timeout=5)
+        assert job.events[-1] == {"event": "failed", "status_code": 413, "detail": "za duzy"}
+
+
+def _read_stream(job_id, last_event_id=None):
+    async def collect():
+        response = await upload_job_events(job_id, last_event_id)
+        return [chunk async for chunk in response.body_iterator]
+    return asyncio.run(collect())
+
+
+class TestEventStream:
+    def test_sse_frames_and_resume(self, manager, timetable_xlsx, monkeypatch):
+        monkeypatch.setattr("backend.routers.upload.upload_jobs", manager)
+        job = manager.submit("t.xlsx", _parse_work(timetable_xlsx, SessionState()))
+        job.future.result(timeout=30)
+
+        frames = _read_stream(job.id)
+        assert len(frames) == len(job.events)
+        assert frames[0].startswith("id: 0\nevent: status\n")
+        assert frames[-1].startswith(f"id: {len(frames) - 1}\nevent: done\n")
+
+        resumed = _read_stream(job.id, last_event_id=str(len(frames) - 2))
+        assert resumed == frames[-1:]
+
+    def test_unknown_job(self):
+        with pytest.raises(HTTPException) as exc_info:
+            _read_stream("nope")
+        assert exc_info.value.status_code == 404
+
+
+class _ThreadCheckedSession(SessionState):
+    """Records the thread of every session write."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.writers = set()
+
+    def __setitem__(self, key, value):
+        self.writers.add(threading.current_thread().name)
+        super().__setitem__(key, value)
+
+
+def _run_upload_job(manager, monkeypatch, data, session, incremental=False, while_parsing=None):
+    monkeypatch.setattr(upload, "upload_jobs", manager)
+
+    async def scenario():
+        response = await upload.start_upload_job(
+            UploadFile(io.BytesIO(data), filename="t.xlsx"),
+            engine="openpyxl", lazy=False, incremental=incremental, session=session,
+        )
+        job = manager.get(response.job_id)
+        if while_parsing is not None:
+            while_parsing()
+        while not job.finished:
+            await asyncio.sleep(0.01)
+        return job
+
+    return asyncio.run(scenario())
+
+
+class TestUploadJobEndpoint:
+    def test_session_written_on_event_loop_only(self, manager, monkeypatch, timetable_xlsx):
+        parse_cache.clear()
+        session = _ThreadCheckedSession()
+        job = _run_upload_job(manager, monkeypatch, timetable_xlsx, session)
+        assert job.events[-1]["event"] == "done"
+        assert job.events[-1]["result"]["sheets"] == ["WL", "LW"]
+        assert [e["sheet"] for e in session["sheets_data"]] == ["WL", "LW"]
+        assert session.writers == {threading.current_thread().name}
+
+    def test_incremental_base_replaced_while_parsing(self, manager, monkeypatch, timetable_xlsx):
+        session = SessionState()
+        upload._store_upload(parse_excel(timetable_xlsx), "t.xlsx", session)
+        release = threading.Event()
+        real_parse = upload.parse_excel
+
+        def slow_parse(*args, **kwargs):
+            release.wait(5)
+            return real_parse(*args, **kwargs)
+
+        def replace_workbook():
+            session["sheet_fingerprints"] = {}
+            release.set()
+
+        monkeypatch.setattr(upload, "parse_excel", slow_parse)
+        job = _run_upload_job(manager, monkeypatch, timetable_xlsx, session,
+                              incremental=True, while_parsing=replace_workbook)
+        assert job.events[-1]["event"] == "failed"
+        assert job.events[-1]["status_code"] == 409
+
+
+def _post_upload(app, chunks, content_length=None):
+    """Send a multipart upload to /api/upload/jobs through ``app`` as ASGI
+    messages; returns the status and how many body chunks were read."""
+    headers = [(b"content-type", b"multipart/form-data; boundary=B")]
+    if content_length is not None:
+        headers.append((b"content-length", str(content_length).encode()))
+    scope = {"type": "http", "http_version": "1.1", "method": "POST", "scheme": "http",
+             "path": "/api/upload/jobs", "raw_path": b"/api/upload/jobs", "root_path": "",
+             "query_string": b"", "headers": headers, "server": ("test", 80), "client": ("test", 1)}
+    pending = list(chunks)
+    read = 0
+    sent = []
+
+    async def receive():
+        nonlocal read
+        if not pending:
+            return {"type": "http.disconnect"}
+        read += 1
+        body = pending.pop(0)
+        return {"type": "http.request", "body": body, "more_body": bool(pending)}
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(app(scope, receive, send))
+    return sent[0]["status"], read
+
+
+class TestUploadSizeLimit:
+    @pytest.fixture
+    def app(self):
+        from fastapi import FastAPI
+
+        app = FastAPI()
+        app.include_router(upload.router)
+        app.add_middleware(upload.UploadSizeLimit, max_bytes=1024)
+        return app
+
+    def test_content_length_over_limit_never_read(self, app):
+        assert _post_upload(app, [b"x" * 2048], content_length=2048) == (413, 0)
+
+    def test_chunked_body_cut_off_at_limit(self, app):
+        head = b'--B\r\nContent-Disposition: form-data; name="file"; filename="t.xlsx"\r\n\r\n'
+        chunks = [head] + [b"x" * 512] * 10
+        status, read = _post_upload(app, chunks)
+        assert status == 413
+        assert read < len(chunks)
@@ -0,0 +1,675 @@
+"""Columnar storage for one sheet's train events.
+
+A sheet's events used to be a list of dicts
+``{train_number, station, km, time, time_decimal[, stop_type]}``.
+``SheetTimetable`` keeps one numpy array per field instead. Train numbers,
+station names, time strings and stop types are interned per sheet and stored
+as int32 codes, so an event costs ~30 bytes instead of several hundred.
+
+The class is a ``MutableSequence`` of ``RecordView`` mappings, so code written
+against ``entry["trains"]`` (iteration, ``rec["time"] = ...``, ``append``,
+``del``) keeps working unchanged; hot paths read whole columns instead
+(``column``, ``labels``, ``code_of``). Deleted rows are tombstoned and the
+arrays compacted once more than half of them are dead, so physical row
+numbers stay stable between compactions.
+
+Cell lookups go through a hash index from (station, km, train, stop_type) to
+the physical row, built on the first lookup and kept up to date by every
+mutation afterwards, so single-cell edits cost O(1) however big the sheet is.
+Alongside it each train keeps its rows, and on demand its events ordered by
+km with the travel direction cached, so per-train work (time-shift
+propagation) costs O(events of that train).
+"""
+from bisect import insort
+from collections.abc import Mapping, MutableMapping, MutableSequence
+from typing import Any, Dict, Hashable, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+# Fields every event has, in dict-view key order; "stop_type" follows when present
+CORE_FIELDS = ("train_number", "station", "km", "time", "time_decimal")
+CODED_FIELDS = ("train_number", "station", "time", "stop_type")
+FLOAT_FIELDS = ("km", "time_decimal")
+
+# Fields that make up a cell's lookup key
+KEY_FIELDS = ("train_number", "station", "km", "stop_type")
+
+# stop_type code meaning "record has no stop_type key"
+NO_STOP = -1
+
+# (station code, km, str(train_number), stop_type code)
+CellKey = Tuple[int, float, str, int]
+
+_MIN_CAPACITY = 16
+
+
+class _Codes:
+    """Intern table mapping values to dense int codes and back."""
+
+    __slots__ = ("values", "index")
+
+    def __init__(self, values: Iterable[Hashable] = ()) -> None:
+        self.values: List[Any] = []
+        self.index: Dict[Any, int] = {}
+        for v in values:
+            self.code(v)
+
+    def code(self, value: Hashable) -> int:
+        c = self.index.get(value)
+        if c is None:
+            c = self.index[value] = len(self.values)
+            self.values.append(value)
+        return c
+
+    def find(self, value: Hashable) -> int:
+        try:
+            return self.index.get(value, -1)
+        except TypeError:  # unhashable: cannot be stored, so not present
+            return -1
+
+
+def _as_float(value: Any) -> Optional[float]:
+    """float(value), or None when the value does not fit a float column."""
+    if isinstance(value, bool):
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class RecordView(MutableMapping):
+    """Dict-like view of one stored event; writes go straight to the columns."""
+
+    __slots__ = ("_store", "_row")
+
+    def __init__(self, store: "SheetTimetable", row: int) -> None:
+        self._store = store
+        self._row = row
+
+    @property
+    def row(self) -> int:
+        """Physical row in the store (stable until the next compaction)."""
+        return self._row
+
+    def __getitem__(self, key: str) -> Any:
+        return self._store._get(self._row, key)
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        self._store._write(self._row, key, value)
+        self._store._touch()
+
+    def __delitem__(self, key: str) -> None:
+        self._store._reindexed(self._row, key, self._store._del_key, self._row, key)
+        self._store._touch()
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._store._keys(self._row))
+
+    def __len__(self) -> int:
+        return len(self._store._keys(self._row))
+
+    def __repr__(self) -> str:
+        return repr(dict(self))
+
+
+class SheetTimetable(MutableSequence):
+    """Columnar, list-compatible container of one sheet's train events."""
+
+    def __init__(self, records: Iterable[Mapping] = ()) -> None:
+        self._init_columns(0)
+        self.revision = 0
+        for rec in records:
+            self._append(rec)
+
+    # ------------------------------------------------------------------ setup
+
+    def _init_columns(self, capacity: int) -> None:
+        capacity = max(capacity, _MIN_CAPACITY)
+        self._train = np.empty(capacity, dtype=np.int32)
+        self._station = np.empty(capacity, dtype=np.int32)
+        self._time = np.empty(capacity, dtype=np.int32)
+        self._stop = np.empty(capacity, dtype=np.int32)
+        self._km = np.empty(capacity, dtype=np.float64)
+        self._tdec = np.empty(capacity, dtype=np.float64)
+        self._live = np.zeros(capacity, dtype=bool)
+        self._codes = {name: _Codes() for name in CODED_FIELDS}
+        self._extra: Dict[int, Dict[str, Any]] = {}  # row -> keys that do not fit a column
+        self._n = 0  # physical rows in use
+        self._dead = 0
+        self._rows_cache: Optional[np.ndarray] = None
+        self._drop_index()
+
+    @classmethod
+    def from_columns(
+        cls,
+        train_number: Sequence[Any],
+        station: Sequence[Any],
+        km: Sequence[float],
+        time: Sequence[Any],
+        time_decimal: Sequence[Optional[float]],
+        stop_type: Sequence[Optional[str]],
+    ) -> "SheetTimetable":
+        """Build from parallel field lists; a None stop_type means no stop_type key."""
+        store = cls()
+        n = len(train_number)
+        store._init_columns(n)
+        codes = store._codes
+        store._train[:n] = [codes["train_number"].code(v) for v in train_number]
+        store._station[:n] = [codes["station"].code(v) for v in station]
+        store._time[:n] = [codes["time"].code(v) for v in time]
+        store._stop[:n] = [NO_STOP if v is None else codes["stop_type"].code(v) for v in stop_type]
+        store._km[:n] = km
+        store._tdec[:n] = [np.nan if v is None else v for v in time_decimal]
+        store._live[:n] = True
+        store._n = n
+        return store
+
+    # --------------------------------------------------------- column access
+
+    def rows(self) -> np.ndarray:
+        """Physical rows of the live events, in sequence order."""
+        if self._rows_cache is None:
+            if self._dead:
+                self._rows_cache = np.flatnonzero(self._live[:self._n])
+            else:
+                self._rows_cache = np.arange(self._n)
+        return self._rows_cache
+
+    def column(self, field: str) -> np.ndarray:
+        """One field over the live events: int32 codes for coded fields
+        (``NO_STOP`` for a missing or None stop_type), float64 for km /
+        time_decimal (NaN for None, read back as None). Values kept outside the columns are not reflected."""
+        arrays = {
+            "train_number": self._train, "station": self._station, "time": self._time,
+            "stop_type": self._stop, "km": self._km, "time_decimal": self._tdec,
+        }
+        data = arrays[field][:self._n]
+        if self._dead:
+            return data[self.rows()]
+        view = data.view()
+        view.flags.writeable = False
+        return view
+
+    def labels(self, field: str) -> List[Any]:
+        """Code table of a coded field: ``labels(f)[code]`` is the value."""
+        return self._codes[field].values
+
+    def code_of(self, field: str, value: Any) -> int:
+        """Code of ``value`` in a coded field, or -1 if no event uses it."""
+        if field == "stop_type" and value is None:
+            return NO_STOP
+        return self._codes[field].find(value)
+
+    def train_mask(self, train_number: Any) -> np.ndarray:
+        """Boolean mask over the live events of one train (compared as str)."""
+        wanted = str(train_number)
+        codes = [c for c, v in enumerate(self._codes["train_number"].values) if str(v) == wanted]
+        return np.isin(self.column("train_number"), codes)
+
+    def train_groups(self) -> Tuple[List[str], np.ndarray]:
+        """Trains by str label: (sorted labels, index into them per live event)."""
+        labels = [str(v) for v in self._codes["train_number"].values]
+        names = sorted(set(labels))
+        rank_of = {tn: i for i, tn in enumerate(names)}
+        code_rank = np.array([rank_of[tn] for tn in labels] or [0], dtype=np.intp)
+        return names, code_rank[self.column("train_number")]
+
+    def find(
+        self,
+        station: Any,
+        km: float,
+        train_number: Any,
+        stop_type: Optional[str] = None,
+        km_tol: Optional[float] = None,
+    ) -> Optional[int]:
+        """Physical row of the first event matching (station, km, train, stop_type).
+
+        km is compared exactly, or within ``abs(km - x) < km_tol`` if given;
+        trains are compared as str. O(1) through the cell index.
+        """
+        station_code = self.code_of("station", station)
+        stop_code = self.code_of("stop_type", stop_type)
+        if station_code < 0 or (stop_type is not None and stop_code < 0):
+            return None
+        index = self._cell_index()
+        tn = str(train_number)
+        if km_tol is None:
+            return _first_row(index.get((station_code, float(km), tn, stop_code)))
+        hits = [
+            _first_row(index.get((station_code, k, tn, stop_code)))
+            for k in self._station_kms.get(station_code, ())
+            if abs(k - float(km)) < km_tol
+        ]
+        hits = [h for h in hits if h is not None]
+        return min(hits) if hits else None
+
+    def train_events(self, train_number: Any) -> np.ndarray:
+        """Physical rows of one train's events ordered by km (ties in sequence order)."""
+        return self._train_order(str(train_number))[0]
+
+    def train_direction(self, train_number: Any, exclude_km: Optional[float] = None) -> Optional[bool]:
+        """Travel direction of a train: True if km increases with time.
+
+        Compares the timed events at the lowest and highest km. Events at
+        ``exclude_km`` (e.g. a just-edited station) are left out while at
+        least two others remain. None with fewer than two timed events.
+        """
+        tn = str(train_number)
+        _order, timed, ascending = self._train_order(tn)
+        if len(timed) < 2:
+            return None
+        kms = self._km[timed]
+        if exclude_km is not None and exclude_km in (kms[0], kms[-1]):
+            kept = timed[kms != float(exclude_km)]
+            if len(kept) >= 2:
+                return bool(self._tdec[kept[-1]] >= self._tdec[kept[0]])
+        if ascending is None:
+            ascending = bool(self._tdec[timed[-1]] >= self._tdec[timed[0]])
+            self._train_cache[tn] = (_order, timed, ascending)
+        return ascending
+
+    def values_at(self, field: str, rows: np.ndarray) -> np.ndarray:
+        """``field`` at the given physical rows (codes for coded fields)."""
+        arrays = {
+            "train_number": self._train, "station": self._station, "time": self._time,
+            "stop_type": self._stop, "km": self._km, "time_decimal": self._tdec,
+        }
+        return arrays[field][rows]
+
+    def update_column(self, rows: Sequence[int], field: str, values: Sequence[Any]) -> None:
+        """Write ``values`` into ``field`` of the given physical rows."""
+        rows = np.asarray(rows, dtype=np.intp)
+        if field == "time_decimal" and not self._extra:
+            self._tdec[rows] = [np.nan if v is None else v for v in values]
+            for code in set(self._train[rows].tolist()):
+                self._times_changed(code)
+        else:
+            for row, value in zip(rows.tolist(), values):
+                self._write(row, field, value)
+        self._touch()
+
+    def remove_row(self, row: int) -> None:
+        """Delete the event at physical row ``row``."""
+        self._delete_row(row)
+        self._maybe_compact()
+
+    def record(self, row: int) -> RecordView:
+        """View of physical row ``row``."""
+        return RecordView(self, row)
+
+    def to_records(self) -> List[Dict[str, Any]]:
+        """Plain list-of-dicts copy (e.g. for JSON)."""
+        rows = self.rows()
+        tn, st, tm, sp = (self._codes[f].values for f in CODED_FIELDS)
+        out: List[Dict[str, Any]] = []
+        for row, t, s, k, ti, td, sc in zip(
+            rows.tolist(), self._train[rows].tolist(), self._station[rows].tolist(), self._km[rows].tolist(),
+            self._time[rows].tolist(), self._tdec[rows].tolist(), self._stop[rows].tolist(),
+        ):
+            rec = {
+                "train_number": tn[t],
+                "station": st[s],
+                "km": None if k != k else k,
+                "time": tm[ti],
+                "time_decimal": None if td != td else td,
+            }
+            if sc != NO_STOP:
+                rec["stop_type"] = sp[sc]
+            extra = self._extra.get(row)
+            if extra:
+                rec.update(extra)
+            out.append(rec)
+        return out
+
+    def intern_labels(self, labels: Any) -> None:
+        """Swap the station / train code tables' strings for ``labels.intern`` copies."""
+        for field in ("train_number", "station"):
+            table = self._codes[field]
+            table.values = [labels.intern(v) for v in table.values]
+            table.index = {v: i for i, v in enumerate(table.values)}
+
+    def nbytes(self) -> int:
+        """Approximate memory held by the columns (not the shared label strings)."""
+        arrays = (self._train, self._station, self._time, self._stop, self._km, self._tdec, self._live)
+        return sum(a.nbytes for a in arrays)
+
+    # ---------------------------------------------------------- cell index
+
+    def _drop_index(self) -> None:
+        self._index: Optional[Dict[CellKey, Union[int, List[int]]]] = None
+        self._station_kms: Dict[int, Dict[float, int]] = {}  # station code -> km -> events
+        self._train_rows: Dict[str, List[int]] = {}  # str(train) -> rows, ascending
+        # str(train) -> (rows by km, timed rows by km, ascending); None = recompute
+        self._train_cache: Dict[str, Tuple[np.ndarray, Optional[np.ndarray], Optional[bool]]] = {}
+
+    def _train_order(self, tn: str) -> Tuple[np.ndarray, np.ndarray, Optional[bool]]:
+        cached = self._train_cache.get(tn)
+        if cached is None:
+            self._cell_index()
+            rows = np.array(self._train_rows.get(tn, ()), dtype=np.intp)
+            rows = rows[np.argsort(self._km[rows], kind="stable")]
+            cached = (rows, None, None)
+        rows, timed, ascending = cached
+        if timed is None:
+            timed = rows[~np.isnan(self._tdec[rows])]
+            cached = self._train_cache[tn] = (rows, timed, None)
+        return cached
+
+    def _times_changed(self, train_code: int) -> None:
+        """A train's times changed: its km order holds, timed rows and direction are stale."""
+        tn = str(self._codes["train_number"].values[train_code])
+        cached = self._train_cache.get(tn)
+        if cached is not None:
+            self._train_cache[tn] = (cached[0], None, None)
+
+    def _cell_index(self) -> Dict[CellKey, Union[int, List[int]]]:
+        """The (station, km, train, stop_type) -> row index, built on first use."""
+        if self._index is None:
+            self._index = {}
+            for row in self.rows().tolist():
+                self._index_add(row)
+        return self._index
+
+    def _row_key(self, row: int) -> CellKey:
+        train = self._codes["train_number"].values[self._train[row]]
+        return (int(self._station[row]), float(self._km[row]), str(train), int(self._stop[row]))
+
+    def _index_add(self, row: int) -> None:
+        key = self._row_key(row)
+        current = self._index.get(key)
+        if current is None:
+            self._index[key] = row
+        elif isinstance(current, list):
+            insort(current, row)
+        else:
+            self._index[key] = sorted((current, row))  # duplicate cell: keep all, first wins
+        kms = self._station_kms.setdefault(key[0], {})
+        kms[key[1]] = kms.get(key[1], 0) + 1
+        insort(self._train_rows.setdefault(key[2], []), row)
+        self._train_cache.pop(key[2], None)
+
+    def _index_remove(self, row: int) -> None:
+        key = self._row_key(row)
+        current = self._index.get(key)
+        if isinstance(current, list):
+            current.remove(row)
+            if len(current) == 1:
+                self._index[key] = current[0]
+        elif current == row:
+            del self._index[key]
+        else:
+            return
+        kms = self._station_kms[key[0]]
+        kms[key[1]] -= 1
+        if not kms[key[1]]:
+            del kms[key[1]]
+        train_rows = self._train_rows[key[2]]
+        train_rows.remove(row)
+        if not train_rows:
+            del self._train_rows[key[2]]
+        self._train_cache.pop(key[2], None)
+
+    def _reindexed(self, row: int, field: str, change, *args) -> Any:
+        """Run ``change(*args)`` keeping the index right if it moves ``row``'s key."""
+        if self._index is None or field not in KEY_FIELDS or not self._live[row]:
+            return change(*args)
+        self._index_remove(row)
+        try:
+            return change(*args)
+        finally:
+            self._index_add(row)
+
+    def _write(self, row: int, key: str, value: Any) -> None:
+        self._reindexed(row, key, self._set, row, key, value)
+        if key == "time_decimal" and self._train_cache:
+            self._times_changed(int(self._train[row]))
+
+    # ------------------------------------------------------- row internals
+
+    def _get(self, row: int, key: str) -> Any:
+        extra = self._extra.get(row)
+        if extra and key in extra:
+            return extra[key]
+        if key == "train_number":
+            return self._codes["train_number"].values[self._train[row]]
+        if key == "station":
+            return self._codes["station"].values[self._station[row]]
+        if key == "km":
+            v = float(self._km[row])
+            return None if v != v else v
+        if key == "time":
+            return self._codes["time"].values[self._time[row]]
+        if key == "time_decimal":
+            v = float(self._tdec[row])
+            return None if v != v else v
+        if key == "stop_type":
+            code = int(self._stop[row])
+            if code != NO_STOP:
+                return self._codes["stop_type"].values[code]
+        raise KeyError(key)
+
+    def _set(self, row: int, key: str, value: Any) -> None:
+        extra = self._extra.get(row)
+        if key in FLOAT_FIELDS:
+            f = None if (key == "time_decimal" and value is None) else _as_float(value)
+            if f is None and value is not None:
+                # keep odd values (e.g. a km string) verbatim beside the column
+                self._extra.setdefault(row, {})[key] = value
+                f = np.nan
+            elif extra:
+                extra.pop(key, None)
+            (self._km if key == "km" else self._tdec)[row] = np.nan if f is None else f
+        elif key == "stop_type" and value is None:
+            # same as code_of: an explicit None is "no stop_type"
+            if extra:
+                extra.pop(key, None)
+            self._stop[row] = NO_STOP
+        elif key in CODED_FIELDS:
+            try:
+                code = self._codes[key].code(value)
+            except TypeError:  # unhashable
+                self._extra.setdefault(row, {})[key] = value
+                return
+            if extra:
+                extra.pop(key, None)
+            target = {"train_number": self._train, "station": self._station,
+                      "time": self._time, "stop_type": self._stop}[key]
+            target[row] = code
+        else:
+            self._extra.setdefault(row, {})[key] = value
+
+    def _del_key(self, row: int, key: str) -> None:
+        extra = self._extra.get(row)
+        if extra and key in extra and key not in CORE_FIELDS:
+            del extra[key]
+        elif key == "stop_type" and self._stop[row] != NO_STOP:
+            self._stop[row] = NO_STOP
+        else:
+            raise KeyError(key)
+
+    def _keys(self, row: int) -> List[str]:
+        keys = list(CORE_FIELDS)
+        if self._stop[row] != NO_STOP or "stop_type" in self._extra.get(row, ()):
+            keys.append("stop_type")
+        keys.extend(k for k in self._extra.get(row, ()) if k not in keys)
+        return keys
+
+    def _reserve(self, needed: int) -> None:
+        capacity = len(self._train)
+        if needed <= capacity:
+            return
+        capacity = max(needed, capacity * 2)
+        for name in ("_train", "_station", "_time", "_stop", "_km", "_tdec"):
+            old = getattr(self, name)
+            new = np.empty(capacity, dtype=old.dtype)
+            new[:self._n] = old[:self._n]
+            setattr(self, name, new)
+        live = np.zeros(capacity, dtype=bool)
+        live[:self._n] = self._live[:self._n]
+        self._live = live
+
+    def _append(self, rec: Mapping) -> int:
+        row = self._n
+        self._reserve(row + 1)
+        self._km[row] = np.nan
+        self._tdec[row] = np.nan
+        self._stop[row] = NO_STOP
+        for key in CORE_FIELDS:
+            self._set(row, key, rec.get(key))
+        for key, value in rec.items():
+            if key not in CORE_FIELDS:
+                self._set(row, key, value)
+        self._live[row] = True
+        self._n += 1
+        if self._index is not None:
+            self._index_add(row)
+        self._touch()
+        return row
+
+    def _delete_row(self, row: int) -> None:
+        if self._index is not None:
+            self._index_remove(row)
+        self._live[row] = False
+        self._extra.pop(row, None)
+        self._dead += 1
+        self._touch()
+
+    def _touch(self) -> None:
+        """Record a mutation (rows cache, revision counter)."""
+        self._rows_cache = None
+        self.revision += 1
+
+    def _compact(self) -> None:
+        rows = self.rows()
+        extra = {new: self._extra[old] for new, old in enumerate(rows.tolist()) if old in self._extra}
+        for name in ("_train", "_station", "_time", "_stop", "_km", "_tdec"):
+            setattr(self, name, getattr(self, name)[rows].copy())
+        self._n = len(rows)
+        self._live = np.ones(self._n, dtype=bool)
+        self._extra = extra
+        self._dead = 0
+        self._drop_index()  # rows were renumbered; rebuilt on the next lookup
+        self._touch()
+        self._reserve(_MIN_CAPACITY)
+
+    def _maybe_compact(self) -> None:
+        if self._dead > _MIN_CAPACITY and self._dead * 2 > self._n:
+            self._compact()
+
+    # ------------------------------------------------- MutableSequence API
+
+    def __len__(self) -> int:
+        return self._n - self._dead
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [RecordView(self, row) for row in self.rows()[index].tolist()]
+        return RecordView(self, int(self.rows()[index]))
+
+    def __setitem__(self, index, rec: Mapping) -> None:
+        if isinstance(index, slice):
+            raise TypeError("SheetTimetable does not support slice assignment")
+        row = int(self.rows()[index])
+        if self._index is not None:
+            self._index_remove(row)
+        self._extra.pop(row, None)
+        self._stop[row] = NO_STOP
+        for key in CORE_FIELDS:
+            self._set(row, key, rec.get(key))
+        for key, value in rec.items():
+            if key not in CORE_FIELDS:
+                self._set(row, key, value)
+        if self._index is not None:
+            self._index_add(row)
+        self._touch()
+
+    def __delitem__(self, index) -> None:
+        rows = self.rows()[index]
+        for row in np.atleast_1d(rows).tolist():
+            self._delete_row(row)
+        self._maybe_compact()
+
+    def insert(self, index: int, rec: Mapping) -> None:
+        if index >= len(self):
+            self._append(rec)
+            return
+        records = self.to_records()
+        records.insert(index, dict(rec))
+        revision = self.revision
+        self.__init__(records)  # rows move: also drops the index
+        self.revision = revision + 1
+
+    def append(self, rec: Mapping) -> None:
+        self._append(rec)
+
+    def clear(self) -> None:
+        revision = self.revision
+        self._init_columns(0)
+        self.revision = revision + 1
+
+    def __iter__(self) -> Iterator[RecordView]:
+        for row in self.rows().tolist():
+            yield RecordView(self, row)
+
+    def __eq__(self, other: Any) -> bool:
+        if not isinstance(other, (SheetTimetable, list, tuple)):
+            return NotImplemented
+        return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+
+    __hash__ = None  # mutable
+
+    def __repr__(self) -> str:
+        return f"SheetTimetable({self.to_records()!r})"
+
+    # ------------------------------------------------------------ pickling
+
+    def __getstate__(self) -> Dict[str, Any]:
+        rows = self.rows()
+        return {
+            "columns": {name: getattr(self, name)[rows] for name in
+                        ("_train", "_station", "_time", "_stop", "_km", "_tdec")},
+            "codes": {field: table.values for field, table in self._codes.items()},
+            "extra": {new: self._extra[old] for new, old in enumerate(rows.tolist()) if old in self._extra},
+            "revision": self.revision,
+        }
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        columns = state["columns"]
+        n = len(columns["_train"])
+        self._init_columns(n)
+        for name, values in columns.items():
+            getattr(self, name)[:n] = values
+        self._live[:n] = True
+        self._n = n
+        self._codes = {field: _Codes(values) for field, values in state["codes"].items()}
+        self._extra = {row: dict(extra) for row, extra in state["extra"].items()}
+        self.revision = state["revision"]
+
+
+def _first_row(entry: Union[int, List[int], None]) -> Optional[int]:
+    if isinstance(entry, list):
+        return entry[0]
+    return entry
+
+
+def as_timetable(trains: Any) -> SheetTimetable:
+    """``trains`` as a SheetTimetable, converting (a copy of) plain record lists."""
+    if isinstance(trains, SheetTimetable):
+        return trains
+    return SheetTimetable(trains or [])
+
+
+def ensure_timetable(entry: Dict[str, Any]) -> SheetTimetable:
+    """Convert ``entry["trains"]`` to a SheetTimetable in place and return it."""
+    trains = entry.get("trains")
+    if not isinstance(trains, SheetTimetable):
+        trains = entry["trains"] = SheetTimetable(trains or [])
+    return trains
+
+
+def as_records(trains: Any) -> List[Dict[str, Any]]:
+    """Plain list of dicts for either representation."""
+    if isinstance(trains, SheetTimetable):
+        return trains.to_records()
+    return [dict(rec) for rec in trains or []]
@@ -1,15 +1,28 @@
+import datetime as _dt
+
+import numpy as np
 import pandas as pd
-from typing import Dict, Optional, Tuple, List, Sequence
+from typing import Any, Dict, Optional, Tuple, List, Sequence
 import unicodedata
 import re
+from functools import lru_cache
 
 # ===================== Helpers =====================
 
+# Distinct strings kept by the normalize memo (headers, station and train labels)
+NORMALIZE_CACHE_SIZE = 16384
+
+
 def normalize(s: str) -> str:
     """Normalize text for header comparison (casefold, collapse spaces, strip accents)."""
     if s is None:
         return ""
-    text = str(s).replace("\xa0", " ").strip().lower()
+    return _normalize_text(str(s))
+
+
+@lru_cache(maxsize=NORMALIZE_CACHE_SIZE)
+def _normalize_text(s: str) -> str:
+    text = s.replace("\xa0", " ").strip().lower()
     # collapse internal whitespace
     text = " ".join(text.split())
     # strip accents
@@ -17,6 +30,56 @@ def normalize(s: str) -> str:
     text_no_accents = "".join(ch for ch in text_nfkd if not unicodedata.combining(ch))
     return text_no_accents
 
+
+def normalize_cache_info() -> Dict[str, int]:
+    """Hit/miss counters and fill level of the ``normalize`` memo."""
+    info = _normalize_text.cache_info()
+    return {"hits": info.hits, "misses": info.misses, "size": info.currsize, "max_size": info.maxsize}
+
+
+class LabelTable:
+    """Intern table so each station name / train number is stored once.
+
+    Records parsed from different sheets (or loaded from project JSON) carry
+    their own copies of the same label; ``intern`` maps every copy onto one
+    canonical string object.
+    """
+
+    def __init__(self) -> None:
+        self._labels: Dict[str, str] = {}
+        self.lookups = 0
+        self.hits = 0
+
+    def __len__(self) -> int:
+        return len(self._labels)
+
+    def intern(self, label: Any) -> Any:
+        """Return the canonical copy of ``label`` (non-strings pass through)."""
+        if not isinstance(label, str):
+            return label
+        self.lookups += 1
+        canonical = self._labels.get(label)
+        if canonical is None:
+            self._labels[label] = label
+            return label
+        self.hits += 1
+        return canonical
+
+    def intern_records(self, records: List[Dict[str, Any]]) -> None:
+        """Intern the station and train_number fields of records in place."""
+        for rec in records:
+            if "station" in rec:
+                rec["station"] = self.intern(rec["station"])
+            if "train_number" in rec:
+                rec["train_number"] = self.intern(rec["train_number"])
+
+    def intern_keys(self, mapping: Dict[str, Any]) -> Dict[str, Any]:
+        """Return a copy of ``mapping`` with interned keys (e.g. a station map)."""
+        return {self.intern(k): v for k, v in mapping.items()}
+
+    def stats(self) -> Dict[str, int]:
+        return {"labels": len(self._labels), "lookups": self.lookups, "hits": self.hits}
+
 def parse_km(value) -> Optional[float]:
     """Safe parsing of km (handles , and .)."""
     if pd.isna(value):
@@ -134,6 +197,66 @@ def parse_time(value) -> Optional[float]:
             return None
     return None
 
+def parse_times(block: Any) -> np.ndarray:
+    """Batch version of ``parse_time`` for a 2-D block of raw cells.
+
+    ``block`` is a DataFrame (e.g. one sheet's time area) or anything
+    ``np.asarray`` turns into a 2-D array. Returns a float64 array of decimal
+    hours with NaN where ``parse_time`` returns None.
+
+    Results are bit-for-bit identical to calling ``parse_time`` on each cell
+    as returned by ``df.iat``: float64 columns are converted in one vectorised
+    step using the same day-fraction rule, every other cell goes through
+    ``parse_time`` itself, once per distinct value.
+    """
+    if isinstance(block, pd.DataFrame):
+        columns = []
+        for j in range(block.shape[1]):
+            col = block.iloc[:, j]
+            if col.dtype == np.float64 or col.dtype == object or pd.api.types.is_string_dtype(col.dtype):
+                columns.append(col.to_numpy())
+            else:
+                # datetime / int / bool columns: box cells exactly like df.iat does
+                columns.append(np.array([col.iat[i] for i in range(len(col))], dtype=object))
+        out = np.full(block.shape, np.nan)
+    else:
+        arr = np.asarray(block, dtype=object)
+        if arr.ndim != 2:
+            raise ValueError("parse_times expects a 2-D block of cells.")
+        columns = [arr[:, j] for j in range(arr.shape[1])]
+        out = np.full(arr.shape, np.nan)
+
+    memo: Dict[Any, float] = {}
+
+    def scalar(v: Any) -> float:
+        try:
+            key = (type(v), v)
+            hit = memo.get(key)
+        except TypeError:  # unhashable cell value
+            t = parse_time(v)
+            return np.nan if t is None else t
+        if hit is None:
+            t = parse_time(v)
+            hit = memo[key] = np.nan if t is None else t
+        return hit
+
+    for j, col in enumerate(columns):
+        if col.dtype == np.float64:
+            out[:, j] = np.where(col < 1, col * 24, col)
+            continue
+        for i, v in enumerate(col):
+            # None / float / time cells are by far the most common in object columns
+            if v is None:
+                continue
+            if type(v) is float:
+                out[i, j] = v * 24 if v < 1 else v
+            elif type(v) is _dt.time:
+                # same arithmetic as the datetime-like branch of parse_time
+                out[i, j] = v.hour + v.minute / 60 + v.second / 3600
+            else:
+                out[i, j] = scalar(v)
+    return out
+
 def format_time_hhmm(t: float) -> str:
     """Convert decimal hours to bare 'HH:MM' (no day suffix)."""
     h = int(t) % 24
@@ -162,8 +285,71 @@ def format_time_decimal(t: float) -> str:
 
 # ===================== Header detection =====================
 
-def find_headers(df: pd.DataFrame) -> Dict[str, Optional[int]]:
-    """Find positions of key headers."""
+# Accept common variants (normalized and without trailing colon)
+TRAIN_HEADER_VARIANTS = {
+    "numer pociagu",
+    "nr pociagu",
+    "pociag",
+    "train number",
+}
+KM_HEADER_VARIANTS = {
+    "km",
+    "kilometraz",
+    "kilometr",
+}
+STATION_START_VARIANTS = {
+    "ze stacji",
+    "od stacji",
+    "start stacji",
+}
+STATION_END_VARIANTS = {
+    "do stacji",
+    "na stacje",
+    "cel stacji",
+    "koniec stacji",
+}
+
+# normalized header text -> anchor it marks
+_HEADER_ANCHORS: Dict[str, str] = {
+    **{v: "train_row" for v in TRAIN_HEADER_VARIANTS},
+    **{v: "km_col" for v in KM_HEADER_VARIANTS},
+    **{v: "station_start_row" for v in STATION_START_VARIANTS},
+    **{v: "station_end_row" for v in STATION_END_VARIANTS},
+}
+
+
+def _header_candidates(df: pd.DataFrame) -> List[Tuple[int, int, str]]:
+    """Return (row, col, text) for every string cell, in row-major order.
+
+    Numeric, datetime and empty cells can never normalize to a header, so
+    typed columns are skipped outright and object columns are filtered to
+    their ``str`` cells.
+    """
+    candidates: List[Tuple[int, int, str]] = []
+    for c in range(df.shape[1]):
+        col = df.iloc[:, c]
+        if not (col.dtype == object or pd.api.types.is_string_dtype(col.dtype)):
+            continue
+        for r, v in enumerate(col.to_numpy(dtype=object)):
+            if isinstance(v, str):
+                candidates.append((r, c, v))
+    candidates.sort()
+    return candidates
+
+
+def find_headers(
+    df: pd.DataFrame,
+    max_rows: Optional[int] = None,
+    max_cols: Optional[int] = None,
+) -> Dict[str, Optional[int]]:
+    """Find positions of key headers.
+
+    The first match of each anchor in row-major order wins. Only the top-left
+    ``max_rows`` x ``max_cols`` band is searched (whole sheet by default); note
+    that the station end marker sits below the station list, so a row band
+    must be deep enough to include it. Each distinct string is normalized once
+    and the scan stops as soon as every anchor has been found.
+    """
     pos = dict(
         train_row=None,
         km_col=None,
@@ -171,45 +357,27 @@ def find_headers(df: pd.DataFrame) -> Dict[str, Optional[int]]:
         station_start_row=None,
         station_end_row=None,
     )
-    rows, cols = df.shape
-
-    # Accept common variants (normalized and without trailing colon)
-    TRAIN_HEADER_VARIANTS = {
-        "numer pociagu",
-        "nr pociagu",
-        "pociag",
-        "train number",
-    }
-    KM_HEADER_VARIANTS = {
-        "km",
-        "kilometraz",
-        "kilometr",
-    }
-    STATION_START_VARIANTS = {
-        "ze stacji",
-        "od stacji",
-        "start stacji",
-    }
-    STATION_END_VARIANTS = {
-        "do stacji",
-        "na stacje",
-        "cel stacji",
-        "koniec stacji",
-    }
-
-    for r in range(rows):
-        for c in range(cols):
-            v = normalize(df.iat[r, c]).rstrip(":")
-            if v in TRAIN_HEADER_VARIANTS and pos["train_row"] is None:
-                pos["train_row"] = r
-            elif v in KM_HEADER_VARIANTS and pos["km_col"] is None:
-                pos["km_col"] = c
-            elif v in STATION_START_VARIANTS and pos["station_start_row"] is None:
-                pos["station_start_row"] = r
-                if pos["station_col"] is None:
-                    pos["station_col"] = c
-            elif v in STATION_END_VARIANTS and pos["station_end_row"] is None:
-                pos["station_end_row"] = r
+    if max_rows is not None or max_cols is not None:
+        df = df.iloc[:max_rows, :max_cols]
+
+    anchors: Dict[str, Optional[str]] = {}
+    remaining = 4
+    for r, c, text in _header_candidates(df):
+        if text in anchors:
+            anchor = anchors[text]
+        else:
+            anchor = anchors[text] = _HEADER_ANCHORS.get(normalize(text).rstrip(":"))
+        if anchor is None or pos[anchor] is not None:
+            continue
+        if anchor == "km_col":
+            pos["km_col"] = c
+        else:
+            pos[anchor] = r
+            if anchor == "station_start_row" and pos["station_col"] is None:
+                pos["station_col"] = c
+        remaining -= 1
+        if remaining == 0:
+            break
 
     return pos
 
@@ -244,6 +412,7 @@ def extract_train_columns(
     train_row: int,
     station_start_row: Optional[int] = None,
     station_end_row: Optional[int] = None,
+    has_time: Optional[np.ndarray] = None,
 ) -> Dict[str, int]:
     """Return map {train_number_key: column_index}.
 
@@ -257,6 +426,11 @@ def extract_train_columns(
 
     When multiple columns map to the same train number, unique keys are created by appending
     ' (2)', ' (3)', ... so entries remain distinct.
+
+    ``has_time`` is an optional boolean matrix (station rows x all columns) marking
+    cells with a parsable time, e.g. ``~np.isnan(parse_times(...))`` over the station
+    rows. It is computed here when not given; either way every cell is parsed once
+    and all column checks are lookups into it.
     """
     if train_row is None:
         return {}
@@ -274,13 +448,15 @@ def extract_train_columns(
             counters[base] += 1
             return f"{base} ({counters[base]})"
 
-    # determine station row search range (if provided)
-    station_rows = None
+    # determine station row search range (if provided) and which columns hold any time there
+    column_times: Optional[np.ndarray] = None
     if station_start_row is not None and station_end_row is not None:
         start_r = station_start_row + 1
         end_r = max(station_end_row - 1, start_r - 1)
         if end_r >= start_r:
-            station_rows = list(range(start_r, end_r + 1))
+            if has_time is None:
+                has_time = ~np.isnan(parse_times(df.iloc[start_r:end_r + 1]))
+            column_times = has_time.any(axis=0)
 
     c = 0
     while c < ncols:
@@ -311,23 +487,14 @@ def extract_train_columns(
 
             # function to check if column j contains any parsable time in station rows
             def column_has_time(j: int) -> bool:
-                if station_rows is None:
+                if column_times is None or j >= len(column_times):
                     return False
-                for r in station_rows:
-                    try:
-                        val = df.iat[r, j]
-                    except Exception:
-                        continue
-                    if pd.isna(val):
-                        continue
-                    if parse_time(val) is not None:
-                        return True
-                return False
+                return bool(column_times[j])
 
             if len(cols_in_span) == 1:
                 # non-merged header — assume times are in the same column; if verification possible, check it
                 time_col = c
-                if station_rows is not None and not column_has_time(time_col):
+                if column_times is not None and not column_has_time(time_col):
                     # fallback: perhaps times are in the next column as before
                     if c + 1 < ncols and column_has_time(c + 1):
                         time_col = c + 1
@@ -0,0 +1,355 @@
+"""Low-level SpreadsheetML helpers that read workbook parts straight from the zip.
+
+Used by the non-default engines of ``excel_loader.read_workbook``: the
+"streaming" engine only takes sheet metadata (hidden columns, merged ranges)
+from here, the "xml" engine reads cell values too via ``XlsxReader`` and
+never builds openpyxl cell objects.
+"""
+import hashlib
+import posixpath
+import re
+import zipfile
+from typing import Any, Dict, List, Optional, Set, Tuple
+from xml.etree.ElementTree import iterparse, parse
+
+from openpyxl.styles.numbers import BUILTIN_FORMATS, is_date_format, is_timedelta_format
+from openpyxl.utils.cell import range_boundaries
+from openpyxl.utils.datetime import CALENDAR_MAC_1904, CALENDAR_WINDOWS_1900, from_excel, from_ISO8601
+
+# (min_col, min_row, max_col, max_row), 1-based and inclusive like openpyxl
+MergedRange = Tuple[int, int, int, int]
+
+_REL_OFFICE_DOCUMENT = "/officeDocument"
+_REL_WORKSHEET = "/worksheet"
+_REL_SHARED_STRINGS = "/sharedStrings"
+_REL_STYLES = "/styles"
+
+_MAIN = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+_TAG_ROW = _MAIN + "row"
+_TAG_CELL = _MAIN + "c"
+_TAG_VALUE = _MAIN + "v"
+_TAG_INLINE = _MAIN + "is"
+_TAG_COL = _MAIN + "col"
+_TAG_MERGE = _MAIN + "mergeCell"
+
+
+def _local(tag: str) -> str:
+    """Strip the ``{namespace}`` prefix from an element tag."""
+    return tag.rsplit("}", 1)[-1]
+
+
+def _attr(el, name: str):
+    """Return attribute ``name`` regardless of its namespace prefix."""
+    for key, value in el.attrib.items():
+        if _local(key) == name:
+            return value
+    return None
+
+
+def _resolve_target(base_part: str, target: str) -> str:
+    """Resolve a relationship target against the part that owns it."""
+    if target.startswith("/"):
+        return target.lstrip("/")
+    return posixpath.normpath(posixpath.join(posixpath.dirname(base_part), target))
+
+
+def _rels_path(part: str) -> str:
+    return posixpath.join(posixpath.dirname(part), "_rels", posixpath.basename(part) + ".rels")
+
+
+def _read_rels(archive: zipfile.ZipFile, part: str) -> List[Tuple[str, str, str]]:
+    """Return [(rel_id, type, resolved_target)] for ``part``."""
+    try:
+        src = archive.open(_rels_path(part))
+    except KeyError:
+        return []
+    with src:
+        root = parse(src).getroot()
+    rels = []
+    for rel in root:
+        if _local(rel.tag) != "Relationship" or rel.get("TargetMode") == "External":
+            continue
+        rels.append((rel.get("Id"), rel.get("Type", ""), _resolve_target(part, rel.get("Target", ""))))
+    return rels
+
+
+def workbook_part(archive: zipfile.ZipFile) -> str:
+    """Return the path of the main workbook part (normally ``xl/workbook.xml``)."""
+    for _rid, rel_type, target in _read_rels(archive, ""):
+        if rel_type.endswith(_REL_OFFICE_DOCUMENT):
+            return target
+    return "xl/workbook.xml"
+
+
+def sheet_parts(archive: zipfile.ZipFile) -> List[Tuple[str, str]]:
+    """Return [(sheet_name, worksheet_part_path)] in workbook order.
+
+    Chartsheets and other non-worksheet sheets are skipped.
+    """
+    wb_part = workbook_part(archive)
+    targets = {
+        rid: target
+        for rid, rel_type, target in _read_rels(archive, wb_part)
+        if rel_type.endswith(_REL_WORKSHEET)
+    }
+    with archive.open(wb_part) as src:
+        root = parse(src).getroot()
+
+    result: List[Tuple[str, str]] = []
+    for el in root.iter():
+        if _local(el.tag) != "sheet":
+            continue
+        target = targets.get(_attr(el, "id"))
+        if target is not None:
+            result.append((el.get("name", ""), target))
+    return result
+
+
+def read_sheet_layout(archive: zipfile.ZipFile, part: str) -> Tuple[Set[int], List[MergedRange]]:
+    """Scan a worksheet part for hidden columns and merged ranges.
+
+    Returns (hidden_col_indices (0-based), merged_ranges). Cell data is
+    discarded as it streams past, so memory stays flat regardless of sheet size.
+    """
+    hidden: Set[int] = set()
+    merges: List[MergedRange] = []
+    with archive.open(part) as src:
+        for _event, el in iterparse(src):
+            tag = _local(el.tag)
+            if tag == "row":
+                el.clear()
+            elif tag == "col":
+                if el.get("hidden") in ("1", "true"):
+                    lo = int(el.get("min", "0"))
+                    hi = int(el.get("max", lo))
+                    hidden.update(ci - 1 for ci in range(lo, hi + 1))
+            elif tag == "mergeCell":
+                ref = el.get("ref")
+                if ref:
+                    merges.append(range_boundaries(ref))
+    return hidden, merges
+
+
+def _read_shared_strings(archive: zipfile.ZipFile, part: str) -> List[str]:
+    strings: List[str] = []
+    with archive.open(part) as src:
+        for _event, el in iterparse(src):
+            if _local(el.tag) == "si":
+                strings.append(_text_content(el).replace("x005F_", ""))
+                el.clear()
+    return strings
+
+
+# Shared-string cells (t="s") that carry a value; self-closing cells are empty
+_SHARED_CELL = re.compile(rb"""<(?:\w+:)?c\b[^>]*\bt=["']s["'][^>/]*>(.*?)</(?:\w+:)?c>""", re.DOTALL)
+_CELL_VALUE = re.compile(rb"<(?:\w+:)?v>\s*(\d+)\s*<")
+
+
+def sheet_fingerprints(archive: zipfile.ZipFile) -> Dict[str, str]:
+    """Return {sheet_name: sha256 hex} over everything a sheet's values depend on.
+
+    That is the worksheet XML itself (cells, hidden columns, merged ranges),
+    the shared strings it references, the styles part (date formats) and the
+    workbook's date system. Strings other sheets add to the shared table do
+    not change the fingerprint, so editing one sheet leaves the others'
+    fingerprints alone.
+    """
+    wb_part = workbook_part(archive)
+    common = hashlib.sha256()
+    shared: List[str] = []
+    with archive.open(wb_part) as src:
+        root = parse(src).getroot()
+    for el in root:
+        if _local(el.tag) == "workbookPr":
+            common.update(b"1904" if el.get("date1904") in ("1", "true") else b"1900")
+    for _rid, rel_type, target in _read_rels(archive, wb_part):
+        if rel_type.endswith(_REL_SHARED_STRINGS):
+            shared = _read_shared_strings(archive, target)
+        elif rel_type.endswith(_REL_STYLES):
+            common.update(archive.read(target))
+
+    result: Dict[str, str] = {}
+    for name, part in sheet_parts(archive):
+        digest = common.copy()
+        xml = archive.read(part)
+        digest.update(xml)
+        refs = set()
+        for cell in _SHARED_CELL.finditer(xml):
+            value = _CELL_VALUE.search(cell.group(1))
+            if value is not None:
+                refs.add(int(value.group(1)))
+        for idx in sorted(refs):
+            text = shared[idx] if idx < len(shared) else ""
+            digest.update(b"\0%d\0" % idx + text.encode("utf-8"))
+        result[name] = digest.hexdigest()
+    return result
+
+
+def _text_content(el) -> str:
+    """Plain text of a string item (``<si>`` / ``<is>``), skipping phonetic runs."""
+    snippets: List[str] = []
+    for child in el:
+        tag = _local(child.tag)
+        if tag == "t":
+            if child.text is not None:
+                snippets.append(child.text)
+        elif tag == "r":
+            for sub in child:
+                if _local(sub.tag) == "t" and sub.text is not None:
+                    snippets.append(sub.text)
+    return "".join(snippets)
+
+
+def _cast_number(value: str):
+    """Same int/float split as openpyxl so both engines return identical types."""
+    if "." in value or "E" in value or "e" in value:
+        return float(value)
+    return int(value)
+
+
+def _column_index(ref: str) -> int:
+    """1-based column number from a cell reference like ``"AB12"``."""
+    n = 0
+    for ch in ref:
+        if "A" <= ch <= "Z":
+            n = n * 26 + ord(ch) - 64
+        else:
+            break
+    return n
+
+
+class XlsxReader:
+    """Read worksheet values from an open XLSX archive without openpyxl cells.
+
+    Workbook-level parts (sheet list, shared strings, date styles, epoch) are
+    read once; each worksheet is then parsed in a single incremental pass.
+    Values follow openpyxl's ``data_only=True`` conventions: cached formula
+    results, shared/inline strings as ``str``, date-formatted numbers as
+    ``datetime`` / ``time`` / ``timedelta``.
+    """
+
+    def __init__(self, archive: zipfile.ZipFile):
+        self.archive = archive
+        wb_part = workbook_part(archive)
+        self.sheets: List[Tuple[str, str]] = sheet_parts(archive)
+        self.epoch = self._read_epoch(wb_part)
+
+        rels = _read_rels(archive, wb_part)
+        self.shared_strings: List[str] = []
+        self.date_styles: Set[int] = set()
+        self.timedelta_styles: Set[int] = set()
+        for _rid, rel_type, target in rels:
+            if rel_type.endswith(_REL_SHARED_STRINGS):
+                self.shared_strings = _read_shared_strings(archive, target)
+            elif rel_type.endswith(_REL_STYLES):
+                self.date_styles, self.timedelta_styles = self._read_date_styles(target)
+
+    @property
+    def sheet_names(self) -> List[str]:
+        return [name for name, _part in self.sheets]
+
+    def _read_epoch(self, wb_part: str):
+        with self.archive.open(wb_part) as src:
+            root = parse(src).getroot()
+        for el in root:
+            if _local(el.tag) == "workbookPr":
+                if el.get("date1904") in ("1", "true"):
+                    return CALENDAR_MAC_1904
+                break
+        return CALENDAR_WINDOWS_1900
+
+    def _read_date_styles(self, part: str) -> Tuple[Set[int], Set[int]]:
+        """Return (date_style_ids, timedelta_style_ids) as cellXfs indices."""
+        with self.archive.open(part) as src:
+            root = parse(src).getroot()
+        custom: Dict[int, str] = {}
+        xf_formats: List[int] = []
+        for section in root:
+            tag = _local(section.tag)
+            if tag == "numFmts":
+                for fmt in section:
+                    custom[int(fmt.get("numFmtId", "0"))] = fmt.get("formatCode", "")
+            elif tag == "cellXfs":
+                xf_formats = [int(xf.get("numFmtId", "0")) for xf in section]
+
+        date_styles: Set[int] = set()
+        timedelta_styles: Set[int] = set()
+        for idx, fmt_id in enumerate(xf_formats):
+            fmt = custom.get(fmt_id, BUILTIN_FORMATS.get(fmt_id))
+            if fmt is None:
+                continue
+            if is_date_format(fmt):
+                date_styles.add(idx)
+            if is_timedelta_format(fmt):
+                timedelta_styles.add(idx)
+        return date_styles, timedelta_styles
+
+    def _cell_value(self, el) -> Any:
+        data_type = el.get("t", "n")
+        if data_type == "inlineStr":
+            child = el.find(_TAG_INLINE)
+            return _text_content(child) if child is not None else None
+
+        value: Optional[str] = el.findtext(_TAG_VALUE) or None
+        if value is None:
+            return None
+        if data_type == "n":
+            number = _cast_number(value)
+            style_id = int(el.get("s", "0"))
+            if style_id in self.date_styles:
+                try:
+                    return from_excel(number, self.epoch, timedelta=style_id in self.timedelta_styles)
+                except (OverflowError, ValueError):
+                    return "#VALUE!"
+            return number
+        if data_type == "s":
+            return self.shared_strings[int(value)]
+        if data_type == "b":
+            return bool(int(value))
+        if data_type == "d":
+            return from_ISO8601(value)
+        return value  # "str" (formula result) and "e" (error code)
+
+    def read_sheet(self, part: str) -> Tuple[List[List[Any]], Set[int], List[MergedRange]]:
+        """Parse one worksheet part.
+
+        Returns (row_values, hidden_col_indices (0-based), merged_ranges), where
+        ``row_values[r][c]`` holds the value at 0-based (r, c); rows are ragged
+        and missing rows are empty lists.
+        """
+        rows: List[List[Any]] = []
+        hidden: Set[int] = set()
+        merges: List[MergedRange] = []
+        with self.archive.open(part) as src:
+            for _event, el in iterparse(src):
+                tag = el.tag
+                if tag == _TAG_ROW:
+                    r_attr = el.get("r")
+                    row_idx = int(r_attr) if r_attr else len(rows) + 1
+                    while len(rows) < row_idx - 1:
+                        rows.append([])
+                    values: List[Any] = []
+                    col = 0
+                    for cell in el:
+                        if cell.tag != _TAG_CELL:
+                            continue
+                        ref = cell.get("r")
+                        col = _column_index(ref) if ref else col + 1
+                        value = self._cell_value(cell)
+                        if value is None:
+                            continue
+                        if len(values) < col:
+                            values.extend([None] * (col - len(values)))
+                        values[col - 1] = value
+                    rows.append(values)
+                    el.clear()
+                elif tag == _TAG_COL:
+                    if el.get("hidden") in ("1", "true"):
+                        lo = int(el.get("min", "0"))
+                        hi = int(el.get("max", lo))
+                        hidden.update(ci - 1 for ci in range(lo, hi + 1))
+                elif tag == _TAG_MERGE:
+                    ref = el.get("ref")
+                    if ref:
+                        merges.append(range_boundaries(ref))
+        return rows, hidden, merges